@@ -0,0 +1,29 @@
+// Automatisch erzeugt von test-server/asset_manifest.py - nicht von Hand bearbeiten.
+// Revision (Content-Hash) je Datei aus ASSETS in service-worker.js.
+self.PRECACHE_REVISIONS = {
+  "./app.js": "4f56a9aed262",
+  "./camera-settings.js": "faa2c25a2ecb",
+  "./config.js": "88fc18eac635",
+  "./db-manager.js": "42cbaa636331",
+  "./icons/favicon.ico": "3bc6af82bbc4",
+  "./icons/favicon.png": "c233ad87aff4",
+  "./icons/icon-144x144.png": "0a6ec7ec3361",
+  "./icons/icon-192x192.png": "3a0faca7b10f",
+  "./index.html": "d80b77d25c19",
+  "./kml-manager.js": "55d1840f1594",
+  "./layout-switcher.js": "b7b0bb27a9f0",
+  "./manifest.json": "de2a0d1876f6",
+  "./map-styles.css": "4afa45a77d7f",
+  "./map-view.js": "e9d8b1551714",
+  "./offline-html.html": "424496c23f65",
+  "./offline-sync-manager.js": "d25ebb7a8c06",
+  "./sms-commands.js": "7d9bc5d7c87f",
+  "./sms-manager.js": "de6be64f3867",
+  "./styles-css.css": "2c35757a8b0e",
+  "./styles-extensions.css": "41e5c98bdca9",
+  "./styles.css": "02b2206343b3",
+  "./swipe-navigation.js": "9d8e2bcae335",
+  "./sync-manager.js": "e3059924abf5",
+  "./ui-extensions.js": "f9876b8dbfc3",
+  "./wildkamera-icon.svg": "7930ab68700b"
+};
@@ -6,6 +6,15 @@
 const CACHE_NAME = 'wildkamera-cache-v1.0.8';
 const TILE_CACHE_NAME = 'wildkamera-tiles-v1.0.1'; // Separater Cache für Karten-Tiles
 const MAX_TILE_CACHE_SIZE = 500; // Maximal 500 Tiles im Cache
+const PRECACHE_NAME = 'wildkamera-precache'; // Versionierte Assets, bleibt über Updates erhalten
+
+// Content-Hashes der Assets (erzeugt von test-server/asset_manifest.py)
+try {
+  importScripts('./precache-manifest.js');
+} catch (err) {
+  console.warn('[ServiceWorker] Kein Precache-Manifest, Assets werden komplett geladen', err);
+}
+const PRECACHE_REVISIONS = self.PRECACHE_REVISIONS || {};
 const ASSETS = [
   '/',
   './index.html',
@@ -41,18 +50,74 @@ const ASSETS = [
   'https://fonts.googleapis.com/icon?family=Material+Icons'
 ];
 
+/**
+ * URL eines Assets mit Revision (z.B. ./app.js?v=4f56a9aed262), sonst die URL selbst
+ */
+function precacheUrl(asset) {
+  const revision = PRECACHE_REVISIONS[asset];
+  return revision ? `${asset}?v=${revision}` : asset;
+}
+
+/**
+ * Versionierte Assets: nur laden, was noch nicht mit dieser Revision im Cache liegt
+ */
+async function precacheVersionedAssets() {
+  const cache = await caches.open(PRECACHE_NAME);
+  const assets = ASSETS.filter(asset => PRECACHE_REVISIONS[asset]);
+  let loaded = 0;
+  await Promise.all(assets.map(async asset => {
+    const url = precacheUrl(asset);
+    if (await cache.match(url)) return;
+    try {
+      await cache.add(url);
+      loaded++;
+    } catch (err) {
+      console.error(`[ServiceWorker] Fehler beim Cachen: ${url}`, err);
+    }
+  }));
+  console.log(`[ServiceWorker] ${loaded} von ${assets.length} versionierten Assets geladen`);
+}
+
+/**
+ * Entfernt Assets mit veralteter Revision aus dem Precache
+ */
+async function cleanupPrecache() {
+  const cache = await caches.open(PRECACHE_NAME);
+  const current = new Set(
+    ASSETS.filter(asset => PRECACHE_REVISIONS[asset])
+      .map(asset => new URL(precacheUrl(asset), self.location).href)
+  );
+  const keys = await cache.keys();
+  await Promise.all(keys.filter(request => !current.has(request.url)).map(request => cache.delete(request)));
+}
+
+/**
+ * Sucht eine Anfrage im Precache (Query wie ?v=222000 wird ignoriert)
+ */
+function matchPrecache(request) {
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return Promise.resolve(undefined);
+
+  const scope = new URL('./', self.location).pathname;
+  const path = url.pathname === scope ? 'index.html' : url.pathname.slice(scope.length);
+  const asset = `./${path}`;
+  if (!PRECACHE_REVISIONS[asset]) return Promise.resolve(undefined);
+  return caches.open(PRECACHE_NAME).then(cache => cache.match(precacheUrl(asset)));
+}
+
 // Verbesserte Install-Logik mit Update-Mechanismus
 self.addEventListener('install', event => {
   event.waitUntil(
     caches.open(CACHE_NAME)
       .then(cache => {
+        // Nicht versionierte Assets (extern, '/') wie bisher laden
         return Promise.all(
-          ASSETS.map(asset =>
+          ASSETS.filter(asset => !PRECACHE_REVISIONS[asset]).map(asset =>
             cache.add(asset).catch(err => {
               console.error(`[ServiceWorker] Fehler beim Cachen: ${asset}`, err);
               return Promise.resolve();
             })
-          )
+          ).concat(precacheVersionedAssets())
         );
       })
       .then(() => {
@@ -68,14 +133,14 @@ self.addEventListener('activate', event => {
     caches.keys().then(cacheNames =>
       Promise.all(
         cacheNames.map(cacheName => {
-          // Alte Caches löschen (außer TILE_CACHE_NAME)
-          if (cacheName !== CACHE_NAME && cacheName !== TILE_CACHE_NAME) {
+          // Alte Caches löschen (außer TILE_CACHE_NAME und PRECACHE_NAME)
+          if (cacheName !== CACHE_NAME && cacheName !== TILE_CACHE_NAME && cacheName !== PRECACHE_NAME) {
             console.log('[ServiceWorker] Deleting old cache:', cacheName);
             return caches.delete(cacheName);
           }
         })
       )
-    ).then(() => {
+    ).then(() => cleanupPrecache()).then(() => {
       console.log('[ServiceWorker] Alte Caches gelöscht, Tile-Cache behalten');
       return self.clients.claim();  // Sofortige Kontrolle aller Clients
     })
@@ -146,52 +211,65 @@ self.addEventListener('fetch', event => {
     return;
   }
 
-  // NETWORK-FIRST für alle anderen Requests
-  event.respondWith(
-    fetch(event.request)
-      .then(networkResponse => {
-        // Erfolgreiche Netzwerkantwort
-        if (networkResponse && networkResponse.ok) {
-          // Netzwerkantwort in Cache speichern
-          const responseClone = networkResponse.clone();
-          caches.open(CACHE_NAME).then(cache => {
-            cache.put(event.request, responseClone);
-          });
-          return networkResponse;
-        }
-        // Bei Netzwerkfehler Cache verwenden
-        return caches.match(event.request).then(cachedResponse => {
-          return cachedResponse || new Response('Nicht verfügbar', {
-            status: 503,
-            statusText: 'Service Unavailable'
-          });
+  // CACHE-FIRST für versionierte Assets (z.B. app.js?v=222000 → Precache app.js?v=<hash>);
+  // Navigationen bleiben network-first, damit index.html aktuell ist
+  if (event.request.method === 'GET' && event.request.mode !== 'navigate') {
+    event.respondWith(
+      matchPrecache(event.request).then(cachedResponse => cachedResponse || networkFirst(event))
+    );
+    return;
+  }
+
+  event.respondWith(networkFirst(event));
+});
+
+/**
+ * NETWORK-FIRST mit Fallback auf Cache und Precache
+ */
+function networkFirst(event) {
+  return fetch(event.request)
+    .then(networkResponse => {
+      // Erfolgreiche Netzwerkantwort
+      if (networkResponse && networkResponse.ok) {
+        // Netzwerkantwort in Cache speichern
+        const responseClone = networkResponse.clone();
+        caches.open(CACHE_NAME).then(cache => {
+          cache.put(event.request, responseClone);
         });
-      })
-      .catch(() => {
-        // Offline-Fallback
-        return caches.match(event.request).then(cachedResponse => {
-          if (cachedResponse) return cachedResponse;
-
-          // Spezifischer Offline-Fallback für Navigationen
-          if (event.request.mode === 'navigate') {
-            return caches.match('/offline-html.html').then(offline => {
-              return offline || new Response('Offline', {
-                status: 503,
-                statusText: 'Service Unavailable',
-                headers: { 'Content-Type': 'text/html' }
-              });
-            });
-          }
+        return networkResponse;
+      }
+      // Bei Netzwerkfehler Cache verwenden
+      return caches.match(event.request).then(cachedResponse => cachedResponse || matchPrecache(event.request)).then(cachedResponse => {
+        return cachedResponse || new Response('Nicht verfügbar', {
+          status: 503,
+          statusText: 'Service Unavailable'
+        });
+      });
+    })
+    .catch(() => {
+      // Offline-Fallback
+      return caches.match(event.request).then(cachedResponse => cachedResponse || matchPrecache(event.request)).then(cachedResponse => {
+        if (cachedResponse) return cachedResponse;
 
-          // Generische Offline-Antwort
-          return new Response('Offline und keine gecachte Version verfügbar.', {
-            status: 503,
-            statusText: 'Service Unavailable'
+        // Spezifischer Offline-Fallback für Navigationen
+        if (event.request.mode === 'navigate') {
+          return caches.match('/offline-html.html').then(offline => {
+            return offline || new Response('Offline', {
+              status: 503,
+              statusText: 'Service Unavailable',
+              headers: { 'Content-Type': 'text/html' }
+            });
           });
+        }
+
+        // Generische Offline-Antwort
+        return new Response('Offline und keine gecachte Version verfügbar.', {
+          status: 503,
+          statusText: 'Service Unavailable'
         });
-      })
-  );
-});
+      });
+    });
+}
 
 // Update-Check Mechanismus
 self.addEventListener('message', event => {
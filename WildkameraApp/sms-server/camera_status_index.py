@@ -0,0 +1,263 @@
+"""
+Persistenter Index der Kamera-Status-Dateien (txtFiles) aller Reviere
+Parst nur neue oder geänderte Dateien und liefert die Ergebnisse
+nach Änderungsdatum sortiert aus dem Speicher
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from camera_status_parser import CameraStatus, read_camera_status_file
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+
+class CameraStatusIndex:
+    """
+    Index aller Status-Dateien unter <base_dir>/<Revier>/txtFiles/*.txt
+
+    Dateien werden über (Größe, mtime) wiedererkannt und nur bei Änderung
+    neu geparst. Ordner, deren mtime sich nicht geändert hat (keine Datei
+    hinzugekommen oder entfernt), werden nicht erneut gelistet; in
+    größeren Abständen werden alle Dateien per stat() geprüft, um auch
+    Änderungen an bestehenden Dateien zu erkennen.
+    """
+
+    def __init__(
+        self,
+        base_dir: str,
+        index_file: str = "camera_status_index.json",
+        min_refresh_interval: float = 5.0,
+        full_scan_interval: float = 300.0
+    ):
+        """
+        Initialisiert den Status-Index
+
+        Args:
+            base_dir: Basis-Verzeichnis der Reviere
+            index_file: Pfad zur JSON-Datei für den Index
+            min_refresh_interval: Mindestabstand zwischen zwei Abgleichen in Sekunden
+            full_scan_interval: Abstand der vollständigen stat()-Prüfung in Sekunden
+        """
+        self.base_dir = base_dir
+        self.index_file = index_file
+        self.min_refresh_interval = min_refresh_interval
+        self.full_scan_interval = full_scan_interval
+
+        self._entries: Dict[str, CameraStatus] = {}
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._dir_mtimes: Dict[str, int] = {}
+
+        # Nach mtime sortierte Sicht für days_back-Abfragen per bisect
+        self._sorted_entries: List[CameraStatus] = []
+        self._sorted_mtimes: List[int] = []
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._last_full_scan = 0.0
+
+        self._load_index()
+
+    def _load_index(self):
+        """Lädt den Index aus der JSON-Datei"""
+        try:
+            if not os.path.exists(self.index_file):
+                logger.info("Kein Kamera-Status-Index gefunden, starte mit leerem Index")
+                return
+
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            if data.get("version") != INDEX_VERSION or data.get("base_dir") != self.base_dir:
+                logger.info("Kamera-Status-Index veraltet oder für anderes Verzeichnis, wird neu aufgebaut")
+                return
+
+            for item in data.get("files", []):
+                signature = tuple(item.pop("signature"))
+                self._entries[item["file_path"]] = CameraStatus.from_dict(item)
+                self._signatures[item["file_path"]] = signature
+
+            # Ordner-mtimes bewusst nicht laden: der erste Abgleich listet alle Ordner
+            self._rebuild_sorted()
+            logger.info(f"Kamera-Status-Index geladen: {len(self._entries)} Einträge")
+
+        except Exception as e:
+            logger.error(f"Fehler beim Laden des Kamera-Status-Index: {e}")
+            self._entries = {}
+            self._signatures = {}
+
+    def _save_index(self):
+        """Speichert den Index atomar (Temp-Datei + Rename)"""
+        try:
+            files = []
+            for path, entry in self._entries.items():
+                item = entry.to_dict()
+                item.pop("date", None)
+                item["signature"] = list(self._signatures[path])
+                files.append(item)
+
+            tmp_file = f"{self.index_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": INDEX_VERSION,
+                    "base_dir": self.base_dir,
+                    "files": files
+                }, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            logger.error(f"Fehler beim Speichern des Kamera-Status-Index: {e}")
+
+    def _rebuild_sorted(self):
+        """Sortiert die Einträge nach Änderungszeit der Datei"""
+        ordered = sorted(
+            self._entries.items(),
+            key=lambda item: self._signatures[item[0]][1]
+        )
+        self._sorted_entries = [entry for _, entry in ordered]
+        self._sorted_mtimes = [self._signatures[path][1] for path, _ in ordered]
+
+    def _txt_dirs(self) -> List[Tuple[str, str]]:
+        """Alle txtFiles-Ordner als (Revier, Pfad)"""
+        txt_dirs = []
+        with os.scandir(self.base_dir) as revier_entries:
+            for revier_entry in revier_entries:
+                if not revier_entry.is_dir():
+                    continue
+                txt_dir = os.path.join(revier_entry.path, "txtFiles")
+                if os.path.isdir(txt_dir):
+                    txt_dirs.append((revier_entry.name, txt_dir))
+                else:
+                    logger.debug(f"Kein txtFiles-Ordner in {revier_entry.name}")
+        return txt_dirs
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Gleicht den Index mit dem Dateisystem ab
+
+        Args:
+            force: Alle Ordner listen und alle Dateien prüfen
+
+        Returns:
+            Anzahl neu geparster oder entfernter Dateien
+        """
+        with self._refresh_lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.min_refresh_interval:
+                return 0
+            full_scan = force or now - self._last_full_scan >= self.full_scan_interval
+
+            if not os.path.exists(self.base_dir):
+                logger.warning(f"Reviere-Verzeichnis nicht gefunden: {self.base_dir}")
+                return 0
+
+            changes = self._scan(full_scan)
+
+            self._last_refresh = time.monotonic()
+            if full_scan:
+                self._last_full_scan = self._last_refresh
+            return changes
+
+    def _scan(self, full_scan: bool) -> int:
+        """Listet geänderte Ordner, parst neue/geänderte Dateien und entfernt verschwundene"""
+        entries = dict(self._entries)
+        signatures = dict(self._signatures)
+        dir_mtimes = {}
+        parsed = 0
+        removed = 0
+
+        for revier_name, txt_dir in self._txt_dirs():
+            dir_prefix = txt_dir + os.sep
+            try:
+                dir_mtime = os.stat(txt_dir).st_mtime_ns
+            except OSError as e:
+                # Einträge behalten, Ordner beim nächsten Abgleich erneut listen
+                logger.error(f"Fehler beim Lesen von {txt_dir}: {e}")
+                dir_mtimes[txt_dir] = -1
+                continue
+            dir_mtimes[txt_dir] = dir_mtime
+
+            if not full_scan and self._dir_mtimes.get(txt_dir) == dir_mtime:
+                continue
+
+            logger.info(f"Suche Status-Dateien in {txt_dir}")
+            present = set()
+            with os.scandir(txt_dir) as file_entries:
+                for file_entry in file_entries:
+                    if not file_entry.name.endswith(".txt") or not file_entry.is_file():
+                        continue
+
+                    file_path = file_entry.path
+                    present.add(file_path)
+                    file_stat = file_entry.stat()
+                    signature = (file_stat.st_size, file_stat.st_mtime_ns)
+                    if signatures.get(file_path) == signature:
+                        continue
+
+                    status = read_camera_status_file(file_path, file_stat.st_mtime)
+                    if status:
+                        status.revier = revier_name
+                        entries[file_path] = status
+                        signatures[file_path] = signature
+                        parsed += 1
+                        logger.info(f"Status gelesen: {status.cam_id or 'Unknown'} aus {revier_name}")
+
+            for file_path in [p for p in entries if p.startswith(dir_prefix) and p not in present]:
+                del entries[file_path]
+                del signatures[file_path]
+                removed += 1
+
+        # Einträge aus verschwundenen Revier- bzw. txtFiles-Ordnern entfernen
+        known_prefixes = tuple(txt_dir + os.sep for txt_dir in dir_mtimes)
+        for file_path in [p for p in entries if not p.startswith(known_prefixes)]:
+            del entries[file_path]
+            del signatures[file_path]
+            removed += 1
+
+        with self._lock:
+            self._entries = entries
+            self._signatures = signatures
+            self._dir_mtimes = dir_mtimes
+            if parsed or removed:
+                self._rebuild_sorted()
+                self._save_index()
+
+        if parsed or removed:
+            logger.info(
+                f"Kamera-Status-Index aktualisiert: {parsed} Dateien geparst, "
+                f"{removed} entfernt, {len(entries)} gesamt"
+            )
+        return parsed + removed
+
+    def get_statuses(self, days_back: int = 7, refresh: bool = True) -> List[Dict[str, Any]]:
+        """
+        Liefert alle Status-Dateien, die in den letzten Tagen geändert wurden
+
+        Args:
+            days_back: Wie viele Tage zurück sollen Dateien geliefert werden
+            refresh: Vorher geänderte Dateien einlesen
+
+        Returns:
+            Liste von Status-Dicts, nach Änderungszeit aufsteigend
+        """
+        if refresh:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Fehler beim Lesen der Status-Dateien: {e}")
+
+        cutoff_ns = int((datetime.now() - timedelta(days=days_back)).timestamp() * 1_000_000_000)
+        with self._lock:
+            start = bisect.bisect_left(self._sorted_mtimes, cutoff_ns)
+            records = self._sorted_entries[start:]
+        statuses = [record.to_dict() for record in records]
+
+        logger.info(f"Insgesamt {len(statuses)} Kamera-Status-Dateien gefunden")
+        return statuses
@@ -5,12 +5,136 @@ Liest Status-Dateien, parst GPS-Koordinaten und prüft Point-in-Polygon
 import os
 import re
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from pathlib import Path
 import logging
 
+from revier_polygons import PolygonGridIndex, RevierPolygon
+
 logger = logging.getLogger(__name__)
 
+# GPS im DMS-Format: (N|S|E|W)(\d+)\*(\d+)'(\d+)"
+DMS_PATTERN = re.compile(r"([NSEW])(\d+)\*(\d+)'(\d+)\"")
+
+# Werte-Muster der Status-Felder (jeweils am Anfang des Werts nach "Key:")
+_IMEI_VALUE = re.compile(r"\S+")
+_DIGITS_VALUE = re.compile(r"\d+")
+_DATE_VALUE = re.compile(r"(\d{2})/(\d{2})/(\d{4})\s+(\d{2}):(\d{2}):(\d{2})")
+_BATTERY_VALUE = re.compile(r"(\d+)%")
+_SD_VALUE = re.compile(r"(\d+)M/(\d+)M")
+
+# Vollständige Statusmeldung im Standard-Layout der Kamera-Firmware; passt
+# sie, werden alle Felder mit einem einzigen Regex-Durchlauf gelesen.
+# Abweichende Dateien laufen über den zeilenweisen Tokenizer.
+# (?!\d)/(?!\S) verhindern exponentielles Backtracking bei Nicht-Treffern.
+_INLINE_SPACE = r"[^\S\n]"
+_DMS_GROUPS = r"([NSEW])(\d+)\*(\d+)'(\d+)\""
+_STANDARD_STATUS = re.compile(
+    r"IMEI:(\S+)(?!\S)[^\n]*\n"
+    r"CSQ:(\d+)(?!\d)[^\n]*\n"
+    r"CamID:([^\n]+)\n"
+    r"Temp:(\d+)(?!\d)[^\n]*\n"
+    r"Date:((\d{2})/(\d{2})/(\d{4})" + _INLINE_SPACE + r"+(\d{2}):(\d{2}):(\d{2}))[^\n]*\n"
+    r"Battery:(\d+)%[^\n]*\n"
+    r"SD:(\d+)M/(\d+)M[^\n]*\n"
+    r"Total Pics:(\d+)(?!\d)[^\n]*\n"
+    r"Send times:[^\n]*\n"
+    r"GPS:" + _INLINE_SPACE + "*" + _DMS_GROUPS + _INLINE_SPACE + "+" + _DMS_GROUPS
+    + _INLINE_SPACE + r"*(?:\n|\Z)"
+)
+
+
+class CameraStatus:
+    """
+    Kompakter Datensatz einer Kamera-Statusmeldung
+
+    Nicht gesetzte Felder sind None; to_dict() erzeugt das bisherige
+    Dict-Format der API (nur vorhandene Felder).
+    """
+
+    __slots__ = (
+        "imei", "cam_id", "signal_quality", "temperature", "date", "date_str",
+        "battery", "sd_used_mb", "sd_total_mb", "sd_percent", "total_pics",
+        "latitude", "longitude", "file_path", "file_modified", "revier"
+    )
+
+    def __init__(self):
+        self.imei: Optional[str] = None
+        self.cam_id: Optional[str] = None
+        self.signal_quality: Optional[int] = None
+        self.temperature: Optional[int] = None
+        self.date: Optional[datetime] = None
+        self.date_str: Optional[str] = None
+        self.battery: Optional[int] = None
+        self.sd_used_mb: Optional[int] = None
+        self.sd_total_mb: Optional[int] = None
+        self.sd_percent: Optional[float] = None
+        self.total_pics: Optional[int] = None
+        self.latitude: Optional[float] = None
+        self.longitude: Optional[float] = None
+        self.file_path: Optional[str] = None
+        self.file_modified: Optional[str] = None
+        self.revier: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        """
+        Wandelt den Datensatz in das Dict-Format der API um
+
+        Returns:
+            dict: Felder wie bisher von parse_camera_status_file geliefert
+        """
+        data = {}
+        if self.imei is not None:
+            data['imei'] = self.imei
+        if self.cam_id is not None:
+            data['cam_id'] = self.cam_id
+        if self.signal_quality is not None:
+            data['signal_quality'] = self.signal_quality
+        if self.temperature is not None:
+            data['temperature'] = self.temperature
+        if self.date is not None:
+            data['date'] = self.date
+            data['date_iso'] = self.date.isoformat()
+        elif self.date_str is not None:
+            data['date_str'] = self.date_str
+        if self.battery is not None:
+            data['battery'] = self.battery
+        if self.sd_used_mb is not None:
+            data['sd_used_mb'] = self.sd_used_mb
+            data['sd_total_mb'] = self.sd_total_mb
+            data['sd_percent'] = self.sd_percent
+        if self.total_pics is not None:
+            data['total_pics'] = self.total_pics
+        if self.latitude is not None:
+            data['latitude'] = self.latitude
+            data['longitude'] = self.longitude
+        if self.file_path is not None:
+            data['file_path'] = self.file_path
+            data['file_name'] = os.path.basename(self.file_path)
+            data['file_modified'] = self.file_modified
+        if self.revier is not None:
+            data['revier'] = self.revier
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CameraStatus":
+        """
+        Erzeugt einen Datensatz aus dem Dict-Format (z.B. aus einem gespeicherten Index)
+
+        Args:
+            data: Status-Dict wie von to_dict() geliefert (date optional als date_iso)
+
+        Returns:
+            CameraStatus
+        """
+        status = cls()
+        for field in cls.__slots__:
+            if field in data:
+                setattr(status, field, data[field])
+        if status.date is None and 'date_iso' in data:
+            status.date = datetime.fromisoformat(data['date_iso'])
+        return status
+
 
 def dms_to_decimal(dms_string: str) -> Optional[float]:
     """
@@ -25,9 +149,7 @@ def dms_to_decimal(dms_string: str) -> Optional[float]:
         float: Dezimalgrad (negativ für S/W)
     """
     try:
-        # Pattern: (N|S|E|W)(\d+)\*(\d+)'(\d+)"
-        pattern = r"([NSEW])(\d+)\*(\d+)'(\d+)\""
-        match = re.match(pattern, dms_string.strip())
+        match = DMS_PATTERN.match(dms_string.strip())
 
         if not match:
             logger.warning(f"GPS-Format nicht erkannt: {dms_string}")
@@ -82,9 +204,9 @@ def parse_gps_line(gps_line: str) -> Optional[Tuple[float, float]]:
         return None
 
 
-def parse_camera_status_file(file_path: str) -> Optional[Dict]:
+def parse_camera_status(content: str) -> CameraStatus:
     """
-    Parst eine Kamera-Status-Datei
+    Parst den Inhalt einer Kamera-Statusmeldung (Datei oder SMS) in einem Durchlauf
 
     Beispiel-Format:
     IMEI:860946061745033
@@ -98,84 +220,214 @@ def parse_camera_status_file(file_path: str) -> Optional[Dict]:
     Send times:1
     GPS:N48*45'58" E011*09'58"
 
+    Jede Zeile wird einmal am ersten ':' getrennt und über den Schlüssel
+    dem Feld zugeordnet. Wie bisher gilt pro Feld das erste passende
+    Vorkommen.
+
+    Args:
+        content: Text der Statusmeldung
+
     Returns:
-        dict: Parsed data oder None bei Fehler
+        CameraStatus (Felder ohne Treffer bleiben None)
+    """
+    match = _STANDARD_STATUS.match(content)
+    if match:
+        return _status_from_standard_match(match)
+
+    status = CameraStatus()
+    date_seen = False
+    gps_seen = False
+
+    for line in content.split('\n'):
+        key, separator, value = line.partition(':')
+        if not separator:
+            continue
+        key = key.lstrip(' \t\ufeff')
+
+        if key == 'IMEI':
+            if status.imei is None:
+                match = _IMEI_VALUE.match(value)
+                if match:
+                    status.imei = match.group(0)
+
+        elif key == 'CSQ':
+            if status.signal_quality is None:
+                match = _DIGITS_VALUE.match(value)
+                if match:
+                    status.signal_quality = int(match.group(0))
+
+        elif key == 'CamID':
+            if status.cam_id is None and value:
+                status.cam_id = value.strip()
+
+        elif key == 'Temp':
+            if status.temperature is None:
+                match = _DIGITS_VALUE.match(value)
+                if match:
+                    status.temperature = int(match.group(0))
+
+        elif key == 'Date':
+            if not date_seen:
+                match = _DATE_VALUE.match(value)
+                if match:
+                    date_seen = True
+                    try:
+                        status.date = _status_datetime(*match.groups())
+                    except ValueError:
+                        status.date_str = match.group(0)
+
+        elif key == 'Battery':
+            if status.battery is None:
+                match = _BATTERY_VALUE.match(value)
+                if match:
+                    status.battery = int(match.group(1))
+
+        elif key == 'SD':
+            if status.sd_used_mb is None:
+                match = _SD_VALUE.match(value)
+                if match:
+                    used, total = int(match.group(1)), int(match.group(2))
+                    status.sd_percent = _sd_percent(used, total)
+                    status.sd_used_mb = used
+                    status.sd_total_mb = total
+
+        elif key == 'Total Pics':
+            if status.total_pics is None:
+                match = _DIGITS_VALUE.match(value)
+                if match:
+                    status.total_pics = int(match.group(0))
+
+        elif key == 'GPS':
+            if not gps_seen and value:
+                gps_seen = True
+                coords = parse_gps_line("GPS:" + value)
+                if coords:
+                    status.latitude, status.longitude = coords
+
+    return status
+
+
+def _sd_percent(used: int, total: int) -> Optional[float]:
+    """Belegung der SD-Karte in Prozent (None ohne Karte, z.B. "SD:0M/0M")"""
+    if total <= 0:
+        return None
+    return round((used / total) * 100, 1)
+
+
+def _status_datetime(day: str, month: str, year: str, hour: str, minute: str, second: str) -> datetime:
+    """Datum aus den Regex-Gruppen von "Date:dd/mm/yyyy HH:MM:SS" (ValueError bei ungültigem Datum)"""
+    return datetime.fromisoformat(f"{year}-{month}-{day}T{hour}:{minute}:{second}")
+
+
+def _dms_groups_to_decimal(direction: str, degrees: str, minutes: str, seconds: str) -> float:
+    """Dezimalgrad aus den Regex-Gruppen einer DMS-Angabe (wie dms_to_decimal)"""
+    decimal = float(degrees) + float(minutes)/60 + float(seconds)/3600
+    return -decimal if direction in ('S', 'W') else decimal
+
+
+def _status_from_standard_match(match: "re.Match") -> CameraStatus:
+    """Erzeugt den Datensatz aus einem Treffer von _STANDARD_STATUS"""
+    (imei, csq, cam_id, temp, date_str, day, month, year, hour, minute, second,
+     battery, sd_used, sd_total, total_pics,
+     lat_dir, lat_deg, lat_min, lat_sec, lng_dir, lng_deg, lng_min, lng_sec) = match.groups()
+
+    status = CameraStatus()
+    status.imei = imei
+    status.signal_quality = int(csq)
+    status.cam_id = cam_id.strip()
+    status.temperature = int(temp)
+    try:
+        status.date = _status_datetime(day, month, year, hour, minute, second)
+    except ValueError:
+        status.date_str = date_str
+    status.battery = int(battery)
+    used, total = int(sd_used), int(sd_total)
+    status.sd_percent = _sd_percent(used, total)
+    status.sd_used_mb = used
+    status.sd_total_mb = total
+    status.total_pics = int(total_pics)
+    status.latitude = _dms_groups_to_decimal(lat_dir, lat_deg, lat_min, lat_sec)
+    status.longitude = _dms_groups_to_decimal(lng_dir, lng_deg, lng_min, lng_sec)
+    return status
+
+
+def parse_camera_status_text(content: str) -> Dict:
+    """
+    Parst den Inhalt einer Kamera-Statusmeldung (Format siehe parse_camera_status)
+
+    Args:
+        content: Text der Statusmeldung
+
+    Returns:
+        dict: Parsed data (leer, wenn keine Felder erkannt wurden)
+    """
+    return parse_camera_status(content).to_dict()
+
+
+def read_camera_status_file(file_path: str, mtime: Optional[float] = None) -> Optional[CameraStatus]:
+    """
+    Liest und parst eine Kamera-Status-Datei
+
+    Args:
+        file_path: Pfad zur Status-Datei
+        mtime: Bereits bekannte Änderungszeit (spart einen stat()-Aufruf)
+
+    Returns:
+        CameraStatus oder None bei Fehler
     """
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
 
-        data = {}
-
-        # IMEI
-        imei_match = re.search(r'IMEI:(\S+)', content)
-        if imei_match:
-            data['imei'] = imei_match.group(1)
-
-        # CamID
-        camid_match = re.search(r'CamID:(.+)', content)
-        if camid_match:
-            data['cam_id'] = camid_match.group(1).strip()
-
-        # CSQ (Signal Quality)
-        csq_match = re.search(r'CSQ:(\d+)', content)
-        if csq_match:
-            data['signal_quality'] = int(csq_match.group(1))
-
-        # Temperature
-        temp_match = re.search(r'Temp:(\d+)', content)
-        if temp_match:
-            data['temperature'] = int(temp_match.group(1))
-
-        # Date
-        date_match = re.search(r'Date:(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}:\d{2})', content)
-        if date_match:
-            date_str = date_match.group(1)
-            try:
-                data['date'] = datetime.strptime(date_str, '%d/%m/%Y %H:%M:%S')
-                data['date_iso'] = data['date'].isoformat()
-            except:
-                data['date_str'] = date_str
-
-        # Battery
-        battery_match = re.search(r'Battery:(\d+)%', content)
-        if battery_match:
-            data['battery'] = int(battery_match.group(1))
-
-        # SD Card
-        sd_match = re.search(r'SD:(\d+)M/(\d+)M', content)
-        if sd_match:
-            data['sd_used_mb'] = int(sd_match.group(1))
-            data['sd_total_mb'] = int(sd_match.group(2))
-            data['sd_percent'] = round((data['sd_used_mb'] / data['sd_total_mb']) * 100, 1)
-
-        # Total Pictures
-        pics_match = re.search(r'Total Pics:(\d+)', content)
-        if pics_match:
-            data['total_pics'] = int(pics_match.group(1))
-
-        # GPS
-        gps_match = re.search(r'GPS:(.+)', content)
-        if gps_match:
-            gps_line = gps_match.group(1)
-            coords = parse_gps_line("GPS:" + gps_line)
-            if coords:
-                data['latitude'] = coords[0]
-                data['longitude'] = coords[1]
+        status = parse_camera_status(content)
 
         # File metadata
-        data['file_path'] = file_path
-        data['file_name'] = os.path.basename(file_path)
-        file_mtime = os.path.getmtime(file_path)
-        data['file_modified'] = datetime.fromtimestamp(file_mtime).isoformat()
+        if mtime is None:
+            mtime = os.path.getmtime(file_path)
+        status.file_path = file_path
+        status.file_modified = datetime.fromtimestamp(mtime).isoformat()
 
-        return data
+        return status
 
     except Exception as e:
         logger.error(f"Fehler beim Parsen von {file_path}: {e}")
         return None
 
 
+def parse_camera_status_files(
+    file_paths: Iterable[str],
+    mtimes: Optional[Dict[str, float]] = None
+) -> List[CameraStatus]:
+    """
+    Parst viele Kamera-Status-Dateien in einem Aufruf (z.B. eine ganze Saison)
+
+    Args:
+        file_paths: Pfade der Status-Dateien
+        mtimes: Optionale bekannte Änderungszeiten je Pfad
+
+    Returns:
+        Liste der erfolgreich geparsten Datensätze (fehlerhafte Dateien werden übersprungen)
+    """
+    mtimes = mtimes or {}
+    statuses = []
+    for file_path in file_paths:
+        status = read_camera_status_file(file_path, mtimes.get(file_path))
+        if status is not None:
+            statuses.append(status)
+    return statuses
+
+
+def parse_camera_status_file(file_path: str) -> Optional[Dict]:
+    """
+    Parst eine Kamera-Status-Datei (Format siehe parse_camera_status)
+
+    Returns:
+        dict: Parsed data oder None bei Fehler
+    """
+    status = read_camera_status_file(file_path)
+    return status.to_dict() if status is not None else None
+
+
 def point_in_polygon(point: Tuple[float, float], polygon: List[Tuple[float, float]]) -> bool:
     """
     Ray-casting Algorithmus für Point-in-Polygon Check
@@ -268,44 +520,54 @@ def get_camera_status_files(
 
 def filter_cameras_in_polygons(
     cameras: List[Dict],
-    polygons: Dict[str, List[Tuple[float, float]]]
+    polygons: Union[PolygonGridIndex, Dict[str, List[Tuple[float, float]]]]
 ) -> List[Dict]:
     """
-    Filtert Kameras die innerhalb der Revier-Polygone liegen
+    Filtert Kameras die innerhalb einer Revier-Parzelle liegen
+
+    Jede Kamera wird der Parzelle zugeordnet, die sie enthält; liegen
+    mehrere Parzellen übereinander, gewinnt eine Parzelle des eigenen
+    Reviers der Kamera.
 
     Args:
         cameras: Liste von Kamera-Status-Dicts mit latitude/longitude
-        polygons: Dict {revier_name: [(lat, lng), ...]}
+        polygons: PolygonGridIndex oder Dict {revier_name: [(lat, lng), ...]}
 
     Returns:
         Liste von Kameras die in Polygonen liegen, erweitert um 'in_revier' Field
     """
-    filtered_cameras = []
+    if not isinstance(polygons, PolygonGridIndex):
+        polygons = PolygonGridIndex([
+            RevierPolygon.from_points(revier_name, polygon)
+            for revier_name, polygon in polygons.items()
+            if polygon
+        ])
+
+    located = [
+        camera for camera in cameras
+        if camera.get('latitude') is not None and camera.get('longitude') is not None
+    ]
+    if len(located) < len(cameras):
+        logger.debug(f"{len(cameras) - len(located)} Kameras ohne GPS-Koordinaten")
+
+    # Alle Positionen in einem Durchlauf zuordnen
+    matches_per_camera = polygons.find_many(
+        [camera['latitude'] for camera in located],
+        [camera['longitude'] for camera in located]
+    )
 
-    for camera in cameras:
-        lat = camera.get('latitude')
-        lng = camera.get('longitude')
-
-        if lat is None or lng is None:
-            logger.debug(f"Kamera {camera.get('cam_id', 'Unknown')} hat keine GPS-Koordinaten")
+    filtered_cameras = []
+    for camera, matches in zip(located, matches_per_camera):
+        if not matches:
             continue
 
-        point = (lat, lng)
         camera_revier = camera.get('revier')
-
-        # Prüfe ob Punkt im entsprechenden Revier-Polygon liegt
-        if camera_revier in polygons:
-            polygon = polygons[camera_revier]
-
-            if point_in_polygon(point, polygon):
-                camera['in_polygon'] = True
-                camera['in_revier'] = camera_revier
-                filtered_cameras.append(camera)
-                logger.debug(f"Kamera {camera.get('cam_id')} ist in {camera_revier} Polygon")
-            else:
-                logger.debug(f"Kamera {camera.get('cam_id')} NICHT in {camera_revier} Polygon")
-        else:
-            logger.debug(f"Kein Polygon für Revier {camera_revier} gefunden")
+        parcel = next((p for p in matches if p.revier == camera_revier), matches[0])
+        camera['in_polygon'] = True
+        camera['in_revier'] = parcel.revier
+        if parcel.name:
+            camera['in_parcel'] = parcel.name
+        filtered_cameras.append(camera)
 
     logger.info(f"{len(filtered_cameras)} von {len(cameras)} Kameras liegen in Polygonen")
     return filtered_cameras
@@ -0,0 +1,142 @@
+"""
+Speicher für Kamera-Statusmeldungen, die per SMS eingehen
+Hält die Meldungen im Speicher, damit /cameras/status sie ohne Umweg über
+die txtFiles auf dem NAS ausliefern kann, und hängt jede Meldung in einem
+eigenen Schreib-Thread an eine JSON-Lines-Datei an, damit sie einen Neustart
+überstehen (auf der SIM sind sie nach dem Lesen bereits gelöscht)
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CameraStatusStore:
+    """
+    Sammelt per SMS empfangene Kamera-Statusmeldungen
+
+    Meldungen werden in Empfangsreihenfolge gehalten; die ältesten fallen
+    heraus, sobald max_entries überschritten ist. Die Datei wird beim Laden
+    und nach doppelt so vielen Zeilen auf max_entries gekürzt.
+    """
+
+    def __init__(self, max_entries: int = 5000, status_file: Optional[str] = "camera_status_sms.jsonl"):
+        """
+        Initialisiert den Status-Speicher
+
+        Args:
+            max_entries: Maximale Anzahl gehaltener Meldungen
+            status_file: Pfad zur JSON-Lines-Datei (None = nur im Speicher)
+        """
+        self.max_entries = max_entries
+        self.status_file = status_file
+        self._statuses: Deque[Dict[str, Any]] = deque(maxlen=max_entries)
+        self._file_lines = 0
+        self._lock = threading.Lock()
+        # Ein einzelner Thread schreibt die Datei, damit die Reihenfolge erhalten bleibt
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="camera-status-writer")
+        self._load()
+
+    @staticmethod
+    def _to_line(status: Dict[str, Any]) -> str:
+        """Serialisiert eine Meldung (datetime "date" steckt bereits als "date_iso" drin)"""
+        data = {key: value for key, value in status.items() if key != "date"}
+        return json.dumps(data, ensure_ascii=False) + "\n"
+
+    @staticmethod
+    def _from_line(line: str) -> Dict[str, Any]:
+        """Liest eine Meldung aus einer Zeile der Datei"""
+        status = json.loads(line)
+        if "date_iso" in status:
+            status["date"] = datetime.fromisoformat(status["date_iso"])
+        return status
+
+    def _load(self):
+        """Lädt gespeicherte Meldungen (defekte Zeilen werden übersprungen)"""
+        if not self.status_file or not os.path.exists(self.status_file):
+            return
+
+        try:
+            with open(self.status_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        self._statuses.append(self._from_line(line))
+                    except ValueError:
+                        logger.warning(f"Defekte Zeile in {self.status_file} übersprungen")
+            self._rewrite(list(self._statuses))
+            self._file_lines = len(self._statuses)
+            logger.info(f"{len(self._statuses)} SMS-Statusmeldungen geladen")
+        except Exception as e:
+            logger.error(f"Fehler beim Laden der SMS-Statusmeldungen: {e}")
+
+    def _rewrite(self, statuses: List[Dict[str, Any]]):
+        """Schreibt die Datei atomar mit den übergebenen Meldungen neu"""
+        tmp_file = f"{self.status_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.writelines(self._to_line(status) for status in statuses)
+        os.replace(tmp_file, self.status_file)
+
+    def _append(self, status: Dict[str, Any]):
+        """Hängt eine Meldung an die Datei an"""
+        with open(self.status_file, "a", encoding="utf-8") as f:
+            f.write(self._to_line(status))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _persist(self, write: Callable[[Any], None], argument: Any):
+        """Führt einen Schreibvorgang im Schreib-Thread aus"""
+        try:
+            write(argument)
+        except Exception as e:
+            logger.error(f"Fehler beim Speichern der SMS-Statusmeldungen: {e}")
+
+    def add(self, status: Dict[str, Any]):
+        """
+        Nimmt eine geparste Statusmeldung auf und speichert sie (im Hintergrund)
+
+        Args:
+            status: Status-Dict (siehe parse_camera_status_text) mit "received"
+        """
+        with self._lock:
+            self._statuses.append(status)
+            if self.status_file:
+                # Der Schnappschuss zum Kürzen entsteht hier, damit er genau die
+                # bis jetzt eingeplanten Zeilen ersetzt
+                if self._file_lines >= 2 * self.max_entries:
+                    snapshot = list(self._statuses)
+                    self._file_lines = len(snapshot)
+                    self._writer.submit(self._persist, self._rewrite, snapshot)
+                else:
+                    self._file_lines += 1
+                    self._writer.submit(self._persist, self._append, status)
+
+        logger.info(
+            f"Status per SMS empfangen: {status.get('cam_id', 'Unknown')} "
+            f"({status.get('imei', 'ohne IMEI')})"
+        )
+
+    def get_statuses(self, days_back: int = 7) -> List[Dict[str, Any]]:
+        """
+        Liefert alle Meldungen der letzten Tage
+
+        Args:
+            days_back: Wie viele Tage zurück sollen Meldungen geliefert werden
+
+        Returns:
+            Liste von Status-Dicts (Kopien), älteste zuerst
+        """
+        cutoff = (datetime.now() - timedelta(days=days_back)).isoformat()
+        with self._lock:
+            return [dict(status) for status in self._statuses if status["received"] >= cutoff]
+
+    def close(self):
+        """Wartet auf ausstehende Schreibvorgänge (beim Herunterfahren aufrufen)"""
+        self._writer.shutdown(wait=True)
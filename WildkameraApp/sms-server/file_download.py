@@ -0,0 +1,307 @@
+"""
+Datei-Downloads direkt von der Platte
+Streamt Dateien ohne sie in den Speicher zu laden und unterstützt ETag
+(If-None-Match → 304) sowie Byte-Bereiche (Range → 206) für fortsetzbare Downloads;
+mehrere Dateien lassen sich als unkomprimiertes ZIP-Bündel streamen
+"""
+import logging
+import os
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import anyio
+from fastapi.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+def quote_etag(value: str) -> str:
+    """Setzt einen Wert als starkes ETag in Anführungszeichen"""
+    return f'"{value}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Prüft If-None-Match gegen ein ETag (schwacher Vergleich)
+
+    Args:
+        if_none_match: Header-Wert, z.B. '"abc", W/"def"' oder '*'
+        etag: Eigenes ETag inkl. Anführungszeichen
+
+    Returns:
+        True wenn der Client die aktuelle Version bereits hat
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    own = opaque(etag)
+    return any(opaque(tag) == own for tag in if_none_match.split(","))
+
+
+def parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Wertet einen Range-Header mit genau einem Byte-Bereich aus
+
+    Args:
+        range_header: z.B. "bytes=0-1023", "bytes=1024-" oder "bytes=-500"
+        file_size: Dateigröße in Bytes
+
+    Returns:
+        (start, end) inklusive, oder None wenn der Header ignoriert werden soll
+        (ungültig oder mehrere Bereiche → komplette Datei)
+
+    Raises:
+        ValueError: Bereich liegt vollständig hinter dem Dateiende
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, dash, last = ranges.strip().partition("-")
+    first = first.strip()
+    last = last.strip()
+    if not dash or not (first.isdigit() or first == "") or not (last.isdigit() or last == ""):
+        return None
+
+    if first == "":
+        # Suffix: die letzten N Bytes
+        if last == "":
+            return None
+        suffix_length = int(last)
+        if suffix_length == 0 or file_size == 0:
+            raise ValueError("Leerer Bereich")
+        return (max(file_size - suffix_length, 0), file_size - 1)
+
+    start = int(first)
+    end = int(last) if last else file_size - 1
+    if last and end < start:
+        return None
+    if start >= file_size:
+        raise ValueError("Bereich hinter Dateiende")
+    return (start, min(end, file_size - 1))
+
+
+class FileRangeResponse(FileResponse):
+    """FileResponse für einen Byte-Bereich einer Datei (206 Partial Content)"""
+
+    def __init__(self, path: str, start: int, end: int, stat_result: os.stat_result, **kwargs):
+        """
+        Args:
+            path: Pfad zur Datei
+            start: Erstes Byte (inklusive)
+            end: Letztes Byte (inklusive)
+            stat_result: os.stat() der Datei
+            **kwargs: Weitere Parameter für FileResponse (headers, media_type, ...)
+        """
+        super().__init__(path, status_code=206, stat_result=stat_result, **kwargs)
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(end - start + 1)
+        self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+        if remaining > 0:
+            # Datei wurde während des Downloads gekürzt
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+
+def file_download_response(
+    file_path: str,
+    etag: str,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None,
+    if_none_match: Optional[str] = None,
+    range_header: Optional[str] = None,
+    if_range: Optional[str] = None
+) -> Response:
+    """
+    Liefert eine Datei als Stream mit ETag- und Range-Unterstützung
+
+    Args:
+        file_path: Pfad zur Datei
+        etag: ETag-Wert ohne Anführungszeichen (z.B. MD5 der Datei)
+        media_type: Content-Type
+        headers: Zusätzliche Header (Content-Disposition, ...)
+        if_none_match: If-None-Match des Requests
+        range_header: Range des Requests
+        if_range: If-Range des Requests (Range nur bei passendem ETag)
+
+    Returns:
+        304 Not Modified, 206 Partial Content, 416 oder 200 mit der ganzen Datei
+    """
+    quoted_etag = quote_etag(etag)
+    response_headers = {
+        "ETag": quoted_etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "no-cache",
+        **(headers or {})
+    }
+
+    if etag_matches(if_none_match, quoted_etag):
+        return Response(status_code=304, headers={"ETag": quoted_etag, "Cache-Control": "no-cache"})
+
+    stat_result = os.stat(file_path)
+
+    if range_header and (not if_range or if_range.strip() == quoted_etag):
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{stat_result.st_size}", "ETag": quoted_etag}
+            )
+
+        if byte_range is not None:
+            start, end = byte_range
+            return FileRangeResponse(
+                file_path,
+                start,
+                end,
+                stat_result,
+                headers=response_headers,
+                media_type=media_type
+            )
+
+    return FileResponse(
+        file_path,
+        stat_result=stat_result,
+        headers=response_headers,
+        media_type=media_type
+    )
+
+
+class _ZipStreamBuffer:
+    """Nicht-seekbares Schreibziel für zipfile, das die geschriebenen Bytes sammelt"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        """Gibt die bisher geschriebenen Bytes zurück und leert den Puffer"""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def open_zip_sources(files: List[Tuple[str, str]]) -> Tuple[List[Tuple[BinaryIO, zipfile.ZipInfo]], List[str]]:
+    """
+    Öffnet die Dateien für iter_zip_stream vorab
+
+    So steht vor dem ersten Byte des Archivs fest, welche Dateien es enthält
+    (z.B. für ein vorangestelltes Manifest). Nicht lesbare Dateien werden
+    protokolliert und ausgelassen.
+
+    Args:
+        files: Liste von (Dateipfad, Name im Archiv)
+
+    Returns:
+        (geöffnete Dateien mit ZipInfo, Namen im Archiv der ausgelassenen Dateien)
+    """
+    sources = []
+    skipped = []
+    for file_path, arcname in files:
+        try:
+            file = open(file_path, "rb")
+        except OSError as e:
+            logger.warning(f"Datei für ZIP-Bündel nicht lesbar, ausgelassen: {file_path} ({e})")
+            skipped.append(arcname)
+            continue
+
+        try:
+            # file_size vorab setzen, damit zipfile bei Bedarf ZIP64 verwendet
+            zip_info = zipfile.ZipInfo.from_file(file_path, arcname, strict_timestamps=False)
+        except OSError as e:
+            file.close()
+            logger.warning(f"Datei für ZIP-Bündel nicht lesbar, ausgelassen: {file_path} ({e})")
+            skipped.append(arcname)
+            continue
+        zip_info.compress_type = zipfile.ZIP_STORED
+        sources.append((file, zip_info))
+
+    return sources, skipped
+
+
+def iter_zip_stream(
+    sources: List[Tuple[BinaryIO, zipfile.ZipInfo]],
+    extra_members: Optional[Dict[str, bytes]] = None,
+    chunk_size: int = 64 * 1024
+) -> Iterator[bytes]:
+    """
+    Erzeugt ein ZIP-Archiv als Stream, ohne es im Speicher oder auf der Platte aufzubauen
+
+    Die Dateien werden unkomprimiert (ZIP_STORED) übernommen, da KMZ bereits
+    komprimiert sind, und nach dem Schreiben (bzw. bei Abbruch) geschlossen.
+
+    Args:
+        sources: Geöffnete Dateien mit ZipInfo aus open_zip_sources()
+        extra_members: Zusätzliche Einträge aus dem Speicher, die vorangestellt werden (z.B. Manifest)
+        chunk_size: Lesegröße in Bytes
+
+    Yields:
+        Teile des ZIP-Archivs
+    """
+    try:
+        buffer = _ZipStreamBuffer()
+        with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for name, data in (extra_members or {}).items():
+                archive.writestr(name, data)
+                yield buffer.drain()
+
+            for file, zip_info in sources:
+                with file, archive.open(zip_info, mode="w") as member:
+                    while True:
+                        chunk = file.read(chunk_size)
+                        if not chunk:
+                            break
+                        member.write(chunk)
+                        yield buffer.drain()
+                yield buffer.drain()
+
+        yield buffer.drain()
+    finally:
+        for file, _ in sources:
+            file.close()
@@ -0,0 +1,374 @@
+"""
+Geometrie-Extraktion aus KMZ-Dateien
+Liest die KML per iterparse als Stream, liefert Placemarks als kompakte
+Koordinaten-Arrays (optional vereinfacht) und serialisiert sie als GeoJSON
+oder im gepackten Binärformat; Ergebnisse werden je KMZ-Hash gecacht
+"""
+import json
+import logging
+import math
+import struct
+import sys
+import threading
+import xml.etree.ElementTree as ET
+import zipfile
+from array import array
+from collections import OrderedDict
+from typing import IO, Any, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Gepacktes Format (Little Endian):
+#   Header:  b"KGEO" | u8 Version | u32 Anzahl Features
+#   Feature: u8 Typ (1=Point, 2=LineString, 3=Polygon) | u16 Namenslänge | Name (UTF-8) | u16 Anzahl Ringe
+#   Ring:    u32 Anzahl Punkte | Punkte als (i32 lng, i32 lat) in 1e-7 Grad
+PACKED_MAGIC = b"KGEO"
+PACKED_VERSION = 1
+PACKED_SCALE = 10_000_000
+GEOMETRY_TYPE_CODES = {"Point": 1, "LineString": 2, "Polygon": 3}
+
+# Meter je Grad Breite (für die lokale Projektion bei der Vereinfachung)
+METERS_PER_DEGREE = 111_320.0
+
+GEOMETRY_FORMATS = ("geojson", "packed")
+
+
+class KmlFeature(NamedTuple):
+    """Geometrie eines Placemarks; Ringe als array('d') [lng0, lat0, lng1, lat1, ...]"""
+    name: Optional[str]
+    geometry_type: str
+    rings: List[array]
+
+
+def _local_name(tag: str) -> str:
+    """Tag-Name ohne Namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_coordinates(text: Optional[str]) -> array:
+    """Wandelt einen <coordinates>-Text (lng,lat,alt ...) in array('d') [lng, lat, ...]"""
+    coords = array('d')
+    for point in (text or "").split():
+        parts = point.split(',')
+        if len(parts) >= 2:
+            coords.append(float(parts[0]))
+            coords.append(float(parts[1]))
+    return coords
+
+
+def parse_kml_stream(stream: IO[bytes]) -> List[KmlFeature]:
+    """
+    Liest alle Punkte, Linien und Polygone (mit Löchern) aus einem KML-Stream
+
+    Verarbeitete Placemarks werden sofort aus dem Baum entfernt, sodass
+    auch große Dateien nur wenig Speicher belegen.
+
+    Args:
+        stream: Binärer Stream der KML-Datei
+
+    Returns:
+        Liste der Features in Dokumentreihenfolge
+    """
+    features: List[KmlFeature] = []
+    path: List[str] = []
+    placemark_name: Optional[str] = None
+    rings: List[array] = []
+    coordinates: Optional[array] = None
+
+    for event, element in ET.iterparse(stream, events=("start", "end")):
+        tag = _local_name(element.tag)
+
+        if event == "start":
+            path.append(tag)
+            if tag == "Placemark":
+                placemark_name = None
+            elif tag == "Polygon":
+                rings = []
+            continue
+
+        path.pop()
+        parent = path[-1] if path else None
+
+        if tag == "name" and parent == "Placemark":
+            placemark_name = (element.text or "").strip() or None
+        elif tag == "coordinates":
+            coordinates = _parse_coordinates(element.text)
+        elif tag == "LinearRing":
+            if coordinates and parent in ("outerBoundaryIs", "innerBoundaryIs"):
+                # Äußerer Ring immer zuerst
+                if parent == "outerBoundaryIs":
+                    rings.insert(0, coordinates)
+                else:
+                    rings.append(coordinates)
+            coordinates = None
+        elif tag == "Polygon":
+            if rings:
+                features.append(KmlFeature(placemark_name, "Polygon", rings))
+            rings = []
+        elif tag in ("LineString", "Point"):
+            if coordinates:
+                features.append(KmlFeature(placemark_name, tag, [coordinates]))
+            coordinates = None
+        elif tag == "Placemark":
+            placemark_name = None
+            element.clear()
+
+    return features
+
+
+def read_kmz_geometry(kmz_path: str) -> List[KmlFeature]:
+    """
+    Liest die Geometrie der ersten KML-Datei einer KMZ als Stream
+
+    Args:
+        kmz_path: Pfad zur KMZ-Datei
+
+    Returns:
+        Liste der Features
+
+    Raises:
+        ValueError: Keine KML-Datei im KMZ-Archiv
+    """
+    with zipfile.ZipFile(kmz_path, 'r') as kmz:
+        kml_files = [f for f in kmz.namelist() if f.endswith('.kml')]
+        if not kml_files:
+            raise ValueError("Keine KML-Datei im KMZ-Archiv gefunden")
+        with kmz.open(kml_files[0]) as stream:
+            return parse_kml_stream(stream)
+
+
+def simplify_coordinates(coords: array, tolerance: float) -> array:
+    """
+    Vereinfacht eine Linie bzw. einen Ring nach Douglas-Peucker
+
+    Gerechnet wird in einer lokalen Projektion in Metern; Anfangs- und
+    Endpunkt bleiben erhalten, Ringe also geschlossen. Ringe werden nie
+    unter 4 Punkte vereinfacht.
+
+    Args:
+        coords: Punkte als array('d') [lng0, lat0, ...]
+        tolerance: Maximale Abweichung in Metern
+
+    Returns:
+        Vereinfachte Punkte (bei tolerance <= 0 die Originaldaten)
+    """
+    point_count = len(coords) // 2
+    if tolerance <= 0 or point_count < 3:
+        return coords
+
+    lat_scale = METERS_PER_DEGREE
+    lng_scale = METERS_PER_DEGREE * math.cos(math.radians(coords[1]))
+    xs = [coords[i] * lng_scale for i in range(0, len(coords), 2)]
+    ys = [coords[i] * lat_scale for i in range(1, len(coords), 2)]
+
+    keep = [False] * point_count
+    keep[0] = keep[-1] = True
+    tolerance_squared = tolerance * tolerance
+    stack: List[Tuple[int, int]] = [(0, point_count - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = xs[first], ys[first]
+        dx = xs[last] - x1
+        dy = ys[last] - y1
+        length_squared = dx * dx + dy * dy
+
+        max_distance = -1.0
+        max_index = first
+        for i in range(first + 1, last):
+            px = xs[i] - x1
+            py = ys[i] - y1
+            if length_squared == 0.0:
+                distance = px * px + py * py
+            else:
+                cross = px * dy - py * dx
+                distance = cross * cross / length_squared
+            if distance > max_distance:
+                max_distance = distance
+                max_index = i
+
+        if max_distance > tolerance_squared:
+            keep[max_index] = True
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+
+    kept = sum(keep)
+    closed = coords[0] == coords[-2] and coords[1] == coords[-1]
+    if closed and kept < 4:
+        return coords
+
+    simplified = array('d')
+    for i in range(point_count):
+        if keep[i]:
+            simplified.append(coords[2 * i])
+            simplified.append(coords[2 * i + 1])
+    return simplified
+
+
+def simplify_features(features: List[KmlFeature], tolerance: float) -> List[KmlFeature]:
+    """Wendet simplify_coordinates auf alle Ringe an"""
+    if tolerance <= 0:
+        return features
+    return [
+        feature._replace(rings=[simplify_coordinates(ring, tolerance) for ring in feature.rings])
+        for feature in features
+    ]
+
+
+def features_to_geojson(features: List[KmlFeature]) -> Dict[str, Any]:
+    """
+    Wandelt Features in eine GeoJSON FeatureCollection (Koordinaten auf 1e-7 Grad gerundet)
+
+    Args:
+        features: Liste der Features
+
+    Returns:
+        GeoJSON-Dict
+    """
+    def positions(ring: array) -> List[List[float]]:
+        return [[round(ring[i], 7), round(ring[i + 1], 7)] for i in range(0, len(ring), 2)]
+
+    geojson_features = []
+    for feature in features:
+        if feature.geometry_type == "Polygon":
+            coordinates: Any = [positions(ring) for ring in feature.rings]
+        elif feature.geometry_type == "LineString":
+            coordinates = positions(feature.rings[0])
+        else:
+            coordinates = positions(feature.rings[0])[0]
+
+        geojson_features.append({
+            "type": "Feature",
+            "properties": {"name": feature.name},
+            "geometry": {"type": feature.geometry_type, "coordinates": coordinates}
+        })
+
+    return {"type": "FeatureCollection", "features": geojson_features}
+
+
+def pack_features(features: List[KmlFeature]) -> bytes:
+    """
+    Serialisiert Features im gepackten Binärformat (siehe PACKED_MAGIC)
+
+    Args:
+        features: Liste der Features
+
+    Returns:
+        Binärdaten
+    """
+    parts = [PACKED_MAGIC, struct.pack("<BI", PACKED_VERSION, len(features))]
+    for feature in features:
+        name = (feature.name or "").encode("utf-8")[:0xFFFF]
+        parts.append(struct.pack("<BH", GEOMETRY_TYPE_CODES[feature.geometry_type], len(name)))
+        parts.append(name)
+        parts.append(struct.pack("<H", len(feature.rings)))
+        for ring in feature.rings:
+            scaled = array('i', [round(value * PACKED_SCALE) for value in ring])
+            if sys.byteorder == "big":
+                scaled.byteswap()
+            parts.append(struct.pack("<I", len(ring) // 2))
+            parts.append(scaled.tobytes())
+    return b"".join(parts)
+
+
+def count_points(features: List[KmlFeature]) -> int:
+    """Gesamtzahl der Punkte aller Features"""
+    return sum(len(ring) // 2 for feature in features for ring in feature.rings)
+
+
+class KmlGeometryCache:
+    """
+    Cache der extrahierten Geometrie je KMZ-Hash
+
+    Geparste Features und fertig serialisierte Payloads (je Format und
+    Toleranz) werden getrennt gehalten; die ältesten Einträge fallen
+    heraus, sobald max_entries überschritten ist.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        """
+        Initialisiert den Cache
+
+        Args:
+            max_entries: Maximale Anzahl KMZ-Dateien bzw. Payloads im Speicher
+        """
+        self.max_entries = max_entries
+        self._features: "OrderedDict[str, List[KmlFeature]]" = OrderedDict()
+        self._payloads: "OrderedDict[Tuple[str, str, float], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, cache: OrderedDict, key: Any, value: Any):
+        """Legt einen Eintrag ab und verdrängt ggf. den ältesten"""
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def get_features(self, file_hash: str, kmz_path: str) -> List[KmlFeature]:
+        """
+        Liefert die Features einer KMZ (liest sie nur beim ersten Zugriff)
+
+        Args:
+            file_hash: MD5-Hash der KMZ
+            kmz_path: Pfad zur KMZ-Datei
+
+        Returns:
+            Liste der Features
+        """
+        with self._lock:
+            features = self._features.get(file_hash)
+            if features is not None:
+                self._features.move_to_end(file_hash)
+                return features
+
+        features = read_kmz_geometry(kmz_path)
+        logger.info(f"Geometrie gelesen: {kmz_path} ({len(features)} Features, {count_points(features)} Punkte)")
+
+        with self._lock:
+            self._remember(self._features, file_hash, features)
+        return features
+
+    def get_payload(
+        self,
+        file_hash: str,
+        kmz_path: str,
+        geometry_format: str,
+        tolerance: float = 0.0
+    ) -> bytes:
+        """
+        Liefert die Geometrie einer KMZ als serialisiertes GeoJSON oder gepackte Bytes
+
+        Args:
+            file_hash: MD5-Hash der KMZ
+            kmz_path: Pfad zur KMZ-Datei
+            geometry_format: "geojson" oder "packed"
+            tolerance: Vereinfachungstoleranz in Metern (0 = keine)
+
+        Returns:
+            GeoJSON (UTF-8) bzw. Binärdaten
+
+        Raises:
+            ValueError: Unbekanntes Format
+        """
+        if geometry_format not in GEOMETRY_FORMATS:
+            raise ValueError(f"Unbekanntes Geometrie-Format: {geometry_format}")
+
+        key = (file_hash, geometry_format, float(tolerance))
+        with self._lock:
+            payload = self._payloads.get(key)
+            if payload is not None:
+                self._payloads.move_to_end(key)
+                return payload
+
+        features = simplify_features(self.get_features(file_hash, kmz_path), tolerance)
+        if geometry_format == "geojson":
+            payload = json.dumps(
+                features_to_geojson(features),
+                ensure_ascii=False,
+                separators=(",", ":")
+            ).encode("utf-8")
+        else:
+            payload = pack_features(features)
+
+        with self._lock:
+            self._remember(self._payloads, key, payload)
+        return payload
@@ -0,0 +1,485 @@
+"""
+KMZ-Katalog für die Reviere-Ordner
+Hält Metadaten und MD5-Hashes aller KMZ-Dateien persistent vor, damit
+nur neue oder geänderte Dateien neu gehasht werden müssen, und führt ein
+versioniertes Änderungsprotokoll für die Delta-Synchronisation der Clients
+"""
+import bisect
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 1
+
+# Maximale Länge des Änderungsprotokolls; ältere Cursor erhalten eine Vollsynchronisation
+SYNC_LOG_MAX_ENTRIES = 10000
+
+
+def calculate_file_hash(file_path: str) -> str:
+    """Berechnet MD5-Hash einer Datei für Änderungserkennung"""
+    hash_md5 = hashlib.md5()
+    try:
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                hash_md5.update(chunk)
+        return hash_md5.hexdigest()
+    except Exception as e:
+        logger.error(f"Fehler beim Hash-Berechnen von {file_path}: {e}")
+        return ""
+
+
+def _file_signature(file_stat: os.stat_result) -> Tuple[int, int, int]:
+    """Signatur (Größe, mtime in ns, Inode) zur Änderungserkennung"""
+    return (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino)
+
+
+class KmzCatalog:
+    """
+    Persistenter Katalog aller KMZ-Dateien unterhalb des Reviere-Verzeichnisses
+
+    Einträge werden über (Pfad, Größe, mtime, Inode) wiedererkannt; nur bei
+    geänderter Signatur wird die Datei neu gehasht. Zusätzlich wird ein
+    Hash-Index für direkte Lookups (Download/Extract) gepflegt.
+    """
+
+    def __init__(self, base_dir: str, catalog_file: str = "kmz_catalog.json"):
+        """
+        Initialisiert den KMZ-Katalog
+
+        Args:
+            base_dir: Basis-Verzeichnis der Reviere
+            catalog_file: Pfad zur JSON-Datei für den Katalog
+        """
+        self.base_dir = base_dir
+        self.catalog_file = catalog_file
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._signatures: Dict[str, Tuple[int, int, int]] = {}
+        self._by_hash: Dict[str, Dict[str, Any]] = {}
+
+        # Änderungsprotokoll auf Hash-Ebene: (Version, "add"/"delete", Hash).
+        # Die Epoche ändert sich, wenn das Protokoll neu beginnt (z.B. Katalog gelöscht).
+        self._sync_epoch = uuid.uuid4().hex[:12]
+        self._sync_version = 0
+        self._sync_log: List[Tuple[int, str, str]] = []
+        self._sync_log_versions: List[int] = []
+        self._sync_log_start = 0
+
+        self._lock = threading.RLock()
+        self._load_catalog()
+
+    def _load_catalog(self):
+        """Lädt den Katalog aus der JSON-Datei"""
+        try:
+            if not os.path.exists(self.catalog_file):
+                logger.info("Kein KMZ-Katalog gefunden, starte mit leerem Katalog")
+                return
+
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            if data.get("version") != CATALOG_VERSION or data.get("base_dir") != self.base_dir:
+                logger.info("KMZ-Katalog veraltet oder für anderes Verzeichnis, wird neu aufgebaut")
+                return
+
+            for item in data.get("files", []):
+                signature = tuple(item.pop("signature"))
+                self._entries[item["full_path"]] = item
+                self._signatures[item["full_path"]] = signature
+
+            sync = data.get("sync")
+            if sync:
+                self._sync_epoch = sync["epoch"]
+                self._sync_version = sync["version"]
+                self._sync_log_start = sync["log_start"]
+                self._sync_log = [tuple(change) for change in sync["log"]]
+                self._sync_log_versions = [change[0] for change in self._sync_log]
+
+            self._rebuild_hash_index(record_changes=False)
+            logger.info(f"KMZ-Katalog geladen: {len(self._entries)} Einträge")
+
+        except Exception as e:
+            logger.error(f"Fehler beim Laden des KMZ-Katalogs: {e}")
+            self._entries = {}
+            self._signatures = {}
+            self._by_hash = {}
+            self._sync_version = 0
+            self._sync_log = []
+            self._sync_log_versions = []
+            self._sync_log_start = 0
+
+    def _save_catalog(self):
+        """Speichert den Katalog atomar (Temp-Datei + Rename)"""
+        try:
+            files = [
+                dict(entry, signature=list(self._signatures[path]))
+                for path, entry in self._entries.items()
+            ]
+            tmp_file = f"{self.catalog_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": CATALOG_VERSION,
+                    "base_dir": self.base_dir,
+                    "files": files,
+                    "sync": {
+                        "epoch": self._sync_epoch,
+                        "version": self._sync_version,
+                        "log_start": self._sync_log_start,
+                        "log": self._sync_log
+                    }
+                }, f, ensure_ascii=False)
+            os.replace(tmp_file, self.catalog_file)
+        except Exception as e:
+            logger.error(f"Fehler beim Speichern des KMZ-Katalogs: {e}")
+
+    def _rebuild_hash_index(self, record_changes: bool = True):
+        """
+        Baut den Hash → Eintrag Index neu auf (erster Treffer gewinnt)
+
+        Args:
+            record_changes: Hinzugekommene/verschwundene Hashes ins Änderungsprotokoll schreiben
+        """
+        by_hash = {}
+        for entry in self._entries.values():
+            if entry["hash"]:
+                by_hash.setdefault(entry["hash"], entry)
+
+        if record_changes:
+            added = by_hash.keys() - self._by_hash.keys()
+            deleted = self._by_hash.keys() - by_hash.keys()
+            if added or deleted:
+                self._record_changes(added, deleted)
+
+        self._by_hash = by_hash
+
+    def _record_changes(self, added, deleted):
+        """Schreibt eine Änderung des Hash-Bestands als neue Version ins Protokoll"""
+        self._sync_version += 1
+        version = self._sync_version
+        for file_hash in sorted(deleted):
+            self._sync_log.append((version, "delete", file_hash))
+            self._sync_log_versions.append(version)
+        for file_hash in sorted(added):
+            self._sync_log.append((version, "add", file_hash))
+            self._sync_log_versions.append(version)
+
+        if len(self._sync_log) > SYNC_LOG_MAX_ENTRIES:
+            # Nur ganze Versionen verwerfen, damit kein Cursor eine halbe Änderung sieht
+            cut = len(self._sync_log) - SYNC_LOG_MAX_ENTRIES
+            self._sync_log_start = self._sync_log_versions[cut - 1]
+            cut = bisect.bisect_right(self._sync_log_versions, self._sync_log_start)
+            del self._sync_log[:cut]
+            del self._sync_log_versions[:cut]
+
+    def _find_kmz_files(self) -> List[str]:
+        """
+        Durchsucht das Reviere-Verzeichnis zweistufig nach KMZ-Dateien:
+        1. Finde alle Ordner namens "kmz" oder "KMZ"
+        2. Suche in diesen Ordnern rekursiv nach .kmz Dateien
+
+        Returns:
+            Liste absoluter Dateipfade (ohne Duplikate)
+        """
+        kmz_folders = []
+        for root, dirs, files in os.walk(self.base_dir):
+            for dir_name in dirs:
+                if dir_name.lower() == "kmz":
+                    kmz_folder_path = os.path.join(root, dir_name)
+                    kmz_folders.append(kmz_folder_path)
+                    logger.debug(f"Gefundener KMZ-Ordner: {kmz_folder_path}")
+
+        logger.debug(f"Gefundene KMZ-Ordner: {len(kmz_folders)}")
+
+        found = {}
+        for kmz_folder in kmz_folders:
+            search_pattern = os.path.join(kmz_folder, "**", "*.kmz")
+            for file_path in glob.glob(search_pattern, recursive=True):
+                found[file_path] = None
+
+        return list(found)
+
+    def _build_entry(self, file_path: str, file_stat: os.stat_result) -> Dict[str, Any]:
+        """Erzeugt einen Katalog-Eintrag und berechnet den Hash"""
+        relative_path = os.path.relpath(file_path, self.base_dir)
+        path_parts = relative_path.split(os.sep)
+        revier_name = path_parts[0] if len(path_parts) > 0 else "Unknown"
+
+        return {
+            "filename": os.path.basename(file_path),
+            "revier": revier_name,
+            "path": relative_path,
+            "full_path": file_path,
+            "size": file_stat.st_size,
+            "modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
+            "hash": calculate_file_hash(file_path)
+        }
+
+    def refresh(self) -> List[Dict[str, Any]]:
+        """
+        Gleicht den Katalog mit dem Dateisystem ab
+
+        Unveränderte Dateien werden nur per stat() geprüft, neu gehasht
+        werden ausschließlich neue oder geänderte Dateien.
+
+        Returns:
+            Liste mit KMZ-Datei-Informationen
+        """
+        if not os.path.exists(self.base_dir):
+            logger.warning(f"Reviere-Verzeichnis nicht gefunden: {self.base_dir}")
+            with self._lock:
+                if self._entries:
+                    self._entries = {}
+                    self._signatures = {}
+                    self._rebuild_hash_index()
+                    self._save_catalog()
+            return []
+
+        file_paths = self._find_kmz_files()
+
+        with self._lock:
+            old_entries = self._entries
+            old_signatures = self._signatures
+
+        # Hashen außerhalb des Locks, damit Leser nicht blockiert werden
+        entries = {}
+        signatures = {}
+        rehashed = 0
+
+        for file_path in file_paths:
+            try:
+                file_stat = os.stat(file_path)
+                signature = _file_signature(file_stat)
+
+                if old_signatures.get(file_path) == signature:
+                    entries[file_path] = old_entries[file_path]
+                else:
+                    entry = self._build_entry(file_path, file_stat)
+                    rehashed += 1
+                    if not entry["hash"]:
+                        # Lesefehler (z.B. NAS kurz weg): nicht aufnehmen, der nächste Abgleich versucht es erneut
+                        continue
+                    entries[file_path] = entry
+                signatures[file_path] = signature
+
+            except Exception as e:
+                logger.error(f"Fehler beim Verarbeiten von {file_path}: {e}")
+
+        with self._lock:
+            changed = rehashed > 0 or entries.keys() != self._entries.keys()
+            self._entries = entries
+            self._signatures = signatures
+
+            if changed:
+                self._rebuild_hash_index()
+                self._save_catalog()
+
+        logger.info(f"Gesamt gefundene KMZ-Dateien: {len(entries)} ({rehashed} neu gehasht)")
+        return self.list_files()
+
+    def is_catalog_path(self, file_path: str) -> bool:
+        """
+        Prüft, ob ein Pfad zum Katalog gehört (.kmz-Datei unterhalb eines
+        "kmz"-Ordners im Reviere-Verzeichnis)
+
+        Args:
+            file_path: Absoluter Dateipfad
+
+        Returns:
+            True wenn die Datei katalogisiert werden soll
+        """
+        filename = os.path.basename(file_path)
+        if not filename.endswith(".kmz") or filename.startswith("."):
+            return False
+
+        relative_path = os.path.relpath(file_path, self.base_dir)
+        if relative_path.startswith(os.pardir):
+            return False
+
+        folders = relative_path.split(os.sep)[:-1]
+        return any(folder.lower() == "kmz" for folder in folders)
+
+    def update_path(self, file_path: str) -> bool:
+        """
+        Aktualisiert einen einzelnen Katalog-Eintrag (z.B. nach Dateisystem-Event)
+
+        Args:
+            file_path: Absoluter Dateipfad
+
+        Returns:
+            True wenn sich der Katalog geändert hat
+        """
+        if not self.is_catalog_path(file_path):
+            return False
+
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
+            return self.remove_path(file_path)
+        except Exception as e:
+            logger.error(f"Fehler beim Verarbeiten von {file_path}: {e}")
+            return False
+
+        signature = _file_signature(file_stat)
+        with self._lock:
+            if self._signatures.get(file_path) == signature:
+                return False
+
+        entry = self._build_entry(file_path, file_stat)
+        if not entry["hash"]:
+            # Lesefehler: veralteten Eintrag verwerfen, beim nächsten Ereignis/Abgleich erneut versuchen
+            return self.remove_path(file_path)
+
+        with self._lock:
+            # Copy-on-write, damit laufende refresh()-Schnappschüsse konsistent bleiben
+            entries = dict(self._entries)
+            signatures = dict(self._signatures)
+            entries[file_path] = entry
+            signatures[file_path] = signature
+            self._entries = entries
+            self._signatures = signatures
+            self._rebuild_hash_index()
+            self._save_catalog()
+
+        logger.info(f"KMZ-Katalog aktualisiert: {entry['path']}")
+        return True
+
+    def remove_path(self, path: str) -> bool:
+        """
+        Entfernt eine Datei oder alle Dateien unterhalb eines Ordners aus dem Katalog
+
+        Args:
+            path: Absoluter Datei- oder Ordnerpfad
+
+        Returns:
+            True wenn sich der Katalog geändert hat
+        """
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            removed = [
+                p for p in self._entries
+                if p == path or p.startswith(prefix)
+            ]
+            if not removed:
+                return False
+
+            removed_set = set(removed)
+            self._entries = {p: e for p, e in self._entries.items() if p not in removed_set}
+            self._signatures = {p: sig for p, sig in self._signatures.items() if p not in removed_set}
+
+            self._rebuild_hash_index()
+            self._save_catalog()
+
+        logger.info(f"KMZ-Katalog: {len(removed)} Einträge entfernt ({path})")
+        return True
+
+    def list_files(self) -> List[Dict[str, Any]]:
+        """
+        Gibt alle Katalog-Einträge aus dem Speicher zurück (ohne Dateisystemzugriff)
+
+        Returns:
+            Liste mit KMZ-Datei-Informationen
+        """
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def sync_cursor(self) -> str:
+        """Aktueller Sync-Cursor ("<Epoche>-<Version>")"""
+        with self._lock:
+            return f"{self._sync_epoch}-{self._sync_version}"
+
+    def get_changes(self, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Liefert die Änderungen seit einem Sync-Cursor (ohne Dateisystemzugriff)
+
+        Kosten wachsen mit der Zahl der Änderungen, nicht mit der Zahl der
+        Dateien. Ist der Cursor unbekannt, zu alt oder aus einer anderen
+        Epoche, wird eine Vollsynchronisation geliefert: files_to_update
+        enthält dann alle Dateien, lokal nicht enthaltene sind zu löschen.
+
+        Args:
+            cursor: Cursor der letzten Synchronisation (None = Erst-Sync)
+
+        Returns:
+            Dict mit cursor, full_sync, files_to_update (Einträge), files_to_delete (Hashes)
+            und total_server_files
+        """
+        with self._lock:
+            current_cursor = f"{self._sync_epoch}-{self._sync_version}"
+
+            since = None
+            if cursor:
+                epoch, _, version = cursor.rpartition("-")
+                if epoch == self._sync_epoch and version.isdigit():
+                    since = int(version)
+            if since is None or since < self._sync_log_start or since > self._sync_version:
+                return {
+                    "cursor": current_cursor,
+                    "full_sync": True,
+                    "files_to_update": [dict(entry) for entry in self._by_hash.values()],
+                    "files_to_delete": [],
+                    "total_server_files": len(self._entries)
+                }
+
+            # Pro Hash zählt der Zustand beim Cursor gegenüber dem aktuellen
+            first_op: Dict[str, str] = {}
+            last_op: Dict[str, str] = {}
+            start = bisect.bisect_right(self._sync_log_versions, since)
+            for _, op, file_hash in self._sync_log[start:]:
+                first_op.setdefault(file_hash, op)
+                last_op[file_hash] = op
+
+            files_to_update = []
+            files_to_delete = []
+            for file_hash, op in last_op.items():
+                existed_before = first_op[file_hash] == "delete"
+                if op == "add" and not existed_before and file_hash in self._by_hash:
+                    files_to_update.append(dict(self._by_hash[file_hash]))
+                elif op == "delete" and existed_before:
+                    files_to_delete.append(file_hash)
+
+            return {
+                "cursor": current_cursor,
+                "full_sync": False,
+                "files_to_update": files_to_update,
+                "files_to_delete": files_to_delete,
+                "total_server_files": len(self._entries)
+            }
+
+    def find_by_hash(self, file_hash: str, refresh_on_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Sucht eine KMZ-Datei anhand ihres MD5-Hashes
+
+        Der Treffer wird per stat() gegen die gespeicherte Signatur geprüft.
+        Nur bei einem Fehlschlag wird (optional) der Katalog aktualisiert.
+
+        Args:
+            file_hash: MD5-Hash der Datei
+            refresh_on_miss: Katalog bei fehlendem Treffer einmal aktualisieren
+
+        Returns:
+            Datei-Informationen oder None
+        """
+        with self._lock:
+            entry = self._by_hash.get(file_hash)
+            if entry is not None:
+                try:
+                    file_stat = os.stat(entry["full_path"])
+                    if self._signatures.get(entry["full_path"]) == _file_signature(file_stat):
+                        return dict(entry)
+                except OSError:
+                    pass
+
+        if not refresh_on_miss:
+            return None
+
+        self.refresh()
+        with self._lock:
+            entry = self._by_hash.get(file_hash)
+            return dict(entry) if entry is not None else None
@@ -0,0 +1,226 @@
+"""
+Dateisystem-Watcher für den KMZ-Katalog
+Hält den Katalog über inotify-Events (watchdog) aktuell, mit Polling-Fallback
+für Netzlaufwerke (NFS/SMB), auf denen inotify keine Events liefert
+"""
+import logging
+import os
+import threading
+import time
+from typing import Optional, Set
+
+from kmz_catalog import KmzCatalog
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Dateisystemtypen, auf denen inotify keine entfernten Änderungen meldet
+NETWORK_FS_TYPES = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "fuse.rclone", "9p"
+}
+
+
+def is_network_mount(path: str) -> bool:
+    """
+    Prüft anhand von /proc/mounts, ob ein Pfad auf einem Netzlaufwerk liegt
+
+    Args:
+        path: Zu prüfender Pfad
+
+    Returns:
+        True bei NFS/SMB/FUSE-Netzlaufwerken
+    """
+    try:
+        real_path = os.path.realpath(path)
+        best_mount, best_type = "", ""
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace("\\040", " ")
+                if real_path == mount_point or real_path.startswith(mount_point.rstrip("/") + "/"):
+                    if len(mount_point) > len(best_mount):
+                        best_mount, best_type = mount_point, parts[2]
+        return best_type in NETWORK_FS_TYPES
+    except Exception:
+        return False
+
+
+class _CatalogEventHandler(FileSystemEventHandler):
+    """Sammelt Dateisystem-Events und reicht betroffene Pfade an den Watcher weiter"""
+
+    def __init__(self, watcher: "KmzWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+
+        if event.is_directory:
+            # Ordner angelegt/verschoben/gelöscht: betroffenen Teilbaum abgleichen
+            if event.event_type in ("created", "deleted", "moved"):
+                self.watcher.schedule_rescan()
+            return
+
+        self.watcher.schedule_path(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.watcher.schedule_path(dest_path)
+
+
+class KmzWatcher:
+    """
+    Hintergrund-Watcher, der den KMZ-Katalog inkrementell aktualisiert
+
+    Events werden kurz gesammelt (Debounce), damit eine Datei, die gerade
+    kopiert wird, nur einmal gehasht wird. Ohne watchdog oder auf
+    Netzlaufwerken wird der Katalog periodisch im Hintergrund abgeglichen.
+    """
+
+    def __init__(
+        self,
+        catalog: KmzCatalog,
+        poll_interval: float = 30.0,
+        debounce: float = 1.0,
+        reconcile_interval: float = 600.0
+    ):
+        """
+        Initialisiert den Watcher
+
+        Args:
+            catalog: Zu pflegender KMZ-Katalog
+            poll_interval: Intervall des Polling-Fallbacks in Sekunden
+            debounce: Wartezeit nach dem letzten Event in Sekunden
+            reconcile_interval: Intervall für den Sicherheits-Abgleich im inotify-Modus
+        """
+        self.catalog = catalog
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.reconcile_interval = reconcile_interval
+        self.mode: Optional[str] = None
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._pending_paths: Set[str] = set()
+        self._rescan_requested = False
+        self._pending_lock = threading.Lock()
+        self._initial_scan_done = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        """True wenn der Watcher aktiv ist und der Katalog aktuell gehalten wird"""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def ready(self) -> bool:
+        """True wenn der Watcher läuft und der initiale Abgleich abgeschlossen ist"""
+        return self.running and self._initial_scan_done.is_set()
+
+    def start(self):
+        """Startet den Watcher (initialer Abgleich läuft im Hintergrund)"""
+        if self.running:
+            return
+
+        self._stop_event.clear()
+        self._initial_scan_done.clear()
+        base_dir = self.catalog.base_dir
+
+        if not WATCHDOG_AVAILABLE:
+            logger.info("watchdog nicht installiert, verwende Polling für KMZ-Katalog")
+            self.mode = "polling"
+        elif not os.path.isdir(base_dir):
+            logger.warning(f"Reviere-Verzeichnis nicht gefunden, verwende Polling: {base_dir}")
+            self.mode = "polling"
+        elif is_network_mount(base_dir):
+            logger.info(f"{base_dir} liegt auf einem Netzlaufwerk, verwende Polling")
+            self.mode = "polling"
+        else:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_CatalogEventHandler(self), base_dir, recursive=True)
+                self._observer.start()
+                self.mode = "inotify"
+            except Exception as e:
+                logger.warning(f"Dateisystem-Events nicht verfügbar, verwende Polling: {e}")
+                self._observer = None
+                self.mode = "polling"
+
+        self._rescan_requested = True
+        self._thread = threading.Thread(target=self._run, name="kmz-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"KMZ-Watcher gestartet (Modus: {self.mode})")
+
+    def stop(self):
+        """Stoppt den Watcher"""
+        self._stop_event.set()
+        self._wake_event.set()
+
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        logger.info("KMZ-Watcher gestoppt")
+
+    def schedule_path(self, file_path: str):
+        """Merkt einen geänderten Pfad zur Verarbeitung vor"""
+        if not file_path.endswith(".kmz"):
+            return
+        with self._pending_lock:
+            self._pending_paths.add(file_path)
+        self._wake_event.set()
+
+    def schedule_rescan(self):
+        """Fordert einen vollständigen Abgleich des Katalogs an"""
+        with self._pending_lock:
+            self._rescan_requested = True
+        self._wake_event.set()
+
+    def _run(self):
+        """Hauptschleife des Watcher-Threads"""
+        interval = self.poll_interval if self.mode == "polling" else self.reconcile_interval
+        next_full_scan = time.monotonic()
+
+        while not self._stop_event.is_set():
+            timeout = max(0.0, next_full_scan - time.monotonic())
+            if self._wake_event.wait(timeout):
+                # Debounce: warten bis für kurze Zeit keine weiteren Events kommen
+                while not self._stop_event.is_set():
+                    self._wake_event.clear()
+                    if not self._wake_event.wait(self.debounce):
+                        break
+
+            if self._stop_event.is_set():
+                break
+
+            with self._pending_lock:
+                pending_paths = self._pending_paths
+                self._pending_paths = set()
+                rescan = self._rescan_requested
+                self._rescan_requested = False
+
+            try:
+                if rescan or time.monotonic() >= next_full_scan:
+                    self.catalog.refresh()
+                    self._initial_scan_done.set()
+                    next_full_scan = time.monotonic() + interval
+                else:
+                    for file_path in sorted(pending_paths):
+                        self.catalog.update_path(file_path)
+            except Exception as e:
+                logger.error(f"Fehler beim Aktualisieren des KMZ-Katalogs: {e}")
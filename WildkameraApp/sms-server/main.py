@@ -2,25 +2,37 @@
 FastAPI Server für SMS-Versand über USB-Modem
 Unterstützt Wildkamera SMS-Kommandos
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import hashlib
+import json
 import logging
 from datetime import datetime
 import asyncio
 import os
 import shutil
-import glob
-import hashlib
+import time
 import zipfile
 import io
 
-from sms_modem import SmsModem
+from sms_modem import SmsModem, detect_modem_ports
+from modem_pool import ModemPool
+from sms_queue import SmsQueue
 from settings_manager import SettingsManager
+from sms_log_store import SmsLogStore
+from kmz_catalog import KmzCatalog
+from kmz_watcher import KmzWatcher
+from camera_status_store import CameraStatusStore
+from sms_inbox import SmsInbox
+from camera_status_index import CameraStatusIndex
+from revier_polygons import RevierPolygonStore
+from file_download import etag_matches, file_download_response, iter_zip_stream, open_zip_sources, quote_etag
+from kml_geometry import GEOMETRY_FORMATS, KmlGeometryCache
+from revier_area import RevierAreaCache
 from camera_status_parser import (
-    get_camera_status_files,
     filter_cameras_in_polygons,
     parse_gps_line
 )
@@ -49,8 +61,17 @@ app.add_middleware(
 )
 
 # Globale Instanzen
-sms_modem: Optional[SmsModem] = None
+modem_pool: ModemPool = ModemPool()
 settings_manager: SettingsManager = SettingsManager()
+sms_log_store: SmsLogStore = SmsLogStore()
+sms_queue: SmsQueue = SmsQueue()
+camera_status_store: CameraStatusStore = CameraStatusStore()
+sms_inbox: SmsInbox = SmsInbox(camera_status_store)
+
+# Altes SMS-Log aus camera_settings.json einmalig übernehmen
+legacy_sms_log = settings_manager.pop_sms_log()
+if legacy_sms_log:
+    sms_log_store.import_entries(legacy_sms_log)
 
 # Verzeichnis für KML-Dateien
 KML_UPLOAD_DIR = "kml_files"
@@ -58,6 +79,25 @@ os.makedirs(KML_UPLOAD_DIR, exist_ok=True)
 
 # Reviere-Verzeichnis für automatische KMZ-Erkennung
 REVIERE_BASE_DIR = "/home/wildkamera/Reviere"
+kmz_catalog: KmzCatalog = KmzCatalog(REVIERE_BASE_DIR)
+kmz_watcher: KmzWatcher = KmzWatcher(kmz_catalog)
+
+# Ohne Watcher: Mindestabstand zwischen zwei Rescans wegen unbekannter Hashes
+KMZ_MISS_REFRESH_INTERVAL = 10.0
+_last_miss_refresh = float("-inf")
+
+# Extrahierte KMZ-Geometrie (GeoJSON/gepackt) je Datei-Hash
+kml_geometry_cache: KmlGeometryCache = KmlGeometryCache()
+
+# Flächenstatistik (Polygone, m², ha) je KMZ-Hash
+revier_area_cache: RevierAreaCache = RevierAreaCache()
+
+# Revier-Polygone (<Revier>.kmz direkt im Reviere-Ordner) für den Kamera-Filter
+revier_polygon_store: RevierPolygonStore = RevierPolygonStore(REVIERE_BASE_DIR)
+
+# NAS-Verzeichnis mit den Kamera-Status-Dateien (<Revier>/txtFiles/*.txt)
+CAMERA_STATUS_BASE_DIR = "/mnt/synology/Reviere"
+camera_status_index: CameraStatusIndex = CameraStatusIndex(CAMERA_STATUS_BASE_DIR)
 
 # Pydantic Models für API
 class SmsRequest(BaseModel):
@@ -70,6 +110,7 @@ class SmsResponse(BaseModel):
     message: str
     timestamp: str
     sms_id: Optional[str] = None
+    status: Optional[str] = None
 
 class StatusResponse(BaseModel):
     status: str
@@ -94,101 +135,102 @@ class SettingsResponse(BaseModel):
 
 # ==================== Helper Functions ====================
 
-def calculate_file_hash(file_path: str) -> str:
-    """Berechnet MD5-Hash einer Datei für Änderungserkennung"""
-    hash_md5 = hashlib.md5()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    except Exception as e:
-        logger.error(f"Fehler beim Hash-Berechnen von {file_path}: {e}")
-        return ""
-
-
 def scan_reviere_for_kmz() -> List[Dict[str, Any]]:
     """
-    Durchsucht /home/wildkamera/Reviere zweistufig nach KMZ-Dateien:
-    1. Finde alle Ordner namens "kmz" oder "KMZ"
-    2. Suche in diesen Ordnern rekursiv nach .kmz Dateien
+    Liefert alle KMZ-Dateien aus /home/wildkamera/Reviere
+
+    Läuft der KMZ-Watcher, wird direkt aus dem Speicher geantwortet.
+    Andernfalls wird der Katalog abgeglichen; nur neue oder geänderte
+    Dateien werden dabei neu gehasht.
 
     Returns:
         Liste mit KMZ-Datei-Informationen
     """
-    kmz_files = []
+    if kmz_watcher.ready:
+        return kmz_catalog.list_files()
+    return kmz_catalog.refresh()
+
+
+async def find_kmz_by_hash(file_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Sucht eine KMZ-Datei im Katalog anhand ihres Hashes
 
-    if not os.path.exists(REVIERE_BASE_DIR):
-        logger.warning(f"Reviere-Verzeichnis nicht gefunden: {REVIERE_BASE_DIR}")
-        return kmz_files
+    Ohne laufenden Watcher wird bei einem Fehlschlag einmal abgeglichen,
+    höchstens alle KMZ_MISS_REFRESH_INTERVAL Sekunden und außerhalb des
+    Event-Loops, damit unbekannte Hashes keinen Rescan pro Request auslösen.
 
-    # Schritt 1: Finde alle "kmz" Ordner
-    kmz_folders = []
-    for root, dirs, files in os.walk(REVIERE_BASE_DIR):
-        for dir_name in dirs:
-            if dir_name.lower() == "kmz":
-                kmz_folder_path = os.path.join(root, dir_name)
-                kmz_folders.append(kmz_folder_path)
-                logger.debug(f"Gefundener KMZ-Ordner: {kmz_folder_path}")
+    Args:
+        file_hash: MD5-Hash der Datei
 
-    logger.info(f"Gefundene KMZ-Ordner: {len(kmz_folders)}")
+    Returns:
+        Datei-Informationen oder None
+    """
+    global _last_miss_refresh
 
-    # Schritt 2: Durchsuche jeden KMZ-Ordner rekursiv nach .kmz Dateien
-    for kmz_folder in kmz_folders:
-        search_pattern = os.path.join(kmz_folder, "**", "*.kmz")
-        found_files = glob.glob(search_pattern, recursive=True)
+    target_file = kmz_catalog.find_by_hash(file_hash, refresh_on_miss=False)
+    if target_file or kmz_watcher.ready:
+        return target_file
 
-        logger.debug(f"In {kmz_folder}: {len(found_files)} KMZ-Dateien gefunden")
+    now = time.monotonic()
+    if now - _last_miss_refresh < KMZ_MISS_REFRESH_INTERVAL:
+        return None
+    _last_miss_refresh = now
 
-        for file_path in found_files:
-            try:
-                # Extrahiere Revier-Namen aus Pfad
-                relative_path = os.path.relpath(file_path, REVIERE_BASE_DIR)
-                path_parts = relative_path.split(os.sep)
-                revier_name = path_parts[0] if len(path_parts) > 0 else "Unknown"
-
-                # Datei-Metadaten
-                file_stat = os.stat(file_path)
-                file_hash = calculate_file_hash(file_path)
-
-                kmz_files.append({
-                    "filename": os.path.basename(file_path),
-                    "revier": revier_name,
-                    "path": relative_path,
-                    "full_path": file_path,
-                    "size": file_stat.st_size,
-                    "modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
-                    "hash": file_hash
-                })
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, kmz_catalog.refresh)
+    return kmz_catalog.find_by_hash(file_hash, refresh_on_miss=False)
 
-            except Exception as e:
-                logger.error(f"Fehler beim Verarbeiten von {file_path}: {e}")
 
-    logger.info(f"Gesamt gefundene KMZ-Dateien: {len(kmz_files)}")
-    return kmz_files
+def log_finished_sms_job(job: Dict[str, Any]):
+    """Schreibt einen abgeschlossenen Sendeauftrag ins SMS-Log"""
+    sms_log_store.add({
+        "phone_number": job["phone_number"],
+        "message": job["message"],
+        "camera_id": job["camera_id"],
+        "success": job["status"] == "sent",
+        "job_id": job["id"]
+    })
+
+
+def attach_sms_inbox():
+    """Meldet den SMS-Empfang für alle Modems im Pool an (bereits angemeldete werden übersprungen)"""
+    for modem in modem_pool.modems:
+        sms_inbox.attach(modem)
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialisiert das SMS-Modem beim Start"""
-    global sms_modem
+    """Initialisiert den Modem-Pool, SMS-Dispatcher und -Empfang sowie den KMZ-Watcher beim Start"""
+    kmz_watcher.start()
+
     try:
-        # Versuche automatisch ein Modem zu finden und zu verbinden
-        sms_modem = SmsModem()
-        await sms_modem.connect()
-        logger.info("SMS-Modem erfolgreich initialisiert")
+        # Alle erkannten Modems verbinden
+        await modem_pool.connect_all()
+        attach_sms_inbox()
+        if modem_pool.is_connected():
+            logger.info(f"{modem_pool.capacity()} SMS-Modem(s) erfolgreich initialisiert")
+        else:
+            logger.warning("Kein Modem konnte beim Start initialisiert werden")
+            logger.info("Server läuft weiter - Modem kann später konfiguriert werden")
     except Exception as e:
-        logger.warning(f"Modem konnte beim Start nicht initialisiert werden: {e}")
+        logger.warning(f"Modems konnten beim Start nicht initialisiert werden: {e}")
         logger.info("Server läuft weiter - Modem kann später konfiguriert werden")
 
+    await sms_queue.start(lambda: modem_pool, on_complete=log_finished_sms_job)
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Trennt das SMS-Modem beim Herunterfahren"""
-    global sms_modem
-    if sms_modem:
-        await sms_modem.disconnect()
-        logger.info("SMS-Modem getrennt")
+    """Trennt alle SMS-Modems, stoppt Dispatcher, SMS-Empfang und KMZ-Watcher und schließt die Datenbanken bzw. Statusdatei"""
+    kmz_watcher.stop()
+    await sms_queue.stop()
+    await sms_inbox.stop()
+    settings_manager.close()
+    sms_log_store.close()
+    camera_status_store.close()
+
+    await modem_pool.disconnect_all()
+    logger.info("SMS-Modems getrennt")
 
 
 @app.get("/", response_model=dict)
@@ -204,101 +246,78 @@ async def root():
 @app.get("/status", response_model=StatusResponse)
 async def get_status():
     """Gibt den aktuellen Status des Servers und Modems zurück"""
-    global sms_modem
-
     modem_connected = False
     modem_info = None
 
-    if sms_modem and sms_modem.is_connected():
+    primary_modem = modem_pool.primary
+    if primary_modem:
         modem_connected = True
-        modem_info = await sms_modem.get_modem_info()
+        modem_info = await primary_modem.get_modem_info()
+        modem_info["pool_size"] = len(modem_pool.modems)
 
     return StatusResponse(
         status="online",
         modem_connected=modem_connected,
         modem_info=modem_info,
-        pending_sms_count=0  # Kann erweitert werden für Queue-Verwaltung
+        pending_sms_count=sms_queue.pending_count()
     )
 
 
 @app.post("/sms/send", response_model=SmsResponse)
 async def send_sms(sms_request: SmsRequest):
     """
-    Sendet eine SMS über das angebundene Modem
+    Reiht eine SMS in die Sendewarteschlange ein
+
+    Der Versand erfolgt im Hintergrund; der Status kann über
+    /sms/jobs/{job_id} abgefragt werden.
 
     Args:
         sms_request: SMS-Anfrage mit Telefonnummer und Nachricht
 
     Returns:
-        SmsResponse mit Erfolgs-Status
+        SmsResponse mit Job-ID als sms_id
     """
-    global sms_modem
-
-    # Prüfen ob Modem verbunden ist
-    if not sms_modem or not sms_modem.is_connected():
-        raise HTTPException(
-            status_code=503,
-            detail="SMS-Modem ist nicht verbunden. Bitte Modem konfigurieren."
-        )
-
     try:
-        logger.info(f"Sende SMS an {sms_request.phone_number}")
         logger.debug(f"Nachricht: {sms_request.message}")
 
-        # SMS über Modem senden
-        success = await sms_modem.send_sms(
+        job = await sms_queue.enqueue(
             sms_request.phone_number,
-            sms_request.message
+            sms_request.message,
+            sms_request.camera_id
         )
 
-        if success:
-            return SmsResponse(
-                success=True,
-                message="SMS erfolgreich gesendet",
-                timestamp=datetime.now().isoformat(),
-                sms_id=f"sms_{datetime.now().timestamp()}"
-            )
+        if modem_pool.is_connected():
+            message = "SMS in Warteschlange eingereiht"
         else:
-            raise HTTPException(
-                status_code=500,
-                detail="SMS konnte nicht gesendet werden"
-            )
+            message = "SMS in Warteschlange eingereiht - Modem derzeit nicht verbunden"
+
+        return SmsResponse(
+            success=True,
+            message=message,
+            timestamp=job["created"],
+            sms_id=job["id"],
+            status=job["status"]
+        )
 
     except Exception as e:
-        logger.error(f"Fehler beim Senden der SMS: {e}")
+        logger.error(f"Fehler beim Einreihen der SMS: {e}")
         raise HTTPException(
             status_code=500,
-            detail=f"Fehler beim Senden der SMS: {str(e)}"
+            detail=f"Fehler beim Einreihen der SMS: {str(e)}"
         )
-    finally:
-        # SMS-Log speichern
-        settings_manager.save_sms_log({
-            "phone_number": sms_request.phone_number,
-            "message": sms_request.message,
-            "camera_id": sms_request.camera_id,
-            "success": success if 'success' in locals() else False
-        })
 
 
 @app.post("/sms/send-batch", response_model=dict)
 async def send_batch_sms(sms_requests: List[SmsRequest]):
     """
-    Sendet mehrere SMS nacheinander
+    Reiht mehrere SMS in die Sendewarteschlange ein
 
     Args:
         sms_requests: Liste von SMS-Anfragen
 
     Returns:
-        Dict mit Erfolgs- und Fehlerstatistiken
+        Dict mit Job-IDs und Statistiken
     """
-    global sms_modem
-
-    if not sms_modem or not sms_modem.is_connected():
-        raise HTTPException(
-            status_code=503,
-            detail="SMS-Modem ist nicht verbunden"
-        )
-
     results = {
         "total": len(sms_requests),
         "success": 0,
@@ -306,27 +325,23 @@ async def send_batch_sms(sms_requests: List[SmsRequest]):
         "details": []
     }
 
-    for sms_req in sms_requests:
-        try:
-            success = await sms_modem.send_sms(
-                sms_req.phone_number,
-                sms_req.message
-            )
+    # Alle Jobs mit einem einzigen Schreibvorgang einreihen
+    try:
+        jobs = await sms_queue.enqueue_batch([
+            (sms_req.phone_number, sms_req.message, sms_req.camera_id)
+            for sms_req in sms_requests
+        ])
+        for sms_req, job in zip(sms_requests, jobs):
+            results["success"] += 1
+            results["details"].append({
+                "phone_number": sms_req.phone_number,
+                "status": "queued",
+                "job_id": job["id"]
+            })
 
-            if success:
-                results["success"] += 1
-                results["details"].append({
-                    "phone_number": sms_req.phone_number,
-                    "status": "success"
-                })
-            else:
-                results["failed"] += 1
-                results["details"].append({
-                    "phone_number": sms_req.phone_number,
-                    "status": "failed"
-                })
-
-        except Exception as e:
+    except Exception as e:
+        logger.error(f"Fehler beim Einreihen der SMS: {e}")
+        for sms_req in sms_requests:
             results["failed"] += 1
             results["details"].append({
                 "phone_number": sms_req.phone_number,
@@ -337,20 +352,67 @@ async def send_batch_sms(sms_requests: List[SmsRequest]):
     return results
 
 
+@app.get("/sms/jobs/{job_id}")
+async def get_sms_job(job_id: str):
+    """
+    Gibt den Status eines Sendeauftrags zurück
+
+    Args:
+        job_id: ID des Jobs (sms_id aus /sms/send)
+
+    Returns:
+        Job mit Status (pending, sending, sent, failed)
+    """
+    job = sms_queue.get_job(job_id)
+
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail=f"SMS-Job {job_id} nicht gefunden"
+        )
+
+    return {
+        "success": True,
+        "job": job
+    }
+
+
+@app.get("/sms/queue")
+async def get_sms_queue(status: Optional[str] = None, limit: int = 50):
+    """
+    Gibt Tiefe und Inhalt der Sendewarteschlange zurück
+
+    Args:
+        status: Optionaler Status-Filter (pending, sending, sent, failed)
+        limit: Maximale Anzahl zurückzugebender Jobs
+
+    Returns:
+        Queue-Statistik und neueste Jobs
+    """
+    jobs = sms_queue.list_jobs(status=status, limit=limit)
+    return {
+        "success": True,
+        "pending": sms_queue.pending_count(),
+        "stats": sms_queue.get_stats(),
+        "jobs": jobs,
+        "count": len(jobs)
+    }
+
+
 @app.post("/modem/configure")
 async def configure_modem(config: ModemConfigRequest):
     """
     Konfiguriert das SMS-Modem
 
+    Ersetzt den Modem-Pool durch genau dieses Modem. Weitere Modems
+    können über /modem/pool/rescan hinzugefügt werden.
+
     Args:
         config: Modem-Konfiguration (Port, Baudrate, Timeout)
     """
-    global sms_modem
-
     try:
-        # Wenn bereits ein Modem verbunden ist, trennen
-        if sms_modem and sms_modem.is_connected():
-            await sms_modem.disconnect()
+        # Bereits verbundene Modems trennen
+        await modem_pool.disconnect_all()
 
         # Neues Modem erstellen und verbinden
         sms_modem = SmsModem(
@@ -360,6 +422,9 @@ async def configure_modem(config: ModemConfigRequest):
         )
 
         await sms_modem.connect()
+        await modem_pool.add_modem(sms_modem)
+        attach_sms_inbox()
+        sms_queue.notify()
 
         modem_info = await sms_modem.get_modem_info()
 
@@ -388,13 +453,18 @@ async def list_available_ports():
     try:
         from serial.tools import list_ports
 
+        modem_candidates = detect_modem_ports()
+        pool_ports = {modem.port for modem in modem_pool.modems}
+
         ports = []
         for port in list_ports.comports():
             ports.append({
                 "device": port.device,
                 "name": port.name,
                 "description": port.description,
-                "hwid": port.hwid
+                "hwid": port.hwid,
+                "modem_candidate": port.device in modem_candidates,
+                "in_pool": port.device in pool_ports
             })
 
         return {
@@ -410,6 +480,52 @@ async def list_available_ports():
         )
 
 
+@app.get("/modem/pool")
+async def get_modem_pool():
+    """
+    Zeigt alle Modems im Pool mit Auslastung und Zustand
+
+    Returns:
+        Liste der Pool-Modems
+    """
+    modems = modem_pool.get_status()
+    return {
+        "success": True,
+        "modems": modems,
+        "count": len(modems),
+        "capacity": modem_pool.capacity()
+    }
+
+
+@app.post("/modem/pool/rescan")
+async def rescan_modem_pool():
+    """
+    Sucht nach neu angeschlossenen Modems und nimmt sie in den Pool auf
+
+    Returns:
+        Aktualisierte Liste der Pool-Modems
+    """
+    try:
+        await modem_pool.connect_all()
+        attach_sms_inbox()
+        sms_queue.notify()
+
+        modems = modem_pool.get_status()
+        return {
+            "success": True,
+            "modems": modems,
+            "count": len(modems),
+            "capacity": modem_pool.capacity()
+        }
+
+    except Exception as e:
+        logger.error(f"Fehler beim Durchsuchen nach Modems: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Fehler beim Durchsuchen nach Modems: {str(e)}"
+        )
+
+
 # ==================== Settings Endpoints ====================
 
 @app.post("/settings/save", response_model=SettingsResponse)
@@ -424,7 +540,11 @@ async def save_settings(request: SettingsSaveRequest):
         SettingsResponse mit Erfolgs-Status
     """
     try:
-        success = settings_manager.save_camera_settings(
+        # SQLite-Schreibzugriff (ggf. Warten auf andere Schreiber) außerhalb des Event-Loops
+        loop = asyncio.get_running_loop()
+        success = await loop.run_in_executor(
+            None,
+            settings_manager.save_camera_settings,
             request.camera_id,
             request.settings
         )
@@ -458,7 +578,8 @@ async def get_last_settings():
         SettingsResponse mit letzten Einstellungen
     """
     try:
-        last_settings = settings_manager.get_last_settings()
+        loop = asyncio.get_running_loop()
+        last_settings = await loop.run_in_executor(None, settings_manager.get_last_settings)
 
         if last_settings:
             return SettingsResponse(
@@ -493,7 +614,8 @@ async def get_camera_settings(camera_id: str):
         SettingsResponse mit Kamera-Einstellungen
     """
     try:
-        settings = settings_manager.get_camera_settings(camera_id)
+        loop = asyncio.get_running_loop()
+        settings = await loop.run_in_executor(None, settings_manager.get_camera_settings, camera_id)
 
         if settings:
             return SettingsResponse(
@@ -525,7 +647,8 @@ async def get_all_cameras():
         Dictionary mit allen Kameras
     """
     try:
-        cameras = settings_manager.get_all_cameras()
+        loop = asyncio.get_running_loop()
+        cameras = await loop.run_in_executor(None, settings_manager.get_all_cameras)
         return {
             "success": True,
             "cameras": cameras,
@@ -551,7 +674,8 @@ async def delete_camera_settings(camera_id: str):
         Erfolgs-Status
     """
     try:
-        success = settings_manager.delete_camera_settings(camera_id)
+        loop = asyncio.get_running_loop()
+        success = await loop.run_in_executor(None, settings_manager.delete_camera_settings, camera_id)
 
         if success:
             return {
@@ -575,22 +699,45 @@ async def delete_camera_settings(camera_id: str):
 
 
 @app.get("/settings/sms-log")
-async def get_sms_log(limit: int = 50):
+async def get_sms_log(
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    camera_id: Optional[str] = None,
+    phone_number: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    success: Optional[bool] = None
+):
     """
-    Holt die letzten SMS-Log-Einträge
+    Holt SMS-Log-Einträge (neueste zuerst), optional gefiltert und seitenweise
 
     Args:
         limit: Maximale Anzahl zurückzugebender Einträge
+        offset: Anzahl zu überspringender Einträge
+        camera_id: Nur Einträge dieser Kamera
+        phone_number: Nur Einträge an diese Nummer
+        since: Nur Einträge ab diesem Zeitpunkt (ISO-Format)
+        until: Nur Einträge vor diesem Zeitpunkt (ISO-Format)
+        success: Nur erfolgreiche bzw. fehlgeschlagene Sendungen
 
     Returns:
-        Liste mit Log-Einträgen
+        Liste mit Log-Einträgen und Gesamtanzahl für die Filter
     """
     try:
-        log = settings_manager.get_sms_log(limit)
+        filters = {
+            "camera_id": camera_id,
+            "phone_number": phone_number,
+            "since": since,
+            "until": until,
+            "success": success
+        }
+        log = sms_log_store.query(limit=limit, offset=offset, **filters)
         return {
             "success": True,
             "log": log,
-            "count": len(log)
+            "count": len(log),
+            "total": sms_log_store.count(**filters),
+            "offset": offset
         }
     except Exception as e:
         logger.error(f"Fehler beim Abrufen des SMS-Logs: {e}")
@@ -698,15 +845,25 @@ async def list_kml_files():
 
 
 @app.get("/kml/download/{filename}")
-async def download_kml(filename: str):
+async def download_kml(
+    filename: str,
+    response: Response,
+    raw: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None)
+):
     """
     Lädt eine KML-Datei herunter
 
+    Unveränderte Dateien werden per ETag/If-None-Match mit 304 beantwortet.
+
     Args:
         filename: Name der KML-Datei
+        raw: Datei direkt streamen (mit Range-Unterstützung) statt JSON
 
     Returns:
-        KML-Datei als Download
+        KML-Inhalt als JSON bzw. die KML-Datei selbst (raw=true)
     """
     try:
         file_path = os.path.join(KML_UPLOAD_DIR, filename)
@@ -717,10 +874,31 @@ async def download_kml(filename: str):
                 detail="KML-Datei nicht gefunden"
             )
 
+        file_stat = os.stat(file_path)
+        file_etag = f"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"
+
+        if raw:
+            return file_download_response(
+                file_path,
+                file_etag,
+                "application/vnd.google-earth.kml+xml",
+                headers={"Content-Disposition": f"attachment; filename={filename}"},
+                if_none_match=if_none_match,
+                range_header=range_header,
+                if_range=if_range
+            )
+
+        # JSON ist eine eigene Repräsentation und bekommt ein eigenes ETag
+        json_etag = quote_etag(f"{file_etag}-json")
+        if etag_matches(if_none_match, json_etag):
+            return Response(status_code=304, headers={"ETag": json_etag, "Cache-Control": "no-cache"})
+
         # Dateiinhalt als Text zurückgeben für Offline-Speicherung
         with open(file_path, 'r', encoding='utf-8') as f:
             kml_content = f.read()
 
+        response.headers["ETag"] = json_etag
+        response.headers["Cache-Control"] = "no-cache"
         return {
             "success": True,
             "filename": filename,
@@ -786,7 +964,8 @@ async def list_reviere_kmz():
         Liste aller gefundenen KMZ-Dateien mit Metadaten
     """
     try:
-        kmz_files = scan_reviere_for_kmz()
+        loop = asyncio.get_running_loop()
+        kmz_files = await loop.run_in_executor(None, scan_reviere_for_kmz)
 
         return {
             "success": True,
@@ -805,11 +984,20 @@ async def list_reviere_kmz():
 
 
 @app.get("/reviere/kmz/download")
-async def download_reviere_kmz(file_hash: str):
+async def download_reviere_kmz(
+    file_hash: str,
+    if_none_match: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None)
+):
     """
     Lädt eine spezifische KMZ-Datei aus den Revieren herunter
     Identifiziert die Datei anhand des Hash-Werts
 
+    Die Datei wird direkt von der Platte gestreamt. Der MD5-Hash dient als
+    ETag (If-None-Match → 304), Range-Requests erlauben das Fortsetzen
+    abgebrochener Downloads (206).
+
     Args:
         file_hash: MD5-Hash der Datei
 
@@ -817,14 +1005,8 @@ async def download_reviere_kmz(file_hash: str):
         KMZ-Datei als Byte-Stream
     """
     try:
-        kmz_files = scan_reviere_for_kmz()
-
-        # Finde Datei anhand Hash
-        target_file = None
-        for f in kmz_files:
-            if f["hash"] == file_hash:
-                target_file = f
-                break
+        # Finde Datei anhand Hash (Katalog-Lookup, Rescan nur bei Fehlschlag)
+        target_file = await find_kmz_by_hash(file_hash)
 
         if not target_file:
             raise HTTPException(
@@ -840,22 +1022,25 @@ async def download_reviere_kmz(file_hash: str):
                 detail="KMZ-Datei existiert nicht mehr"
             )
 
-        # Lese Datei
-        with open(file_path, 'rb') as f:
-            file_content = f.read()
-
-        logger.info(f"KMZ-Datei heruntergeladen: {target_file['filename']} ({target_file['revier']})")
-
-        # Rückgabe als Binary Response
-        return Response(
-            content=file_content,
-            media_type="application/vnd.google-earth.kmz",
+        response = file_download_response(
+            file_path,
+            target_file["hash"],
+            "application/vnd.google-earth.kmz",
             headers={
                 "Content-Disposition": f"attachment; filename={target_file['filename']}",
                 "X-Revier": target_file['revier'],
                 "X-File-Hash": file_hash
-            }
+            },
+            if_none_match=if_none_match,
+            range_header=range_header,
+            if_range=if_range
+        )
+
+        logger.info(
+            f"KMZ-Datei heruntergeladen: {target_file['filename']} "
+            f"({target_file['revier']}, HTTP {response.status_code})"
         )
+        return response
 
     except HTTPException:
         raise
@@ -867,26 +1052,139 @@ async def download_reviere_kmz(file_hash: str):
         )
 
 
+@app.post("/reviere/kmz/bundle")
+async def download_reviere_kmz_bundle(file_hashes: List[str] = []):
+    """
+    Lädt mehrere KMZ-Dateien in einem Request als ZIP-Bündel herunter
+
+    Das Archiv wird direkt von der Platte gestreamt; die KMZ-Dateien werden
+    unkomprimiert (ZIP_STORED) übernommen. Jede Datei liegt als
+    "<hash>.kmz" im Archiv, davor steht eine manifest.json mit den
+    Datei-Informationen und den nicht gefundenen Hashes.
+
+    Args:
+        file_hashes: Liste von MD5-Hashes der gewünschten Dateien
+
+    Returns:
+        ZIP-Archiv als Byte-Stream
+    """
+    try:
+        requested = list(dict.fromkeys(file_hashes))
+        if not requested:
+            raise HTTPException(status_code=400, detail="Keine Hashes angegeben")
+
+        # Katalog-Lookups ohne Rescan; fehlen Dateien, wird höchstens einmal abgeglichen
+        found = {}
+        for file_hash in requested:
+            target_file = kmz_catalog.find_by_hash(file_hash, refresh_on_miss=False)
+            if target_file:
+                found[file_hash] = target_file
+
+        if len(found) < len(requested) and not kmz_watcher.ready:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, kmz_catalog.refresh)
+            for file_hash in requested:
+                if file_hash not in found:
+                    target_file = kmz_catalog.find_by_hash(file_hash, refresh_on_miss=False)
+                    if target_file:
+                        found[file_hash] = target_file
+
+        if not found:
+            raise HTTPException(
+                status_code=404,
+                detail="Keine der angeforderten KMZ-Dateien gefunden"
+            )
+
+        missing = [file_hash for file_hash in requested if file_hash not in found]
+
+        # Dateien vorab öffnen, damit das Manifest nur enthaltene Dateien auflistet
+        loop = asyncio.get_running_loop()
+        sources, skipped = await loop.run_in_executor(
+            None,
+            open_zip_sources,
+            [(target_file["full_path"], f"{file_hash}.kmz") for file_hash, target_file in found.items()]
+        )
+        unreadable = [name[:-len(".kmz")] for name in skipped]
+        for file_hash in unreadable:
+            del found[file_hash]
+
+        if not found:
+            raise HTTPException(
+                status_code=404,
+                detail="Keine der angeforderten KMZ-Dateien lesbar"
+            )
+
+        manifest = {
+            "files": [
+                {
+                    "name": f"{file_hash}.kmz",
+                    "hash": file_hash,
+                    "filename": target_file["filename"],
+                    "revier": target_file["revier"],
+                    "path": target_file["path"],
+                    "size": target_file["size"],
+                    "modified": target_file["modified"]
+                }
+                for file_hash, target_file in found.items()
+            ],
+            "missing": missing,
+            "unreadable": unreadable,
+            "timestamp": datetime.now().isoformat()
+        }
+
+        logger.info(
+            f"KMZ-Bündel: {len(found)} Dateien, {len(missing)} nicht gefunden, "
+            f"{len(unreadable)} nicht lesbar"
+        )
+
+        return StreamingResponse(
+            iter_zip_stream(
+                sources,
+                extra_members={"manifest.json": json.dumps(manifest, ensure_ascii=False).encode("utf-8")}
+            ),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": "attachment; filename=reviere-kmz.zip",
+                "X-File-Count": str(len(found))
+            }
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Fehler beim Erstellen des KMZ-Bündels: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Fehler beim Herunterladen: {str(e)}"
+        )
+
+
 @app.get("/reviere/kmz/extract")
-async def extract_kmz_to_kml(file_hash: str):
+async def extract_kmz_to_kml(
+    file_hash: str,
+    geometry_format: str = Query("kml", alias="format"),
+    tolerance: float = 0.0,
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Extrahiert KML-Content aus einer KMZ-Datei
 
+    Mit format=geojson bzw. format=packed wird statt des KML-Texts nur die
+    Geometrie geliefert (per iterparse gelesen, je Hash gecacht), optional
+    nach Douglas-Peucker vereinfacht. Revier und Hash stehen dann in den
+    Headern X-Revier/X-File-Hash.
+
     Args:
         file_hash: MD5-Hash der KMZ-Datei
+        geometry_format: "kml" (default), "geojson" oder "packed"
+        tolerance: Vereinfachungstoleranz in Metern (nur geojson/packed)
 
     Returns:
-        Extrahierte KML-Inhalte als JSON
+        Extrahierte KML-Inhalte als JSON, GeoJSON FeatureCollection oder gepackte Binärdaten
     """
     try:
-        kmz_files = scan_reviere_for_kmz()
-
-        # Finde Datei anhand Hash
-        target_file = None
-        for f in kmz_files:
-            if f["hash"] == file_hash:
-                target_file = f
-                break
+        # Finde Datei anhand Hash (Katalog-Lookup, Rescan nur bei Fehlschlag)
+        target_file = await find_kmz_by_hash(file_hash)
 
         if not target_file:
             raise HTTPException(
@@ -896,6 +1194,38 @@ async def extract_kmz_to_kml(file_hash: str):
 
         file_path = target_file["full_path"]
 
+        if geometry_format != "kml":
+            if geometry_format not in GEOMETRY_FORMATS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unbekanntes Format: {geometry_format} (kml, geojson oder packed)"
+                )
+
+            tolerance = max(tolerance, 0.0)
+            geometry_etag = quote_etag(f"{target_file['hash']}-{geometry_format}-{tolerance:g}")
+            if etag_matches(if_none_match, geometry_etag):
+                return Response(status_code=304, headers={"ETag": geometry_etag})
+
+            loop = asyncio.get_running_loop()
+            payload = await loop.run_in_executor(
+                None,
+                kml_geometry_cache.get_payload,
+                target_file["hash"],
+                file_path,
+                geometry_format,
+                tolerance
+            )
+
+            return Response(
+                content=payload,
+                media_type="application/geo+json" if geometry_format == "geojson" else "application/octet-stream",
+                headers={
+                    "ETag": geometry_etag,
+                    "X-Revier": target_file['revier'],
+                    "X-File-Hash": file_hash
+                }
+            )
+
         # KMZ ist ein ZIP-Archiv mit KML drin
         kml_content = None
         with zipfile.ZipFile(file_path, 'r') as kmz:
@@ -945,18 +1275,20 @@ async def sync_reviere_kmz(client_hashes: List[str] = []):
         Liste von Dateien, die aktualisiert werden müssen
     """
     try:
-        server_files = scan_reviere_for_kmz()
+        loop = asyncio.get_running_loop()
+        server_files = await loop.run_in_executor(None, scan_reviere_for_kmz)
         server_hashes = {f["hash"]: f for f in server_files}
+        client_hash_set = set(client_hashes)
 
         # Finde Dateien, die der Client noch nicht hat oder die aktualisiert wurden
         files_to_update = []
         for file_hash, file_info in server_hashes.items():
-            if file_hash not in client_hashes:
+            if file_hash not in client_hash_set:
                 files_to_update.append(file_info)
 
         # Finde Dateien, die der Client hat, aber auf dem Server nicht mehr existieren
         files_to_delete = []
-        for client_hash in client_hashes:
+        for client_hash in client_hash_set:
             if client_hash not in server_hashes:
                 files_to_delete.append(client_hash)
 
@@ -967,6 +1299,7 @@ async def sync_reviere_kmz(client_hashes: List[str] = []):
             "files_to_update": files_to_update,
             "files_to_delete": files_to_delete,
             "total_server_files": len(server_files),
+            "cursor": kmz_catalog.sync_cursor(),
             "timestamp": datetime.now().isoformat()
         }
 
@@ -978,11 +1311,104 @@ async def sync_reviere_kmz(client_hashes: List[str] = []):
         )
 
 
+@app.get("/reviere/kmz/changes")
+async def get_reviere_kmz_changes(cursor: Optional[str] = None):
+    """
+    Delta-Synchronisation der KMZ-Dateien über einen Sync-Cursor
+
+    Der Client schickt nur den Cursor seiner letzten Synchronisation und
+    erhält die seitdem hinzugekommenen und gelöschten Dateien. Ohne oder mit
+    veraltetem Cursor wird eine Vollsynchronisation geliefert (full_sync=True,
+    files_to_update enthält dann alle Dateien).
+
+    Args:
+        cursor: Cursor aus der letzten Antwort (leer = Erst-Sync)
+
+    Returns:
+        Neuer Cursor, zu aktualisierende Dateien und zu löschende Hashes
+    """
+    try:
+        if not kmz_watcher.ready:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, kmz_catalog.refresh)
+
+        changes = kmz_catalog.get_changes(cursor)
+
+        logger.info(
+            f"Delta-Sync ({'voll' if changes['full_sync'] else 'seit ' + str(cursor)}): "
+            f"{len(changes['files_to_update'])} zu aktualisieren, {len(changes['files_to_delete'])} zu löschen"
+        )
+
+        return {
+            "success": True,
+            **changes,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"Fehler beim Delta-Sync: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Fehler beim Delta-Sync: {str(e)}"
+        )
+
+
+@app.get("/reviere/area")
+async def get_reviere_area(revier: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """
+    Flächenstatistik der Revier-KMZ-Dateien (Polygone, Löcher, m² und ha)
+
+    Gerechnet wird geodätisch auf dem WGS84-Ellipsoid wie in calcHA.py,
+    Löcher werden abgezogen. Ergebnisse werden je KMZ-Hash gecacht: nur neue
+    oder geänderte Dateien werden gelesen, unveränderte Bestände beantwortet
+    der Server per ETag mit 304.
+
+    Args:
+        revier: Nur dieses Revier auswerten (optional)
+        if_none_match: ETag einer früheren Antwort
+
+    Returns:
+        Flächen je Revier und Datei sowie die Gesamtsumme
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        files = await loop.run_in_executor(None, scan_reviere_for_kmz)
+
+        file_hashes = sorted(f["hash"] for f in files if revier is None or f["revier"] == revier)
+        area_etag = quote_etag(hashlib.md5(f"{revier or ''}|{','.join(file_hashes)}".encode()).hexdigest())
+        if etag_matches(if_none_match, area_etag):
+            return Response(status_code=304, headers={"ETag": area_etag})
+
+        revier_area_cache.prune(f["hash"] for f in files)
+        summary = await loop.run_in_executor(None, revier_area_cache.summarize, files, revier)
+
+        logger.info(
+            f"Flächenstatistik: {summary['total']['files']} Dateien, "
+            f"{summary['total']['area_ha']:.2f} ha"
+        )
+
+        return JSONResponse(
+            content={
+                "success": True,
+                **summary,
+                "timestamp": datetime.now().isoformat()
+            },
+            headers={"ETag": area_etag}
+        )
+
+    except Exception as e:
+        logger.error(f"Fehler bei der Flächenstatistik: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Fehler bei der Flächenstatistik: {str(e)}"
+        )
+
+
 @app.get("/cameras/status")
 async def get_cameras_with_status(days_back: int = 7, filter_by_polygon: bool = True):
     """
-    Holt alle Kamera-Status-Dateien aus den Reviere-Ordnern
-    und filtert sie optional nach Revier-Polygonen
+    Holt alle Kamera-Status-Dateien aus den Reviere-Ordnern sowie per SMS
+    empfangene Statusmeldungen und filtert sie optional nach Revier-Polygonen
 
     Args:
         days_back: Wie viele Tage zurück sollen Dateien gelesen werden (default: 7)
@@ -994,68 +1420,37 @@ async def get_cameras_with_status(days_back: int = 7, filter_by_polygon: bool =
     try:
         logger.info(f"Lade Kamera-Status (days_back={days_back}, filter_by_polygon={filter_by_polygon})")
 
-        # Lese alle Status-Dateien
-        cameras = get_camera_status_files(
-            reviere_base_dir="/mnt/synology/Reviere",
-            days_back=days_back
-        )
+        # Status-Dateien aus dem Index (nur neue/geänderte Dateien werden gelesen)
+        loop = asyncio.get_running_loop()
+        cameras = await loop.run_in_executor(None, camera_status_index.get_statuses, days_back)
 
         logger.info(f"{len(cameras)} Kamera-Status-Dateien gefunden")
 
+        # Per SMS empfangene Statusmeldungen ergänzen; das Revier wird von
+        # der neuesten Status-Datei derselben Kamera übernommen
+        sms_statuses = camera_status_store.get_statuses(days_back=days_back)
+        if sms_statuses:
+            revier_by_imei = {}
+            for camera in cameras:
+                if camera.get('imei') and camera.get('revier'):
+                    revier_by_imei[camera['imei']] = camera['revier']
+
+            for status in sms_statuses:
+                if 'revier' not in status and status.get('imei') in revier_by_imei:
+                    status['revier'] = revier_by_imei[status['imei']]
+                cameras.append(status)
+
+            logger.info(f"{len(sms_statuses)} Kamera-Status per SMS ergänzt")
+
         # Falls Polygon-Filter aktiviert
         if filter_by_polygon:
-            # Lade KML-Polygone aus Reviere-Ordner
-            polygons = {}
-
+            # Alle Revier-Parzellen aus dem Cache (KMZ wird nur bei Änderung neu gelesen)
             try:
-                reviere_dir = Path("/home/wildkamera/Reviere")
-                if reviere_dir.exists():
-                    for kmz_file in reviere_dir.glob("*.kmz"):
-                        revier_name = kmz_file.stem
-
-                        # Extract KML from KMZ und parse Koordinaten
-                        try:
-                            with zipfile.ZipFile(str(kmz_file), 'r') as z:
-                                # Suche .kml Datei in KMZ
-                                kml_files = [f for f in z.namelist() if f.endswith('.kml')]
-                                if kml_files:
-                                    kml_content = z.read(kml_files[0]).decode('utf-8')
-
-                                    # Parse KML für Polygon-Koordinaten (vereinfacht)
-                                    # Suche <coordinates> Tags
-                                    import xml.etree.ElementTree as ET
-                                    root = ET.fromstring(kml_content)
-
-                                    # Namespace handling
-                                    ns = {'kml': 'http://www.opengis.net/kml/2.2'}
-                                    coords_elements = root.findall('.//kml:coordinates', ns)
-
-                                    if not coords_elements:
-                                        # Versuche ohne Namespace
-                                        coords_elements = root.findall('.//coordinates')
-
-                                    if coords_elements:
-                                        # Nehme erstes Polygon
-                                        coords_text = coords_elements[0].text.strip()
-                                        # Parse: lng,lat,alt lng,lat,alt ...
-                                        polygon_coords = []
-                                        for point in coords_text.split():
-                                            parts = point.split(',')
-                                            if len(parts) >= 2:
-                                                lng, lat = float(parts[0]), float(parts[1])
-                                                polygon_coords.append((lat, lng))
-
-                                        if polygon_coords:
-                                            polygons[revier_name] = polygon_coords
-                                            logger.info(f"Polygon für {revier_name} geladen: {len(polygon_coords)} Punkte")
-
-                        except Exception as e:
-                            logger.warning(f"Fehler beim Laden von {kmz_file.name}: {e}")
-
-                logger.info(f"{len(polygons)} Revier-Polygone geladen")
-
-                # Filtere Kameras
-                cameras = filter_cameras_in_polygons(cameras, polygons)
+                polygon_index = await loop.run_in_executor(None, revier_polygon_store.get_index)
+                logger.info(f"{len(polygon_index)} Revier-Parzellen geladen")
+
+                # Kameras der enthaltenden Parzelle zuordnen
+                cameras = filter_cameras_in_polygons(cameras, polygon_index)
 
             except Exception as e:
                 logger.error(f"Fehler beim Laden der Polygone: {e}")
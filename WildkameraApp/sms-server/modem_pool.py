@@ -0,0 +1,288 @@
+"""
+Modem-Pool für den parallelen SMS-Versand über mehrere USB-Modems
+Verteilt Sendeaufträge nach Auslastung und Zustand der Modems
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sms_modem import SmsModem, detect_modem_ports
+
+logger = logging.getLogger(__name__)
+
+
+class _PoolMember:
+    """Ein Modem im Pool mit Auslastungs- und Fehlerstatistik"""
+
+    def __init__(self, modem: SmsModem, imei: Optional[str] = None):
+        self.modem = modem
+        self.imei = imei
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.disabled_until = 0.0
+
+    def is_healthy(self) -> bool:
+        return self.modem.is_connected() and time.monotonic() >= self.disabled_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "port": self.modem.port,
+            "imei": self.imei,
+            "connected": bool(self.modem.is_connected()),
+            "healthy": self.is_healthy(),
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "failed": self.failed,
+            "consecutive_failures": self.consecutive_failures
+        }
+
+
+class ModemPool:
+    """
+    Verwaltet mehrere SmsModem-Instanzen
+
+    Sendungen gehen an das gesunde Modem mit der kürzesten Warteschlange.
+    Schlägt ein Versand fehl, wird er automatisch über ein anderes Modem
+    wiederholt; Modems mit wiederholten Fehlern pausieren kurz.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 60.0):
+        """
+        Initialisiert den Modem-Pool
+
+        Args:
+            failure_threshold: Fehler in Folge, nach denen ein Modem pausiert
+            cooldown: Pausendauer eines fehlerhaften Modems in Sekunden
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._members: List[_PoolMember] = []
+
+    @property
+    def modems(self) -> List[SmsModem]:
+        """Alle Modems im Pool"""
+        return [member.modem for member in self._members]
+
+    @property
+    def primary(self) -> Optional[SmsModem]:
+        """Erstes verbundenes Modem (für Statusabfragen)"""
+        for member in self._members:
+            if member.modem.is_connected():
+                return member.modem
+        return None
+
+    def is_connected(self) -> bool:
+        """Prüft, ob mindestens ein Modem verbunden ist"""
+        return any(member.modem.is_connected() for member in self._members)
+
+    def capacity(self) -> int:
+        """Anzahl paralleler Sendungen, die der Pool sinnvoll abarbeiten kann"""
+        return sum(1 for member in self._members if member.is_healthy())
+
+    async def connect_all(self, ports: Optional[List[str]] = None) -> int:
+        """
+        Verbindet alle erkannten Modems parallel
+
+        Ports, die zu einem bereits verbundenen Modem gehören (gleiche IMEI,
+        z.B. mehrere ttyUSB-Schnittstellen eines Sticks), werden verworfen.
+
+        Args:
+            ports: Zu verwendende Ports, None für automatische Erkennung
+
+        Returns:
+            Anzahl verbundener Modems im Pool
+        """
+        if ports is None:
+            ports = detect_modem_ports()
+
+        known_ports = {member.modem.port for member in self._members}
+        ports = [port for port in ports if port not in known_ports]
+
+        if ports:
+            logger.info(f"Verbinde Modems: {', '.join(ports)}")
+            await asyncio.gather(*(self._connect_port(port) for port in ports))
+
+        logger.info(f"Modem-Pool: {self.capacity()} von {len(self._members)} Modems bereit")
+        return len(self._members)
+
+    async def _connect_port(self, port: str):
+        """Verbindet ein einzelnes Modem und nimmt es in den Pool auf"""
+        modem = SmsModem(port=port)
+        try:
+            await modem.connect()
+        except Exception as e:
+            logger.info(f"Port {port} ist kein nutzbares Modem: {e}")
+            return
+
+        await self.add_modem(modem)
+
+    async def add_modem(self, modem: SmsModem) -> bool:
+        """
+        Nimmt ein verbundenes Modem in den Pool auf
+
+        Args:
+            modem: Verbundenes SmsModem
+
+        Returns:
+            True wenn das Modem aufgenommen wurde
+        """
+        imei = None
+        try:
+            imei = await modem.get_imei()
+        except Exception as e:
+            logger.warning(f"IMEI von {modem.port} nicht lesbar: {e}")
+
+        if imei and any(member.imei == imei for member in self._members):
+            logger.info(f"Port {modem.port} gehört zu bereits verbundenem Modem {imei}")
+            await modem.disconnect()
+            return False
+
+        self._members.append(_PoolMember(modem, imei))
+        logger.info(f"Modem {modem.port} zum Pool hinzugefügt (IMEI {imei})")
+        return True
+
+    async def disconnect_all(self):
+        """Trennt alle Modems und leert den Pool"""
+        members, self._members = self._members, []
+        for member in members:
+            try:
+                await member.modem.disconnect()
+            except Exception as e:
+                logger.error(f"Fehler beim Trennen von {member.modem.port}: {e}")
+
+    def _select_member(self, exclude: List[_PoolMember]) -> Optional[_PoolMember]:
+        """Gesundes Modem mit der kürzesten Warteschlange"""
+        candidates = [
+            member for member in self._members
+            if member not in exclude and member.is_healthy()
+        ]
+        if not candidates:
+            return None
+        return min(
+            candidates,
+            key=lambda member: (member.in_flight, member.consecutive_failures, member.sent)
+        )
+
+    def _record_result(self, member: _PoolMember, success: bool):
+        """Aktualisiert die Statistik eines Modems nach einem Versand"""
+        if success:
+            member.sent += 1
+            member.consecutive_failures = 0
+            return
+
+        member.failed += 1
+        member.consecutive_failures += 1
+        if member.consecutive_failures >= self.failure_threshold:
+            member.disabled_until = time.monotonic() + self.cooldown
+            logger.warning(
+                f"Modem {member.modem.port} pausiert nach "
+                f"{member.consecutive_failures} Fehlern in Folge"
+            )
+
+    async def send_sms(self, phone_number: str, message: str) -> bool:
+        """
+        Sendet eine SMS über das am wenigsten ausgelastete Modem
+
+        Bei einem Fehlschlag wird jedes weitere gesunde Modem einmal versucht.
+
+        Args:
+            phone_number: Zieltelefonnummer
+            message: SMS-Text
+
+        Returns:
+            True bei erfolgreichem Versand
+        """
+        if self._select_member([]) is None:
+            raise Exception("Kein Modem verfügbar")
+
+        result = await self._send_with_failover(phone_number, message, [])
+        return result["success"]
+
+    async def send_sms_batch(self, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Sendet einen Stapel SMS über ein Modem (ein Handshake für alle)
+
+        Fehlgeschlagene Nachrichten werden einzeln über andere Modems wiederholt.
+
+        Args:
+            messages: Liste von (Telefonnummer, SMS-Text)
+
+        Returns:
+            Liste mit einem Ergebnis pro Nachricht (siehe SmsModem.send_sms_batch)
+        """
+        member = self._select_member([])
+        if member is None:
+            raise Exception("Kein Modem verfügbar")
+
+        member.in_flight += len(messages)
+        try:
+            results = await member.modem.send_sms_batch(messages)
+        except Exception as e:
+            logger.error(f"Fehler beim Stapelversand über {member.modem.port}: {e}")
+            results = [
+                {"phone_number": phone_number, "success": False,
+                 "message_reference": None, "parts": 1, "error": str(e)}
+                for phone_number, _ in messages
+            ]
+        finally:
+            member.in_flight -= len(messages)
+
+        for result in results:
+            self._record_result(member, result["success"])
+
+        for index, (phone_number, message) in enumerate(messages):
+            if not results[index]["success"]:
+                logger.info(f"Versand an {phone_number} über {member.modem.port} fehlgeschlagen, versuche anderes Modem")
+                retry = await self._send_with_failover(phone_number, message, [member])
+                if retry["success"] or retry["error"]:
+                    results[index] = retry
+
+        return results
+
+    async def _send_with_failover(
+        self,
+        phone_number: str,
+        message: str,
+        tried: List[_PoolMember]
+    ) -> Dict[str, Any]:
+        """Versucht eine SMS nacheinander über alle noch nicht versuchten Modems"""
+        result = {
+            "phone_number": phone_number,
+            "success": False,
+            "message_reference": None,
+            "parts": 1,
+            "error": None
+        }
+
+        while True:
+            member = self._select_member(tried)
+            if member is None:
+                return result
+
+            tried.append(member)
+            member.in_flight += 1
+            try:
+                result = (await member.modem.send_sms_batch([(phone_number, message)]))[0]
+            except Exception as e:
+                logger.error(f"Fehler beim Senden über {member.modem.port}: {e}")
+                result = dict(result, success=False, error=str(e))
+            finally:
+                member.in_flight -= 1
+
+            self._record_result(member, result["success"])
+            if result["success"]:
+                return result
+
+            logger.info(f"Versand an {phone_number} über {member.modem.port} fehlgeschlagen, versuche anderes Modem")
+
+    def get_status(self) -> List[Dict[str, Any]]:
+        """
+        Status aller Modems im Pool
+
+        Returns:
+            Liste mit Port, IMEI, Auslastung und Fehlerstatistik
+        """
+        return [member.to_dict() for member in self._members]
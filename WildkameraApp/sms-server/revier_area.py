@@ -0,0 +1,179 @@
+"""
+Flächenstatistik der Revier-KMZ-Dateien
+Berechnet je KMZ die geodätische Fläche aller Polygone (äußere Ringe minus
+Löcher) auf dem WGS84-Ellipsoid und cacht das Ergebnis je KMZ-Hash, sodass
+wiederholte Abfragen nur noch summieren. Auch _Wiesen_archiv/code/calcHA.py
+rechnet mit ring_area/polygon_area aus diesem Modul
+"""
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pyproj import Geod
+
+from kml_geometry import KmlFeature, read_kmz_geometry
+
+logger = logging.getLogger(__name__)
+
+GEOD = Geod(ellps="WGS84")
+
+# Ring als (Längengrade, Breitengrade)
+Ring = Tuple[Sequence[float], Sequence[float]]
+
+
+def ring_area(lons: Sequence[float], lats: Sequence[float]) -> float:
+    """
+    Geodätische Fläche eines Rings
+
+    Args:
+        lons: Längengrade des Rings (muss nicht geschlossen sein)
+        lats: Breitengrade des Rings
+
+    Returns:
+        Fläche in m² (immer positiv, 0 bei weniger als 3 Punkten)
+    """
+    if len(lons) < 3:
+        return 0.0
+    # Vorzeichen hängt von der Umlaufrichtung ab
+    area, _ = GEOD.polygon_area_perimeter(lons, lats)
+    return abs(area)
+
+
+def polygon_area(outer: Ring, holes: Iterable[Ring] = ()) -> float:
+    """
+    Geodätische Fläche eines Polygons (äußerer Ring minus Löcher, mindestens 0)
+
+    Args:
+        outer: Äußerer Ring als (lons, lats)
+        holes: Innere Ringe als (lons, lats)
+
+    Returns:
+        Fläche in m²
+    """
+    return max(ring_area(*outer) - sum(ring_area(*hole) for hole in holes), 0.0)
+
+
+def features_area(features: Iterable[KmlFeature]) -> Dict[str, Any]:
+    """
+    Fläche aller Polygone einer KMZ (äußerer Ring minus Löcher, je Polygon mindestens 0)
+
+    Args:
+        features: Features aus kml_geometry (erster Ring = äußerer Ring)
+
+    Returns:
+        {"polygons", "holes", "area_m2"}
+    """
+    polygons = holes = 0
+    total = 0.0
+    for feature in features:
+        if feature.geometry_type != "Polygon" or not feature.rings or len(feature.rings[0]) < 6:
+            continue
+        outer, inner = feature.rings[0], [ring for ring in feature.rings[1:] if len(ring) >= 6]
+        total += polygon_area((outer[0::2], outer[1::2]), [(ring[0::2], ring[1::2]) for ring in inner])
+        polygons += 1
+        holes += len(inner)
+    return {"polygons": polygons, "holes": holes, "area_m2": total}
+
+
+class RevierAreaCache:
+    """
+    Flächen je KMZ-Hash
+
+    Der Hash kommt aus dem KMZ-Katalog; eine geänderte Datei hat einen neuen
+    Hash und wird neu berechnet. Einträge verschwundener Dateien werden bei
+    prune() verworfen.
+    """
+
+    def __init__(self):
+        """Initialisiert den (leeren) Cache"""
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_area(self, file_hash: str, kmz_path: str) -> Dict[str, Any]:
+        """
+        Liefert die Fläche einer KMZ (berechnet sie nur beim ersten Zugriff)
+
+        Args:
+            file_hash: MD5-Hash der KMZ
+            kmz_path: Pfad zur KMZ-Datei
+
+        Returns:
+            {"polygons", "holes", "area_m2"}
+        """
+        with self._lock:
+            result = self._results.get(file_hash)
+        if result is not None:
+            return result
+
+        result = features_area(read_kmz_geometry(kmz_path))
+        logger.info(f"Fläche berechnet: {kmz_path} ({result['polygons']} Polygone, {result['area_m2'] / 10_000:.2f} ha)")
+
+        with self._lock:
+            self._results[file_hash] = result
+        return result
+
+    def prune(self, file_hashes: Iterable[str]):
+        """Verwirft alle Einträge, deren Hash nicht mehr vorkommt"""
+        keep = set(file_hashes)
+        with self._lock:
+            for file_hash in [h for h in self._results if h not in keep]:
+                del self._results[file_hash]
+
+    def summarize(self, files: List[Dict[str, Any]], revier: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Flächenstatistik je Revier
+
+        Args:
+            files: Dateien aus dem KMZ-Katalog (hash, full_path, revier, filename, path)
+            revier: Nur dieses Revier auswerten (optional)
+
+        Returns:
+            {"reviere": [...], "total": {...}}; je Revier Dateien mit Polygonen,
+            Löchern, m² und ha
+        """
+        reviere: Dict[str, Dict[str, Any]] = {}
+        for file_info in sorted(files, key=lambda f: (f["revier"], f["path"])):
+            if revier is not None and file_info["revier"] != revier:
+                continue
+            if not file_info["hash"]:
+                # Nicht lesbare Dateien haben keinen Hash (und damit keinen Cache-Schlüssel)
+                logger.warning(f"Fläche übersprungen, Datei nicht lesbar: {file_info['full_path']}")
+                continue
+            try:
+                area = self.get_area(file_info["hash"], file_info["full_path"])
+            except Exception as e:
+                logger.warning(f"Fläche nicht berechenbar: {file_info['full_path']} ({e})")
+                continue
+
+            entry = reviere.setdefault(file_info["revier"], {
+                "revier": file_info["revier"],
+                "polygons": 0,
+                "holes": 0,
+                "area_m2": 0.0,
+                "files": []
+            })
+            entry["polygons"] += area["polygons"]
+            entry["holes"] += area["holes"]
+            entry["area_m2"] += area["area_m2"]
+            entry["files"].append({
+                "filename": file_info["filename"],
+                "path": file_info["path"],
+                "hash": file_info["hash"],
+                **area,
+                "area_ha": area["area_m2"] / 10_000
+            })
+
+        for entry in reviere.values():
+            entry["area_ha"] = entry["area_m2"] / 10_000
+
+        area_m2 = sum(entry["area_m2"] for entry in reviere.values())
+        return {
+            "reviere": list(reviere.values()),
+            "total": {
+                "files": sum(len(entry["files"]) for entry in reviere.values()),
+                "polygons": sum(entry["polygons"] for entry in reviere.values()),
+                "holes": sum(entry["holes"] for entry in reviere.values()),
+                "area_m2": area_m2,
+                "area_ha": area_m2 / 10_000
+            }
+        }
@@ -0,0 +1,625 @@
+"""
+Revier-Polygone für den Polygon-Filter von /cameras/status
+Liest jede KMZ-Datei nur einmal ein, hält alle Parzellen (inkl. Löcher) als
+kompakte Float-Arrays mit Bounding-Box und ordnet Punkte über einen
+Gitter-Index der enthaltenden Parzelle zu; mit NumPy auch als Batch
+"""
+import glob
+import logging
+import math
+import os
+import threading
+import xml.etree.ElementTree as ET
+import zipfile
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Parzellen, die mehr Gitterzellen überdecken, werden bei jeder Abfrage geprüft
+MAX_CELLS_PER_POLYGON = 4096
+
+# Darunter lohnt sich der NumPy-Aufruf je Parzelle nicht, es wird einzeln geprüft
+MIN_BATCH_POINTS = 32
+
+
+def ring_contains(coords: Sequence[float], lat: float, lng: float) -> bool:
+    """
+    Ray-casting Point-in-Polygon Check für einen Ring (gleiche Randregeln wie point_in_polygon)
+
+    Args:
+        coords: Punkte als [lat0, lng0, lat1, lng1, ...]
+        lat: Breitengrad
+        lng: Längengrad
+
+    Returns:
+        bool: True wenn Punkt im Ring liegt
+    """
+    inside = False
+    p1x = coords[-2]
+    p1y = coords[-1]
+    for i in range(0, len(coords), 2):
+        p2x = coords[i]
+        p2y = coords[i + 1]
+        if p1y < lng <= p2y or p2y < lng <= p1y:
+            if lat <= (p1x if p1x > p2x else p2x):
+                if p1x == p2x or lat <= (lng - p1y) * (p2x - p1x) / (p2y - p1y) + p1x:
+                    inside = not inside
+        p1x = p2x
+        p1y = p2y
+
+    return inside
+
+
+def ring_contains_batch(coords: Sequence[float], lats: "np.ndarray", lngs: "np.ndarray") -> "np.ndarray":
+    """
+    Vektorisierter Ray-casting Check vieler Punkte gegen einen Ring (benötigt NumPy)
+
+    Die Punkte werden nach Längengrad sortiert, sodass jede Kante per
+    searchsorted nur die Punkte prüft, deren Strahl sie schneidet. Randregeln
+    und Rechenreihenfolge entsprechen ring_contains, die Ergebnisse sind
+    bitgleich.
+
+    Args:
+        coords: Punkte als [lat0, lng0, lat1, lng1, ...]
+        lats: Breitengrade als float64-Array
+        lngs: Längengrade als float64-Array
+
+    Returns:
+        Bool-Array, True wenn der Punkt im Ring liegt
+    """
+    ring = np.asarray(coords, dtype=np.float64)
+    p2x = ring[0::2]
+    p2y = ring[1::2]
+    p1x = np.roll(p2x, 1)
+    p1y = np.roll(p2y, 1)
+
+    order = np.argsort(lngs, kind="stable")
+    sorted_lats = lats[order]
+    sorted_lngs = lngs[order]
+
+    # Kante schneidet den Strahl genau für min(y) < lng <= max(y)
+    starts = np.searchsorted(sorted_lngs, np.minimum(p1y, p2y), side="right")
+    ends = np.searchsorted(sorted_lngs, np.maximum(p1y, p2y), side="right")
+    max_x = np.maximum(p1x, p2x).tolist()
+
+    x1s, y1s, x2s, y2s = p1x.tolist(), p1y.tolist(), p2x.tolist(), p2y.tolist()
+    starts_list, ends_list = starts.tolist(), ends.tolist()
+
+    inside = np.zeros(len(sorted_lngs), dtype=bool)
+    for edge in np.flatnonzero(ends > starts).tolist():
+        start = starts_list[edge]
+        end = ends_list[edge]
+        lat_slice = sorted_lats[start:end]
+        x1 = x1s[edge]
+        x2 = x2s[edge]
+        crossing = lat_slice <= max_x[edge]
+        if x1 != x2:
+            y1 = y1s[edge]
+            crossing &= lat_slice <= (sorted_lngs[start:end] - y1) * (x2 - x1) / (y2s[edge] - y1) + x1
+        inside[start:end] ^= crossing
+
+    result = np.empty_like(inside)
+    result[order] = inside
+    return result
+
+
+class RevierPolygon:
+    """
+    Einzelne Parzelle eines Reviers
+
+    Die Punkte liegen abwechselnd als lat, lng in array('d'); innere Ringe
+    (Löcher) gehören nicht zur Parzelle. Die Bounding-Box des äußeren
+    Rings erlaubt einen schnellen Ausschluss entfernter Kameras.
+    """
+
+    __slots__ = ("revier", "name", "coords", "holes", "min_lat", "min_lng", "max_lat", "max_lng")
+
+    def __init__(
+        self,
+        revier: str,
+        coords: array,
+        holes: Optional[List[array]] = None,
+        name: Optional[str] = None
+    ):
+        """
+        Initialisiert die Parzelle
+
+        Args:
+            revier: Revier-Name
+            coords: Äußerer Ring als array('d') [lat0, lng0, lat1, lng1, ...]
+            holes: Innere Ringe im selben Format
+            name: Name des Placemarks (falls vorhanden)
+        """
+        self.revier = revier
+        self.name = name
+        self.coords = coords
+        self.holes = holes or []
+        lats = coords[0::2]
+        lngs = coords[1::2]
+        self.min_lat = min(lats)
+        self.max_lat = max(lats)
+        self.min_lng = min(lngs)
+        self.max_lng = max(lngs)
+
+    @classmethod
+    def from_points(cls, revier: str, points: Iterable[Tuple[float, float]]) -> "RevierPolygon":
+        """
+        Erzeugt eine Parzelle ohne Löcher aus (lat, lng)-Tupeln
+
+        Args:
+            revier: Revier-Name
+            points: Liste von (lat, lng) Koordinaten
+
+        Returns:
+            RevierPolygon
+        """
+        coords = array('d')
+        for lat, lng in points:
+            coords.append(lat)
+            coords.append(lng)
+        return cls(revier, coords)
+
+    def __len__(self) -> int:
+        return len(self.coords) // 2
+
+    def contains(self, lat: float, lng: float) -> bool:
+        """
+        Prüft, ob ein Punkt in der Parzelle (und in keinem ihrer Löcher) liegt
+
+        Args:
+            lat: Breitengrad
+            lng: Längengrad
+
+        Returns:
+            bool: True wenn Punkt in der Parzelle liegt
+        """
+        if lat < self.min_lat or lat > self.max_lat or lng < self.min_lng or lng > self.max_lng:
+            return False
+        if not ring_contains(self.coords, lat, lng):
+            return False
+        for hole in self.holes:
+            if ring_contains(hole, lat, lng):
+                return False
+        return True
+
+    def contains_many(self, lats: Sequence[float], lngs: Sequence[float]):
+        """
+        Prüft viele Punkte auf einmal (gleiche Ergebnisse wie contains)
+
+        Mit NumPy werden zuerst per Bounding-Box alle entfernten Punkte
+        ausgeschlossen und die übrigen in einem vektorisierten Durchlauf
+        geprüft; ohne NumPy wird contains je Punkt aufgerufen.
+
+        Args:
+            lats: Breitengrade
+            lngs: Längengrade
+
+        Returns:
+            Bool-Array (mit NumPy) bzw. Liste von bool
+        """
+        if not NUMPY_AVAILABLE:
+            return [self.contains(lat, lng) for lat, lng in zip(lats, lngs)]
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        mask = (
+            (lats >= self.min_lat) & (lats <= self.max_lat)
+            & (lngs >= self.min_lng) & (lngs <= self.max_lng)
+        )
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return mask
+
+        inside = ring_contains_batch(self.coords, lats[candidates], lngs[candidates])
+        for hole in self.holes:
+            remaining = candidates[inside]
+            if len(remaining) == 0:
+                break
+            inside[inside] = ~ring_contains_batch(hole, lats[remaining], lngs[remaining])
+
+        mask[candidates] = inside
+        return mask
+
+
+def points_in_polygons(
+    lats: Sequence[float],
+    lngs: Sequence[float],
+    polygons: Sequence[RevierPolygon]
+) -> list:
+    """
+    Containment-Masken vieler Punkte für mehrere Parzellen
+
+    Args:
+        lats: Breitengrade
+        lngs: Längengrade
+        polygons: Zu prüfende Parzellen
+
+    Returns:
+        Je Parzelle eine Maske (siehe RevierPolygon.contains_many)
+    """
+    if NUMPY_AVAILABLE:
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+    return [polygon.contains_many(lats, lngs) for polygon in polygons]
+
+
+class PolygonGridIndex:
+    """
+    Gleichmäßiges Gitter über die Bounding-Boxen aller Parzellen
+
+    Die Zellgröße richtet sich nach der typischen Parzellengröße, sodass
+    eine Abfrage nur wenige Kandidaten prüfen muss.
+    """
+
+    def __init__(self, polygons: List[RevierPolygon], cell_size: Optional[float] = None):
+        """
+        Baut den Index auf
+
+        Args:
+            polygons: Alle Parzellen (Reihenfolge bestimmt die Trefferreihenfolge)
+            cell_size: Kantenlänge einer Gitterzelle in Grad (default: Median der Parzellengröße)
+        """
+        self.polygons = polygons
+
+        if cell_size is None:
+            sizes = sorted(
+                max(p.max_lat - p.min_lat, p.max_lng - p.min_lng) for p in polygons
+            )
+            cell_size = sizes[len(sizes) // 2] if sizes else 1.0
+        self.cell_size = max(cell_size, 1e-6)
+
+        cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        oversized: List[int] = []
+        for position, polygon in enumerate(polygons):
+            lat_from, lng_from = self._cell(polygon.min_lat, polygon.min_lng)
+            lat_to, lng_to = self._cell(polygon.max_lat, polygon.max_lng)
+            if (lat_to - lat_from + 1) * (lng_to - lng_from + 1) > MAX_CELLS_PER_POLYGON:
+                oversized.append(position)
+                continue
+            for lat_cell in range(lat_from, lat_to + 1):
+                for lng_cell in range(lng_from, lng_to + 1):
+                    cells[(lat_cell, lng_cell)].append(position)
+
+        self._cells = dict(cells)
+        self._oversized = oversized
+
+    def __len__(self) -> int:
+        return len(self.polygons)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        """Gitterzelle eines Punkts"""
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def find(self, lat: float, lng: float) -> List[RevierPolygon]:
+        """
+        Liefert alle Parzellen, die den Punkt enthalten
+
+        Args:
+            lat: Breitengrad
+            lng: Längengrad
+
+        Returns:
+            Liste der Parzellen in Index-Reihenfolge
+        """
+        candidates = self._cells.get(self._cell(lat, lng), [])
+        if self._oversized:
+            candidates = sorted(set(candidates).union(self._oversized))
+
+        polygons = self.polygons
+        return [polygons[i] for i in candidates if polygons[i].contains(lat, lng)]
+
+    def find_many(self, lats: Sequence[float], lngs: Sequence[float]) -> List[List[RevierPolygon]]:
+        """
+        Liefert für viele Punkte die enthaltenden Parzellen (gleiche Ergebnisse wie find)
+
+        Mit NumPy werden die Punkte nach Gitterzelle gruppiert und jede
+        betroffene Parzelle prüft ihre Kandidaten in einem Batch.
+
+        Args:
+            lats: Breitengrade
+            lngs: Längengrade
+
+        Returns:
+            Je Punkt die Liste der Parzellen in Index-Reihenfolge
+        """
+        if not NUMPY_AVAILABLE:
+            return [self.find(lat, lng) for lat, lng in zip(lats, lngs)]
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        results: List[List[RevierPolygon]] = [[] for _ in range(len(lats))]
+        if len(lats) == 0:
+            return results
+
+        # Punkte nach Gitterzelle sortieren und je Zelle einmal nachschlagen
+        lat_cells = np.floor(lats / self.cell_size).astype(np.int64)
+        lng_cells = np.floor(lngs / self.cell_size).astype(np.int64)
+        order = np.lexsort((lng_cells, lat_cells))
+        lat_cells = lat_cells[order]
+        lng_cells = lng_cells[order]
+        boundaries = np.flatnonzero((np.diff(lat_cells) != 0) | (np.diff(lng_cells) != 0)) + 1
+        starts = [0] + boundaries.tolist()
+        ends = boundaries.tolist() + [len(order)]
+        lat_cell_list = lat_cells.tolist()
+        lng_cell_list = lng_cells.tolist()
+
+        points_by_polygon: Dict[int, List["np.ndarray"]] = defaultdict(list)
+        for start, end in zip(starts, ends):
+            for position in self._cells.get((lat_cell_list[start], lng_cell_list[start]), ()):
+                points_by_polygon[position].append(order[start:end])
+        for position in self._oversized:
+            points_by_polygon[position] = [order]
+
+        lat_list = lats.tolist()
+        lng_list = lngs.tolist()
+        for position in sorted(points_by_polygon):
+            polygon = self.polygons[position]
+            chunks = points_by_polygon[position]
+            points = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+            if len(points) < MIN_BATCH_POINTS:
+                for point in points.tolist():
+                    if polygon.contains(lat_list[point], lng_list[point]):
+                        results[point].append(polygon)
+                continue
+
+            mask = polygon.contains_many(lats[points], lngs[points])
+            for point in points[mask].tolist():
+                results[point].append(polygon)
+
+        return results
+
+
+def _parse_coordinates(text: Optional[str]) -> array:
+    """Wandelt einen <coordinates>-Text (lng,lat,alt ...) in array('d') [lat, lng, ...]"""
+    coords = array('d')
+    for point in (text or "").split():
+        parts = point.split(',')
+        if len(parts) >= 2:
+            coords.append(float(parts[1]))
+            coords.append(float(parts[0]))
+    return coords
+
+
+def _local_name(tag: str) -> str:
+    """Tag-Name ohne Namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _children(element: ET.Element, name: str) -> List[ET.Element]:
+    """Direkte Kindelemente mit passendem Tag-Namen (Namespace egal)"""
+    return [child for child in element if _local_name(child.tag) == name]
+
+
+def _ring_coordinates(boundary: ET.Element) -> array:
+    """Koordinaten des LinearRing in einem outer-/innerBoundaryIs-Element"""
+    for ring in _children(boundary, "LinearRing"):
+        for coordinates in _children(ring, "coordinates"):
+            return _parse_coordinates(coordinates.text)
+    return array('d')
+
+
+def _polygon_from_element(polygon: ET.Element, revier_name: str, name: Optional[str]) -> Optional[RevierPolygon]:
+    """Erzeugt eine Parzelle aus einem <Polygon>-Element"""
+    outer = None
+    holes = []
+    for child in polygon:
+        tag = _local_name(child.tag)
+        if tag == "outerBoundaryIs" and outer is None:
+            outer = _ring_coordinates(child)
+        elif tag == "innerBoundaryIs":
+            hole = _ring_coordinates(child)
+            if hole:
+                holes.append(hole)
+
+    if not outer:
+        return None
+    return RevierPolygon(revier_name, outer, holes, name)
+
+
+def load_revier_polygons(kmz_path: str, revier_name: str) -> List[RevierPolygon]:
+    """
+    Liest alle Polygone (mit Löchern) aus der ersten KML-Datei einer KMZ
+
+    Enthält die KML keine <Polygon>-Elemente, wird wie bisher das erste
+    <coordinates>-Element als Umriss verwendet.
+
+    Args:
+        kmz_path: Pfad zur KMZ-Datei
+        revier_name: Name des Reviers
+
+    Returns:
+        Liste der Parzellen (leer, wenn die Datei keine Koordinaten enthält)
+    """
+    with zipfile.ZipFile(kmz_path, 'r') as z:
+        kml_files = [f for f in z.namelist() if f.endswith('.kml')]
+        if not kml_files:
+            return []
+        kml_content = z.read(kml_files[0])
+
+    root = ET.fromstring(kml_content)
+
+    polygons = []
+    seen = set()
+    for placemark in root.iter():
+        if _local_name(placemark.tag) != "Placemark":
+            continue
+        names = _children(placemark, "name")
+        name = names[0].text.strip() if names and names[0].text else None
+        for element in placemark.iter():
+            if _local_name(element.tag) == "Polygon":
+                seen.add(element)
+                polygon = _polygon_from_element(element, revier_name, name)
+                if polygon is not None:
+                    polygons.append(polygon)
+
+    # Polygone außerhalb von Placemarks
+    for element in root.iter():
+        if _local_name(element.tag) == "Polygon" and element not in seen:
+            polygon = _polygon_from_element(element, revier_name, None)
+            if polygon is not None:
+                polygons.append(polygon)
+
+    if polygons:
+        return polygons
+
+    for element in root.iter():
+        if _local_name(element.tag) == "coordinates":
+            coords = _parse_coordinates(element.text)
+            return [RevierPolygon(revier_name, coords)] if coords else []
+    return []
+
+
+class RevierPolygonStore:
+    """
+    Cache der Revier-Parzellen aus <base_dir>/*.kmz
+
+    Eine KMZ wird nur neu eingelesen, wenn sich Größe oder mtime geändert
+    haben; entfernte Dateien fallen beim nächsten Abruf heraus. Der
+    Gitter-Index wird nur nach Änderungen neu aufgebaut.
+    """
+
+    def __init__(self, base_dir: str):
+        """
+        Initialisiert den Polygon-Speicher
+
+        Args:
+            base_dir: Verzeichnis mit den Revier-KMZ-Dateien
+        """
+        self.base_dir = base_dir
+        self._polygons: Dict[str, List[RevierPolygon]] = {}
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._index = PolygonGridIndex([])
+        self._index_stale = False
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Liest neue/geänderte KMZ-Dateien ein und markiert den Index ggf. als veraltet"""
+        if not os.path.isdir(self.base_dir):
+            if self._signatures:
+                self._polygons = {}
+                self._signatures = {}
+                self._index_stale = True
+            return
+
+        polygons = {}
+        signatures = {}
+        changed = False
+        for kmz_path in sorted(glob.glob(os.path.join(glob.escape(self.base_dir), "*.kmz"))):
+            try:
+                file_stat = os.stat(kmz_path)
+            except OSError as e:
+                logger.warning(f"Fehler beim Laden von {os.path.basename(kmz_path)}: {e}")
+                continue
+
+            signature = (file_stat.st_size, file_stat.st_mtime_ns)
+            signatures[kmz_path] = signature
+            if self._signatures.get(kmz_path) == signature:
+                polygons[kmz_path] = self._polygons.get(kmz_path, [])
+                continue
+
+            changed = True
+            revier_name = os.path.splitext(os.path.basename(kmz_path))[0]
+            try:
+                polygons[kmz_path] = load_revier_polygons(kmz_path, revier_name)
+            except Exception as e:
+                # Fehlerhafte Datei erst nach der nächsten Änderung erneut lesen
+                logger.warning(f"Fehler beim Laden von {os.path.basename(kmz_path)}: {e}")
+                polygons[kmz_path] = []
+                continue
+
+            if polygons[kmz_path]:
+                points = sum(len(polygon) for polygon in polygons[kmz_path])
+                logger.info(
+                    f"Polygone für {revier_name} geladen: "
+                    f"{len(polygons[kmz_path])} Parzellen, {points} Punkte"
+                )
+
+        if changed or signatures.keys() != self._signatures.keys():
+            self._index_stale = True
+        self._polygons = polygons
+        self._signatures = signatures
+
+    def get_polygons(self) -> Dict[str, List[RevierPolygon]]:
+        """
+        Liefert die Parzellen aller Reviere und liest geänderte KMZ-Dateien neu ein
+
+        Returns:
+            Dict {revier_name: [RevierPolygon, ...]}
+        """
+        with self._lock:
+            self._refresh()
+            reviere: Dict[str, List[RevierPolygon]] = {}
+            for polygons in self._polygons.values():
+                for polygon in polygons:
+                    reviere.setdefault(polygon.revier, []).append(polygon)
+            return reviere
+
+    def get_index(self) -> PolygonGridIndex:
+        """
+        Liefert den Gitter-Index über alle Parzellen und liest geänderte KMZ-Dateien neu ein
+
+        Returns:
+            PolygonGridIndex
+        """
+        with self._lock:
+            self._refresh()
+            if self._index_stale:
+                self._index = PolygonGridIndex(
+                    [polygon for polygons in self._polygons.values() for polygon in polygons]
+                )
+                self._index_stale = False
+            return self._index
+
+
+if __name__ == "__main__":
+    # Benchmark: Batch-Kernel gegen point_in_polygon (python3 revier_polygons.py [Punkte] [Ecken])
+    import random
+    import sys
+    import time
+
+    from camera_status_parser import point_in_polygon
+
+    point_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    vertex_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    random.seed(42)
+    outline = [
+        (
+            48.7 + 0.05 * (0.6 + 0.4 * random.random()) * math.cos(2 * math.pi * i / vertex_count),
+            11.2 + 0.05 * (0.6 + 0.4 * random.random()) * math.sin(2 * math.pi * i / vertex_count)
+        )
+        for i in range(vertex_count)
+    ]
+    polygon = RevierPolygon.from_points("Benchmark", outline)
+    points = [(48.7 + random.uniform(-0.08, 0.08), 11.2 + random.uniform(-0.08, 0.08)) for _ in range(point_count)]
+    # Einige Punkte exakt auf Ecken, um die Randregeln mitzuprüfen
+    points[:100] = outline[:100]
+    lats = [lat for lat, _ in points]
+    lngs = [lng for _, lng in points]
+
+    started = time.perf_counter()
+    expected = [point_in_polygon(point, outline) for point in points]
+    scalar_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scalar_bbox = [polygon.contains(lat, lng) for lat, lng in points]
+    bbox_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = list(polygon.contains_many(lats, lngs))
+    batch_time = time.perf_counter() - started
+
+    print(f"{point_count} Punkte, Polygon mit {vertex_count} Ecken, NumPy: {NUMPY_AVAILABLE}")
+    print(f"  point_in_polygon:         {scalar_time * 1000:9.1f} ms")
+    print(f"  RevierPolygon.contains:   {bbox_time * 1000:9.1f} ms")
+    print(f"  contains_many (Batch):    {batch_time * 1000:9.1f} ms  ({scalar_time / batch_time:.0f}x)")
+    print(f"  identisch: {expected == scalar_bbox == [bool(value) for value in batch]}")
@@ -1,54 +1,111 @@
 """
 Settings Manager für persistente Speicherung von Kamera-Einstellungen
+Die Einstellungen liegen je Kamera als Zeile in einer SQLite-Datenbank
+(WAL-Modus); Änderungen an einer Kamera überschreiben keine anderen, auch
+wenn ein zweiter Prozess (z.B. ein Skript) gleichzeitig schreibt
 """
 import json
 import os
-from typing import Dict, Optional, Any
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Any
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cameras (
+    camera_id TEXT PRIMARY KEY,
+    settings TEXT NOT NULL,
+    last_updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
 
 class SettingsManager:
     """
     Verwaltet die Persistenz von Kamera-Einstellungen
     """
 
-    def __init__(self, settings_file: str = "camera_settings.json"):
+    def __init__(self, db_file: str = "camera_settings.db", legacy_file: str = "camera_settings.json"):
         """
         Initialisiert den Settings Manager
 
         Args:
-            settings_file: Pfad zur JSON-Datei für Einstellungen
+            db_file: Pfad zur SQLite-Datei für Einstellungen
+            legacy_file: Frühere JSON-Datei, deren Inhalt einmalig übernommen wird
         """
-        self.settings_file = settings_file
-        self.settings: Dict[str, Any] = {}
-        self._load_settings()
+        self.db_file = db_file
+        self.legacy_file = legacy_file
+        self._lock = threading.Lock()
+        self._legacy_sms_log: List[Dict[str, Any]] = []
 
-    def _load_settings(self):
-        """Lädt Einstellungen aus der JSON-Datei"""
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r', encoding='utf-8') as f:
-                    self.settings = json.load(f)
-                logger.info(f"Einstellungen geladen aus {self.settings_file}")
-            else:
-                logger.info("Keine gespeicherten Einstellungen gefunden, starte mit leeren Einstellungen")
-                self.settings = {}
-        except Exception as e:
-            logger.error(f"Fehler beim Laden der Einstellungen: {e}")
-            self.settings = {}
+        self._conn = sqlite3.connect(db_file, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._import_legacy_settings()
+        logger.info(f"Einstellungen geöffnet: {db_file} ({len(self.get_all_cameras())} Kameras)")
+
+    def _import_legacy_settings(self):
+        """Übernimmt einmalig die Einstellungen aus der alten JSON-Datei"""
+        if not os.path.exists(self.legacy_file):
+            return
 
-    def _save_settings(self):
-        """Speichert Einstellungen in die JSON-Datei"""
         try:
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, indent=2, ensure_ascii=False)
-            logger.info(f"Einstellungen gespeichert in {self.settings_file}")
+            with self._lock:
+                # BEGIN IMMEDIATE: nur ein Worker übernimmt die Datei
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    imported = self._conn.execute(
+                        "SELECT value FROM meta WHERE key = 'legacy_imported'"
+                    ).fetchone()
+                    if imported:
+                        self._conn.execute("COMMIT")
+                        return
+
+                    with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                        legacy = json.load(f)
+
+                    for camera_id, settings in legacy.get("cameras", {}).items():
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO cameras (camera_id, settings, last_updated) VALUES (?, ?, ?)",
+                            (
+                                camera_id,
+                                json.dumps(settings, ensure_ascii=False),
+                                settings.get("last_updated") or datetime.now().isoformat()
+                            )
+                        )
+                    if legacy.get("last_camera_id"):
+                        self._set_meta("last_camera_id", legacy["last_camera_id"])
+                    self._set_meta("legacy_imported", datetime.now().isoformat())
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+
+            self._legacy_sms_log = legacy.get("sms_log", [])
+            logger.info(
+                f"Einstellungen aus {self.legacy_file} übernommen: "
+                f"{len(legacy.get('cameras', {}))} Kameras"
+            )
         except Exception as e:
-            logger.error(f"Fehler beim Speichern der Einstellungen: {e}")
-            raise
+            logger.error(f"Fehler beim Übernehmen der alten Einstellungen: {e}")
+
+    def _set_meta(self, key: str, value: str):
+        """Setzt einen Meta-Wert (innerhalb einer laufenden Transaktion)"""
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        """Liest einen Meta-Wert"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
 
     def save_camera_settings(self, camera_id: str, settings: Dict[str, Any]) -> bool:
         """
@@ -62,19 +119,25 @@ class SettingsManager:
             True bei Erfolg
         """
         try:
-            if "cameras" not in self.settings:
-                self.settings["cameras"] = {}
-
             # Timestamp hinzufügen
             settings["last_updated"] = datetime.now().isoformat()
 
-            # Einstellungen für Kamera speichern
-            self.settings["cameras"][camera_id] = settings
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Einstellungen für Kamera speichern
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO cameras (camera_id, settings, last_updated) VALUES (?, ?, ?)",
+                        (camera_id, json.dumps(settings, ensure_ascii=False), settings["last_updated"])
+                    )
+
+                    # Letzte verwendete Kamera merken
+                    self._set_meta("last_camera_id", camera_id)
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
 
-            # Letzte verwendete Kamera merken
-            self.settings["last_camera_id"] = camera_id
-
-            self._save_settings()
             return True
 
         except Exception as e:
@@ -92,9 +155,11 @@ class SettingsManager:
             Dictionary mit Einstellungen oder None
         """
         try:
-            if "cameras" in self.settings and camera_id in self.settings["cameras"]:
-                return self.settings["cameras"][camera_id]
-            return None
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT settings FROM cameras WHERE camera_id = ?", (camera_id,)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
         except Exception as e:
             logger.error(f"Fehler beim Abrufen der Kamera-Einstellungen: {e}")
             return None
@@ -107,19 +172,23 @@ class SettingsManager:
             Dictionary mit letzten Einstellungen oder None
         """
         try:
-            if "last_camera_id" in self.settings:
-                last_camera_id = self.settings["last_camera_id"]
+            with self._lock:
+                last_camera_id = self._get_meta("last_camera_id")
+            if last_camera_id is not None:
                 return {
                     "camera_id": last_camera_id,
                     "settings": self.get_camera_settings(last_camera_id)
                 }
 
             # Fallback: Erste verfügbare Kamera
-            if "cameras" in self.settings and len(self.settings["cameras"]) > 0:
-                camera_id = list(self.settings["cameras"].keys())[0]
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT camera_id, settings FROM cameras ORDER BY rowid LIMIT 1"
+                ).fetchone()
+            if row:
                 return {
-                    "camera_id": camera_id,
-                    "settings": self.settings["cameras"][camera_id]
+                    "camera_id": row[0],
+                    "settings": json.loads(row[1])
                 }
 
             return None
@@ -134,7 +203,9 @@ class SettingsManager:
         Returns:
             Dictionary mit allen Kameras und ihren Einstellungen
         """
-        return self.settings.get("cameras", {})
+        with self._lock:
+            rows = self._conn.execute("SELECT camera_id, settings FROM cameras ORDER BY rowid").fetchall()
+        return {camera_id: json.loads(settings) for camera_id, settings in rows}
 
     def delete_camera_settings(self, camera_id: str) -> bool:
         """
@@ -147,86 +218,50 @@ class SettingsManager:
             True bei Erfolg
         """
         try:
-            if "cameras" in self.settings and camera_id in self.settings["cameras"]:
-                del self.settings["cameras"][camera_id]
-
-                # Wenn das die letzte Kamera war, auch last_camera_id löschen
-                if self.settings.get("last_camera_id") == camera_id:
-                    if len(self.settings.get("cameras", {})) > 0:
-                        # Setze auf eine andere Kamera
-                        self.settings["last_camera_id"] = list(self.settings["cameras"].keys())[0]
-                    else:
-                        # Keine Kameras mehr vorhanden
-                        if "last_camera_id" in self.settings:
-                            del self.settings["last_camera_id"]
-
-                self._save_settings()
-                return True
-
-            return False
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    deleted = self._conn.execute(
+                        "DELETE FROM cameras WHERE camera_id = ?", (camera_id,)
+                    ).rowcount > 0
+
+                    # Wenn das die letzte Kamera war, auch last_camera_id anpassen
+                    if deleted and self._get_meta("last_camera_id") == camera_id:
+                        row = self._conn.execute(
+                            "SELECT camera_id FROM cameras ORDER BY rowid LIMIT 1"
+                        ).fetchone()
+                        if row:
+                            # Setze auf eine andere Kamera
+                            self._set_meta("last_camera_id", row[0])
+                        else:
+                            # Keine Kameras mehr vorhanden
+                            self._conn.execute("DELETE FROM meta WHERE key = 'last_camera_id'")
+
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+
+            return deleted
         except Exception as e:
             logger.error(f"Fehler beim Löschen der Kamera-Einstellungen: {e}")
             return False
 
-    def save_sms_log(self, log_entry: Dict[str, Any]) -> bool:
-        """
-        Speichert einen SMS-Log-Eintrag
-
-        Args:
-            log_entry: Dictionary mit Log-Informationen
-
-        Returns:
-            True bei Erfolg
-        """
-        try:
-            if "sms_log" not in self.settings:
-                self.settings["sms_log"] = []
-
-            # Timestamp hinzufügen
-            log_entry["timestamp"] = datetime.now().isoformat()
-
-            # Log-Eintrag hinzufügen
-            self.settings["sms_log"].append(log_entry)
-
-            # Nur die letzten 100 Einträge behalten
-            if len(self.settings["sms_log"]) > 100:
-                self.settings["sms_log"] = self.settings["sms_log"][-100:]
-
-            self._save_settings()
-            return True
-
-        except Exception as e:
-            logger.error(f"Fehler beim Speichern des SMS-Logs: {e}")
-            return False
-
-    def get_sms_log(self, limit: int = 50) -> list:
-        """
-        Holt die letzten SMS-Log-Einträge
-
-        Args:
-            limit: Maximale Anzahl zurückzugebender Einträge
-
-        Returns:
-            Liste mit Log-Einträgen
+    def pop_sms_log(self) -> list:
         """
-        try:
-            log = self.settings.get("sms_log", [])
-            return log[-limit:] if len(log) > limit else log
-        except Exception as e:
-            logger.error(f"Fehler beim Abrufen des SMS-Logs: {e}")
-            return []
+        Liefert das SMS-Log aus der alten JSON-Datei (nur direkt nach deren Übernahme)
 
-    def clear_sms_log(self) -> bool:
-        """
-        Löscht alle SMS-Log-Einträge
+        Das SMS-Log liegt inzwischen in einer eigenen Datenbank (siehe
+        sms_log_store.py); bestehende Einträge werden einmalig übernommen.
 
         Returns:
-            True bei Erfolg
+            Liste mit Log-Einträgen (leer, wenn keine vorhanden)
         """
-        try:
-            self.settings["sms_log"] = []
-            self._save_settings()
-            return True
-        except Exception as e:
-            logger.error(f"Fehler beim Löschen des SMS-Logs: {e}")
-            return False
+        log = self._legacy_sms_log
+        self._legacy_sms_log = []
+        return log
+
+    def close(self):
+        """Schließt die Datenbankverbindung"""
+        with self._lock:
+            self._conn.close()
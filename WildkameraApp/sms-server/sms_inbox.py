@@ -0,0 +1,186 @@
+"""
+Empfang eingehender SMS über die Modems im Pool
+Reagiert auf +CMTI/+CMT, liest gespeicherte SMS gesammelt aus und übernimmt
+Kamera-Statusantworten direkt in den Status-Speicher
+"""
+import asyncio
+import logging
+import re
+import time
+import weakref
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from camera_status_parser import parse_camera_status_text
+from camera_status_store import CameraStatusStore
+from sms_modem import SmsModem
+from sms_pdu import DeliveredSms, decode_deliver_pdu
+
+logger = logging.getLogger(__name__)
+
+# Absender aus einer +CMT-Kopfzeile im Textmodus: +CMT: "<oa>",[<alpha>],"<scts>"
+CMT_TEXT_HEADER_PATTERN = re.compile(r'\+CMT:\s*"([^"]*)"')
+
+
+class SmsInbox:
+    """
+    Liest eingehende SMS von allen angebundenen Modems
+
+    Eine +CMTI-Meldung löst einen Lesedurchgang (AT+CMGL) aus; treffen
+    währenddessen weitere ein, folgt genau ein weiterer Durchgang. Teile
+    verketteter SMS werden zusammengesetzt, bevor sie geparst werden.
+    """
+
+    def __init__(self, status_store: CameraStatusStore, reassembly_timeout: float = 3600.0):
+        """
+        Initialisiert den SMS-Empfang
+
+        Args:
+            status_store: Speicher für empfangene Kamera-Statusmeldungen
+            reassembly_timeout: Wartezeit auf fehlende Teile verketteter SMS in Sekunden
+        """
+        self.status_store = status_store
+        self.reassembly_timeout = reassembly_timeout
+        self._attached: "weakref.WeakSet[SmsModem]" = weakref.WeakSet()
+        self._poll_tasks: Dict[SmsModem, asyncio.Task] = {}
+        self._poll_again: Set[SmsModem] = set()
+        self._fragments: Dict[Tuple[str, int, int], Dict[int, DeliveredSms]] = {}
+        self._fragment_started: Dict[Tuple[str, int, int], float] = {}
+
+    def attach(self, modem: SmsModem):
+        """
+        Meldet den Empfang für ein Modem an und liest bereits gespeicherte SMS
+
+        Mehrfaches Anmelden desselben Modems ist wirkungslos.
+
+        Args:
+            modem: Verbundenes SmsModem
+        """
+        if modem in self._attached:
+            return
+
+        self._attached.add(modem)
+        modem.add_unsolicited_handler(lambda line: self._on_unsolicited(modem, line))
+        self.schedule_poll(modem)
+
+    async def stop(self):
+        """Bricht laufende Lesedurchgänge ab"""
+        tasks = list(self._poll_tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._poll_tasks.clear()
+        self._poll_again.clear()
+
+    def schedule_poll(self, modem: SmsModem):
+        """
+        Plant einen Lesedurchgang für ein Modem
+
+        Args:
+            modem: Modem, dessen SMS-Speicher gelesen werden soll
+        """
+        if modem in self._poll_tasks:
+            self._poll_again.add(modem)
+            return
+
+        self._poll_tasks[modem] = asyncio.get_running_loop().create_task(self._poll(modem))
+
+    def _on_unsolicited(self, modem: SmsModem, line: str):
+        """URC-Handler: neue SMS gespeichert (+CMTI) oder direkt zugestellt (+CMT)"""
+        if line.startswith("+CMTI:"):
+            self.schedule_poll(modem)
+        elif line.startswith("+CMT:"):
+            header, _, body = line.partition("\n")
+            try:
+                try:
+                    sms = decode_deliver_pdu(body)
+                except (ValueError, IndexError):
+                    # Textmodus: Inhalt ist bereits Klartext
+                    match = CMT_TEXT_HEADER_PATTERN.match(header)
+                    self._process(match.group(1) if match else "", None, body)
+                else:
+                    self._ingest(sms)
+            except Exception as e:
+                logger.error(f"Fehler beim Verarbeiten einer direkt zugestellten SMS: {e}")
+
+    async def _poll(self, modem: SmsModem):
+        """Liest und löscht gespeicherte SMS, bis keine neuen Meldungen mehr anstehen"""
+        try:
+            while True:
+                self._poll_again.discard(modem)
+                try:
+                    messages = await modem.read_messages()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Fehler beim Lesen der SMS von {modem.port}: {e}")
+                    break
+
+                # Die SMS sind auf dem Modem bereits gelöscht: eine fehlerhafte
+                # Meldung darf den Rest des Durchgangs nicht verwerfen
+                for sms in messages:
+                    try:
+                        self._ingest(sms)
+                    except Exception as e:
+                        logger.error(f"Fehler beim Verarbeiten einer SMS von {sms.sender}: {e}")
+
+                if modem not in self._poll_again:
+                    break
+        finally:
+            self._poll_tasks.pop(modem, None)
+            self._expire_fragments()
+
+    def _ingest(self, sms: DeliveredSms):
+        """Verarbeitet eine SMS bzw. sammelt Teile verketteter SMS"""
+        if sms.parts <= 1 or sms.reference is None:
+            self._process(sms.sender, sms.timestamp, sms.text)
+            return
+
+        key = (sms.sender, sms.reference, sms.parts)
+        fragments = self._fragments.setdefault(key, {})
+        self._fragment_started.setdefault(key, time.monotonic())
+        fragments[sms.part] = sms
+
+        if len(fragments) == sms.parts:
+            self._complete_fragments(key)
+
+    def _complete_fragments(self, key: Tuple[str, int, int]):
+        """Setzt die gesammelten Teile einer verketteten SMS zusammen"""
+        fragments = self._fragments.pop(key)
+        self._fragment_started.pop(key, None)
+        ordered = [fragments[part] for part in sorted(fragments)]
+        self._process(
+            ordered[0].sender,
+            ordered[0].timestamp,
+            "".join(sms.text for sms in ordered)
+        )
+
+    def _expire_fragments(self):
+        """Verarbeitet unvollständige verkettete SMS nach Ablauf der Wartezeit"""
+        now = time.monotonic()
+        for key, started in list(self._fragment_started.items()):
+            if now - started >= self.reassembly_timeout:
+                logger.warning(
+                    f"Verkettete SMS von {key[0]} unvollständig "
+                    f"({len(self._fragments[key])}/{key[2]} Teile), verarbeite vorhandene Teile"
+                )
+                self._complete_fragments(key)
+
+    def _process(self, sender: str, timestamp: Optional[datetime], text: str):
+        """Parst eine vollständige SMS und übernimmt Statusmeldungen in den Speicher"""
+        status = parse_camera_status_text(text)
+        if "imei" not in status and "cam_id" not in status:
+            logger.info(f"SMS von {sender} ist keine Kamera-Statusmeldung")
+            return
+
+        # Zeitstempel des SMSC in lokale Zeit umrechnen
+        received = timestamp.astimezone().replace(tzinfo=None) if timestamp else datetime.now()
+
+        status["source"] = "sms"
+        status["phone_number"] = sender
+        status["received"] = received.isoformat()
+        self.status_store.add(status)
@@ -0,0 +1,242 @@
+"""
+SMS-Log als SQLite-Datenbank
+Jeder Versand wird als eigene Zeile angehängt (kein Neuschreiben einer
+Datei); Indizes auf Kamera, Telefonnummer und Zeitpunkt erlauben gefilterte,
+seitenweise Abfragen über die komplette Historie
+"""
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sms_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    camera_id TEXT,
+    phone_number TEXT,
+    success INTEGER,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sms_log_timestamp ON sms_log (timestamp);
+CREATE INDEX IF NOT EXISTS idx_sms_log_camera ON sms_log (camera_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_sms_log_phone ON sms_log (phone_number, timestamp);
+"""
+
+# Aufbewahrung wird nach so vielen neuen Einträgen erneut angewendet
+RETENTION_CHECK_INTERVAL = 500
+
+
+class SmsLogStore:
+    """
+    Persistentes SMS-Log
+
+    Einträge bleiben erhalten, bis sie älter als retention_days sind bzw.
+    die Anzahl max_entries überschreitet (None = unbegrenzt).
+    """
+
+    def __init__(
+        self,
+        db_file: str = "sms_log.db",
+        retention_days: Optional[int] = 400,
+        max_entries: Optional[int] = None
+    ):
+        """
+        Initialisiert das SMS-Log
+
+        Args:
+            db_file: Pfad zur SQLite-Datei
+            retention_days: Einträge älter als so viele Tage werden gelöscht (None = nie)
+            max_entries: Maximale Anzahl Einträge (None = unbegrenzt)
+        """
+        self.db_file = db_file
+        self.retention_days = retention_days
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inserts_since_retention = 0
+
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        self.apply_retention()
+        logger.info(f"SMS-Log geöffnet: {db_file} ({self.count()} Einträge)")
+
+    @staticmethod
+    def _row_values(entry: Dict[str, Any]) -> Tuple:
+        """Spaltenwerte eines Eintrags für das INSERT"""
+        success = entry.get("success")
+        return (
+            entry["timestamp"],
+            entry.get("camera_id"),
+            entry.get("phone_number"),
+            None if success is None else int(bool(success)),
+            json.dumps(entry, ensure_ascii=False)
+        )
+
+    def add(self, log_entry: Dict[str, Any]) -> int:
+        """
+        Hängt einen SMS-Log-Eintrag an
+
+        Args:
+            log_entry: Dictionary mit Log-Informationen (phone_number, message, camera_id, success, ...)
+
+        Returns:
+            ID des Eintrags
+        """
+        log_entry["timestamp"] = datetime.now().isoformat()
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO sms_log (timestamp, camera_id, phone_number, success, entry) VALUES (?, ?, ?, ?, ?)",
+                self._row_values(log_entry)
+            )
+            self._conn.commit()
+            self._inserts_since_retention += 1
+            check_retention = self._inserts_since_retention >= RETENTION_CHECK_INTERVAL
+
+        if check_retention:
+            self.apply_retention()
+        return cursor.lastrowid
+
+    def import_entries(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Übernimmt bestehende Einträge (z.B. das alte sms_log aus camera_settings.json)
+
+        Args:
+            entries: Log-Einträge mit "timestamp", älteste zuerst
+
+        Returns:
+            Anzahl übernommener Einträge
+        """
+        rows = [self._row_values(entry) for entry in entries if entry.get("timestamp")]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO sms_log (timestamp, camera_id, phone_number, success, entry) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+        logger.info(f"{len(rows)} SMS-Log-Einträge übernommen")
+        return len(rows)
+
+    @staticmethod
+    def _where(
+        camera_id: Optional[str],
+        phone_number: Optional[str],
+        since: Optional[str],
+        until: Optional[str],
+        success: Optional[bool]
+    ) -> Tuple[str, List[Any]]:
+        """Baut die WHERE-Klausel für die Filter"""
+        clauses = []
+        params: List[Any] = []
+        if camera_id is not None:
+            clauses.append("camera_id = ?")
+            params.append(camera_id)
+        if phone_number is not None:
+            clauses.append("phone_number = ?")
+            params.append(phone_number)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if success is not None:
+            clauses.append("success = ?")
+            params.append(int(success))
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def query(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        camera_id: Optional[str] = None,
+        phone_number: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        success: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Fragt Log-Einträge ab, neueste zuerst
+
+        Args:
+            limit: Maximale Anzahl Einträge
+            offset: Anzahl zu überspringender Einträge (Seitenweise Abfrage)
+            camera_id: Nur Einträge dieser Kamera
+            phone_number: Nur Einträge an diese Nummer
+            since: Nur Einträge ab diesem Zeitpunkt (ISO-Format, inklusive)
+            until: Nur Einträge vor diesem Zeitpunkt (ISO-Format, exklusive)
+            success: Nur erfolgreiche (True) bzw. fehlgeschlagene (False) Sendungen
+
+        Returns:
+            Liste mit Log-Einträgen inkl. "id"
+        """
+        where, params = self._where(camera_id, phone_number, since, until, success)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, entry FROM sms_log {where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [dict(json.loads(entry), id=row_id) for row_id, entry in rows]
+
+    def count(
+        self,
+        camera_id: Optional[str] = None,
+        phone_number: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        success: Optional[bool] = None
+    ) -> int:
+        """
+        Zählt die Log-Einträge für die Filter (siehe query)
+
+        Returns:
+            Anzahl Einträge
+        """
+        where, params = self._where(camera_id, phone_number, since, until, success)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM sms_log {where}", params).fetchone()[0]
+
+    def apply_retention(self) -> int:
+        """
+        Löscht Einträge gemäß retention_days und max_entries
+
+        Returns:
+            Anzahl gelöschter Einträge
+        """
+        deleted = 0
+        with self._lock:
+            self._inserts_since_retention = 0
+            if self.retention_days is not None:
+                cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+                deleted += self._conn.execute("DELETE FROM sms_log WHERE timestamp < ?", (cutoff,)).rowcount
+            if self.max_entries is not None:
+                deleted += self._conn.execute(
+                    "DELETE FROM sms_log WHERE id IN ("
+                    "SELECT id FROM sms_log ORDER BY timestamp DESC, id DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+            self._conn.commit()
+
+        if deleted:
+            logger.info(f"SMS-Log: {deleted} alte Einträge gelöscht")
+        return deleted
+
+    def clear(self):
+        """Löscht alle Log-Einträge"""
+        with self._lock:
+            self._conn.execute("DELETE FROM sms_log")
+            self._conn.commit()
+
+    def close(self):
+        """Schließt die Datenbankverbindung"""
+        with self._lock:
+            self._conn.close()
@@ -6,11 +6,59 @@ import serial
 import serial.tools.list_ports
 import asyncio
 import logging
-import time
-from typing import Optional, Dict, List
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Dict, List, Tuple
+
+from sms_pdu import DeliveredSms, build_submit_pdus, decode_deliver_pdu, is_text_mode_safe
 
 logger = logging.getLogger(__name__)
 
+# Finale Result-Codes, mit denen das Modem ein AT-Kommando abschließt
+FINAL_RESULT_CODES = ("OK", "ERROR", "NO CARRIER")
+FINAL_RESULT_PREFIXES = ("+CMS ERROR", "+CME ERROR")
+
+# Unaufgeforderte Meldungen (URCs), die nie Teil einer Kommando-Antwort sind
+UNSOLICITED_PREFIXES = ("+CMTI:", "+CMT:", "+CDSI:", "+CDS:", "+CBM:", "RING", "^")
+
+# URCs, deren Inhalt (PDU bzw. Text) in der folgenden Zeile steht
+TWO_LINE_UNSOLICITED_PREFIXES = ("+CMT:", "+CDS:", "+CBM:")
+
+# Kopfzeile eines Listeneintrags im PDU-Modus: +CMGL: <index>,<stat>,[<alpha>],<length>
+CMGL_PATTERN = re.compile(r"\+CMGL:\s*(\d+),")
+
+# Antwort auf eine erfolgreiche SMS-Übermittlung: +CMGS: <mr>
+CMGS_PATTERN = re.compile(r"\+CMGS:\s*(\d+)")
+
+# Maximale Blockierzeit eines Lesevorgangs im Reader-Thread (Sekunden)
+READER_POLL_TIMEOUT = 0.5
+
+# Resynchronisation nach einem Timeout: so lange werden verspätete Antwortzeilen
+# eingesammelt, danach muss das Modem auf "AT" mit OK antworten
+RESYNC_DRAIN_TIME = 1.0
+RESYNC_PROBE_TIMEOUT = 2.0
+RESYNC_PROBE_ATTEMPTS = 3
+
+# Abbruch einer offenen Eingabe (SMS-Prompt)
+ESC = chr(27)
+
+# SMS-Formate für AT+CMGF
+SMS_FORMAT_PDU = 0
+SMS_FORMAT_TEXT = 1
+
+
+class _AtRequest:
+    """Ein laufendes AT-Kommando, dessen Antwortzeilen gesammelt werden"""
+
+    def __init__(self, command: str, wait_for: str, future: asyncio.Future):
+        self.command = command
+        self.wait_for = wait_for
+        self.future = future
+        self.lines: List[str] = []
+
+    def response(self) -> str:
+        return "\n".join(self.lines)
+
 
 class SmsModem:
     """
@@ -32,6 +80,25 @@ class SmsModem:
         self.serial_connection: Optional[serial.Serial] = None
         self.connected = False
 
+        # Asynchrone AT-Engine: ein Reader-Task rahmt die Antworten zeilenweise,
+        # der Lock serialisiert Kommandos, damit sich nichts auf dem Port vermischt
+        self._command_lock = asyncio.Lock()
+        self._pending: Optional[_AtRequest] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._reader_executor: Optional[ThreadPoolExecutor] = None
+        self._line_buffer = ""
+        self._unsolicited_handlers: List[Callable[[str], None]] = []
+        self._unsolicited_header: Optional[str] = None
+
+        # Nach einem Timeout ist unklar, welche Antworten noch ausstehen
+        self._needs_resync = False
+
+        # Aktives SMS-Format (AT+CMGF), damit es nicht vor jeder SMS neu gesetzt wird
+        self._message_format: Optional[int] = None
+
+        # Referenznummer für verkettete SMS (8 Bit, pro Nachricht hochgezählt)
+        self._concat_reference = 0
+
     async def connect(self) -> bool:
         """
         Verbindet mit dem SMS-Modem
@@ -49,10 +116,12 @@ class SmsModem:
             logger.info(f"Verbinde mit Modem auf Port {self.port}")
 
             # Serielle Verbindung öffnen
+            # Kurzer Lese-Timeout, damit der Reader-Thread beim Trennen schnell endet
             self.serial_connection = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
-                timeout=self.timeout,
+                timeout=READER_POLL_TIMEOUT,
+                write_timeout=self.timeout,
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE
@@ -60,6 +129,10 @@ class SmsModem:
 
             # Warte kurz für Modem-Initialisierung
             await asyncio.sleep(1)
+            self.serial_connection.reset_input_buffer()
+
+            # Reader-Task starten
+            self._start_reader()
 
             # Teste Verbindung mit AT-Kommando
             if not await self._test_connection():
@@ -74,16 +147,30 @@ class SmsModem:
 
         except Exception as e:
             logger.error(f"Fehler beim Verbinden mit Modem: {e}")
+            await self._stop_reader()
             if self.serial_connection and self.serial_connection.is_open:
                 self.serial_connection.close()
             raise
 
     async def disconnect(self):
         """Trennt die Verbindung zum Modem"""
+        self.connected = False
+        self._message_format = None
         if self.serial_connection and self.serial_connection.is_open:
             self.serial_connection.close()
-            self.connected = False
             logger.info("Modem-Verbindung getrennt")
+        await self._stop_reader()
+
+    def add_unsolicited_handler(self, handler: Callable[[str], None]):
+        """
+        Registriert einen Callback für unaufgeforderte Modem-Meldungen (URCs)
+
+        Args:
+            handler: Wird mit jeder URC-Zeile aufgerufen (z.B. '+CMTI: "SM",3').
+                Bei zweizeiligen URCs (+CMT, +CDS) sind Kopf und Inhalt durch
+                einen Zeilenumbruch getrennt.
+        """
+        self._unsolicited_handlers.append(handler)
 
     def is_connected(self) -> bool:
         """Prüft, ob das Modem verbunden ist"""
@@ -100,39 +187,210 @@ class SmsModem:
         Returns:
             True bei erfolgreichem Versand
         """
+        results = await self.send_sms_batch([(phone_number, message)])
+        return results[0]["success"]
+
+    async def send_sms_batch(self, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Sendet mehrere SMS direkt hintereinander
+
+        Der Kommando-Lock wird nur einmal für den ganzen Stapel geholt und
+        das SMS-Format nur umgeschaltet, wenn es sich ändert. Kurze Texte,
+        die in ASCII und GSM-7 identisch sind, gehen im Textmodus raus;
+        alle anderen (Sonderzeichen, Umlaute, über 160 Zeichen) im PDU-Modus
+        als GSM-7 bzw. UCS-2, bei Bedarf als verkettete SMS.
+
+        Args:
+            messages: Liste von (Telefonnummer, SMS-Text)
+
+        Returns:
+            Liste mit einem Ergebnis pro Nachricht:
+            {"phone_number", "success", "message_reference", "parts", "error"}
+            (message_reference ist bei verketteten SMS die des ersten Teils)
+        """
         if not self.is_connected():
             raise Exception("Modem ist nicht verbunden")
 
-        try:
-            logger.info(f"Sende SMS an {phone_number}")
+        results = []
+
+        async with self._command_lock:
+            for phone_number, message in messages:
+                result = {
+                    "phone_number": phone_number,
+                    "success": False,
+                    "message_reference": None,
+                    "parts": 1,
+                    "error": None
+                }
+                try:
+                    logger.info(f"Sende SMS an {phone_number}")
+                    if is_text_mode_safe(message):
+                        await self._ensure_message_format(SMS_FORMAT_TEXT)
+                        references = [await self._submit_text_sms(phone_number, message)]
+                    else:
+                        await self._ensure_message_format(SMS_FORMAT_PDU)
+                        references = await self._submit_pdu_sms(phone_number, message)
+
+                    result["message_reference"] = references[0]
+                    result["parts"] = len(references)
+                    result["success"] = True
+                    logger.info(
+                        f"SMS erfolgreich an {phone_number} gesendet "
+                        f"(Referenz {result['message_reference']}, {result['parts']} Teil(e))"
+                    )
+                except Exception as e:
+                    logger.error(f"Fehler beim Senden der SMS an {phone_number}: {e}")
+                    result["error"] = str(e)
+                results.append(result)
+
+        return results
+
+    async def _ensure_message_format(self, message_format: int):
+        """
+        Setzt das SMS-Format (Text oder PDU), falls es nicht bereits aktiv ist.
+        Der Aufrufer muss den Kommando-Lock halten.
+
+        Args:
+            message_format: SMS_FORMAT_TEXT oder SMS_FORMAT_PDU
+        """
+        if self._message_format == message_format:
+            return
+
+        response = await self._transact(f"AT+CMGF={message_format}")
+        if "OK" not in response:
+            self._message_format = None
+            mode_name = "Textmodus" if message_format == SMS_FORMAT_TEXT else "PDU-Modus"
+            raise Exception(f"{mode_name} konnte nicht gesetzt werden: {response}")
+        self._message_format = message_format
+
+    async def _submit_text_sms(self, phone_number: str, message: str) -> Optional[int]:
+        """
+        Übermittelt eine SMS im Textmodus. Der Aufrufer muss den Kommando-Lock halten.
+
+        Args:
+            phone_number: Zieltelefonnummer
+            message: SMS-Text
+
+        Returns:
+            Message-Reference aus "+CMGS: <mr>" (None falls nicht gemeldet)
+        """
+        # Empfängernummer setzen
+        response = await self._transact(f'AT+CMGS="{phone_number}"', wait_for=">")
+
+        if ">" not in response:
+            # Ein ausgebliebener Prompt wurde bereits per Resynchronisation (ESC) abgebrochen
+            raise Exception(f"Modem nicht bereit für SMS-Text: {response}")
+
+        # SMS-Text senden (mit Ctrl+Z am Ende, ASCII 26)
+        response = await self._transact(
+            message + chr(26),
+            wait_for="OK",
+            timeout=30,  # Längerer Timeout für SMS-Versand
+            terminator=""
+        )
+
+        match = CMGS_PATTERN.search(response)
+        if match:
+            return int(match.group(1))
+        if "OK" in response.splitlines():
+            return None
+
+        raise Exception(f"SMS-Versand fehlgeschlagen: {response}")
+
+    async def _submit_pdu_sms(self, phone_number: str, message: str) -> List[Optional[int]]:
+        """
+        Übermittelt eine SMS im PDU-Modus, lange Texte als verkettete Teile.
+        Der Aufrufer muss den Kommando-Lock halten.
+
+        Args:
+            phone_number: Zieltelefonnummer
+            message: SMS-Text
 
-            # SMS-Modus auf Text setzen
-            await self._send_at_command("AT+CMGF=1")
+        Returns:
+            Message-References aller Teile
+        """
+        pdus = build_submit_pdus(phone_number, message, reference=self._concat_reference)
+        if len(pdus) > 1:
+            self._concat_reference = (self._concat_reference + 1) % 256
 
-            # Empfängernummer setzen
-            response = await self._send_at_command(f'AT+CMGS="{phone_number}"', wait_for=">")
+        references = []
+        for index, submit_pdu in enumerate(pdus, start=1):
+            response = await self._transact(f"AT+CMGS={submit_pdu.tpdu_length}", wait_for=">")
 
             if ">" not in response:
-                raise Exception("Modem nicht bereit für SMS-Text")
+                raise Exception(f"Modem nicht bereit für PDU ({index}/{len(pdus)}): {response}")
 
-            # SMS-Text senden (mit Ctrl+Z am Ende, ASCII 26)
-            message_with_ctrl_z = message + chr(26)
-            response = await self._send_at_command(
-                message_with_ctrl_z,
+            response = await self._transact(
+                submit_pdu.pdu + chr(26),
                 wait_for="OK",
-                timeout=30  # Längerer Timeout für SMS-Versand
+                timeout=30,
+                terminator=""
             )
 
-            if "OK" in response or "+CMGS:" in response:
-                logger.info(f"SMS erfolgreich an {phone_number} gesendet")
-                return True
+            match = CMGS_PATTERN.search(response)
+            if match:
+                references.append(int(match.group(1)))
+            elif "OK" in response.splitlines():
+                references.append(None)
             else:
-                logger.error(f"SMS-Versand fehlgeschlagen: {response}")
-                return False
+                raise Exception(f"SMS-Versand fehlgeschlagen ({index}/{len(pdus)}): {response}")
 
-        except Exception as e:
-            logger.error(f"Fehler beim Senden der SMS: {e}")
-            return False
+        return references
+
+    async def read_messages(self, delete: bool = True) -> List[DeliveredSms]:
+        """
+        Liest alle gespeicherten SMS in einem Durchgang (AT+CMGL im PDU-Modus)
+
+        Gelesene Nachrichten werden anschließend gesammelt gelöscht
+        (AT+CMGD=1,1 löscht alle gelesenen, neu eingetroffene bleiben erhalten).
+
+        Args:
+            delete: Gelesene Nachrichten vom Speicher löschen
+
+        Returns:
+            Empfangene SMS (verkettete Nachrichten als einzelne Teile)
+        """
+        if not self.is_connected():
+            raise Exception("Modem ist nicht verbunden")
+
+        messages = []
+
+        async with self._command_lock:
+            await self._ensure_message_format(SMS_FORMAT_PDU)
+
+            # 4 = alle Nachrichten (gelesen und ungelesen)
+            response = await self._transact("AT+CMGL=4", timeout=30)
+            if "OK" not in response.splitlines():
+                raise Exception(f"SMS konnten nicht gelesen werden: {response}")
+
+            lines = response.splitlines()
+            for index, line in enumerate(lines):
+                match = CMGL_PATTERN.match(line)
+                if not match or index + 1 >= len(lines):
+                    continue
+                try:
+                    messages.append(decode_deliver_pdu(lines[index + 1]))
+                except Exception as e:
+                    logger.warning(f"SMS {match.group(1)} nicht dekodierbar: {e}")
+
+            if delete and messages:
+                response = await self._transact("AT+CMGD=1,1", timeout=30)
+                if "OK" not in response:
+                    logger.warning(f"Gelesene SMS konnten nicht gelöscht werden: {response}")
+
+        logger.info(f"{len(messages)} SMS von {self.port} gelesen")
+        return messages
+
+    async def get_imei(self) -> Optional[str]:
+        """
+        Liest die IMEI des Modems (AT+CGSN)
+
+        Returns:
+            IMEI als Ziffernfolge oder None, wenn das Modem keine gültige liefert
+        """
+        response = await self._send_at_command("AT+CGSN")
+        imei = self._parse_response(response)
+        return imei if imei.isdigit() else None
 
     async def get_modem_info(self) -> Dict[str, str]:
         """
@@ -189,11 +447,17 @@ class SmsModem:
         await self._send_at_command("ATE0")
 
         # SMS-Format auf Text setzen (1 = Text, 0 = PDU)
-        await self._send_at_command("AT+CMGF=1")
+        response = await self._send_at_command(f"AT+CMGF={SMS_FORMAT_TEXT}")
+        self._message_format = SMS_FORMAT_TEXT if "OK" in response else None
 
         # Zeichensatz auf GSM setzen
         await self._send_at_command("AT+CSCS=\"GSM\"")
 
+        # Eingehende SMS speichern und per +CMTI melden
+        response = await self._send_at_command("AT+CNMI=2,1,0,0,0")
+        if "OK" not in response:
+            logger.warning(f"SMS-Empfangsmeldungen (+CMTI) nicht aktiviert: {response}")
+
         # Prüfe SIM-Status
         response = await self._send_at_command("AT+CPIN?")
         if "READY" not in response:
@@ -223,6 +487,9 @@ class SmsModem:
         """
         Sendet ein AT-Kommando an das Modem und wartet auf Antwort
 
+        Kommandos werden über einen Lock serialisiert; die Antwort ist
+        vollständig, sobald der Reader-Task den finalen Result-Code sieht.
+
         Args:
             command: AT-Kommando
             wait_for: String, auf den gewartet werden soll
@@ -231,36 +498,241 @@ class SmsModem:
         Returns:
             Antwort des Modems
         """
-        if not self.serial_connection or not self.serial_connection.is_open:
-            raise Exception("Serielle Verbindung nicht geöffnet")
+        async with self._command_lock:
+            return await self._transact(command, wait_for=wait_for, timeout=timeout)
 
-        # Kommando senden
-        command_bytes = (command + "\r\n").encode('utf-8')
-        self.serial_connection.write(command_bytes)
-        logger.debug(f"Gesendet: {command}")
+    async def _transact(
+        self,
+        command: str,
+        wait_for: str = "OK",
+        timeout: float = 5,
+        terminator: str = "\r\n"
+    ) -> str:
+        """
+        Schreibt ein Kommando und wartet auf die vom Reader-Task gerahmte Antwort.
+        Der Aufrufer muss den Kommando-Lock halten.
 
-        # Auf Antwort warten
-        response = ""
-        start_time = time.time()
+        Nach einem Timeout wird das Modem sofort resynchronisiert (siehe
+        _resync); verspätete Antwortzeilen (z.B. "+CMGS: <mr>" eines langsamen,
+        aber erfolgreichen Versands) werden an diese Antwort angehängt statt
+        das nächste Kommando vorzeitig abzuschließen.
 
-        while time.time() - start_time < timeout:
-            if self.serial_connection.in_waiting > 0:
-                chunk = self.serial_connection.read(self.serial_connection.in_waiting)
-                response += chunk.decode('utf-8', errors='ignore')
+        Args:
+            command: AT-Kommando oder Rohtext (z.B. SMS-Text mit Ctrl+Z)
+            wait_for: String, der die Antwort abschließt ('>' für den SMS-Prompt)
+            timeout: Timeout in Sekunden
+            terminator: An das Kommando angehängte Zeichen
 
-                # Prüfe ob erwartete Antwort enthalten ist
-                if wait_for in response:
-                    break
+        Returns:
+            Antwort des Modems
 
-            await asyncio.sleep(0.1)
+        Raises:
+            Exception: Keine Verbindung oder Modem nach einem früheren Timeout nicht wieder ansprechbar
+        """
+        if not self.serial_connection or not self.serial_connection.is_open:
+            raise Exception("Serielle Verbindung nicht geöffnet")
+        if self._reader_task is None or self._reader_task.done():
+            raise Exception("Reader-Task läuft nicht")
 
-        logger.debug(f"Empfangen: {response}")
+        if self._needs_resync:
+            await self._resync()
 
-        if wait_for not in response:
+        response, completed = await self._exchange(command, wait_for, timeout, terminator)
+        if not completed:
             logger.warning(f"Timeout oder unerwartete Antwort: {response}")
+            self._needs_resync = True
+            try:
+                late_response = await self._resync()
+            except Exception as e:
+                # Bleibt vorgemerkt, das nächste Kommando versucht es erneut
+                logger.error(f"Resynchronisation nach Timeout fehlgeschlagen: {e}")
+            else:
+                if late_response:
+                    logger.warning(f"Verspätete Antwort auf {command!r}: {late_response}")
+                    response = "\n".join(part for part in (response, late_response) if part)
 
+        logger.debug(f"Empfangen: {response}")
         return response.strip()
 
+    async def _exchange(
+        self,
+        command: str,
+        wait_for: str,
+        timeout: float,
+        terminator: str
+    ) -> Tuple[str, bool]:
+        """
+        Schreibt ein Kommando und sammelt die Antwortzeilen (ohne Resynchronisation)
+
+        Returns:
+            (Antwort, True wenn sie vor dem Timeout abgeschlossen wurde)
+        """
+        request = _AtRequest(command, wait_for, asyncio.get_running_loop().create_future())
+        self._pending = request
+
+        try:
+            await self._write((command + terminator).encode('utf-8'))
+            logger.debug(f"Gesendet: {command}")
+
+            done, _ = await asyncio.wait({request.future}, timeout=timeout)
+            if done:
+                return request.future.result(), True
+            return request.response(), False
+        finally:
+            self._pending = None
+
+    async def _resync(self) -> str:
+        """
+        Bringt das Modem nach einem Timeout in einen definierten Zustand.
+        Der Aufrufer muss den Kommando-Lock halten.
+
+        Verwirft angefangene Zeilen (z.B. einen späten "> "-Prompt), bricht eine
+        offene Eingabe mit ESC ab, sammelt RESYNC_DRAIN_TIME lang verspätete
+        Antwortzeilen ein und wartet dann auf ein "AT" -> "OK".
+
+        Returns:
+            Verspätete Antwortzeilen (leer, wenn keine kamen)
+
+        Raises:
+            Exception: Modem antwortet nicht auf "AT"
+        """
+        self._line_buffer = ""
+        drain = _AtRequest("<resync>", "\0", asyncio.get_running_loop().create_future())
+        self._pending = drain
+        try:
+            await self._write(ESC.encode('utf-8'))
+            await asyncio.sleep(RESYNC_DRAIN_TIME)
+        finally:
+            self._pending = None
+        self._line_buffer = ""
+
+        for _ in range(RESYNC_PROBE_ATTEMPTS):
+            response, _ = await self._exchange("AT", "OK", RESYNC_PROBE_TIMEOUT, "\r\n")
+            if "OK" in response.splitlines():
+                self._needs_resync = False
+                logger.info(f"Modem {self.port} nach Timeout resynchronisiert")
+                return drain.response()
+
+        raise Exception(f"Modem {self.port} antwortet nach Timeout nicht auf AT")
+
+    async def _write(self, data: bytes):
+        """Schreibt Bytes auf den Port, ohne den Event-Loop zu blockieren"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_blocking, data)
+
+    def _write_blocking(self, data: bytes):
+        # Kein flush(): tcdrain kann bei hängendem Modem unbegrenzt blockieren,
+        # write() übergibt bereits alle Bytes an den Treiber (write_timeout greift)
+        self.serial_connection.write(data)
+
+    def _start_reader(self):
+        """Startet den Reader-Task mit eigenem Thread für blockierende Reads"""
+        self._line_buffer = ""
+        self._needs_resync = False
+        self._unsolicited_header = None
+        self._reader_executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix=f"modem-reader-{self.port}"
+        )
+        self._reader_task = asyncio.get_running_loop().create_task(self._reader_loop())
+
+    async def _stop_reader(self):
+        """Beendet den Reader-Task und bricht ein laufendes Kommando ab"""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader_task = None
+
+        if self._reader_executor is not None:
+            self._reader_executor.shutdown(wait=False)
+            self._reader_executor = None
+
+        if self._pending is not None and not self._pending.future.done():
+            self._pending.future.set_exception(Exception("Modem-Verbindung getrennt"))
+
+    def _read_available(self) -> bytes:
+        """Blockierender Read im Reader-Thread: wartet auf mind. 1 Byte (max. READER_POLL_TIMEOUT)"""
+        data = self.serial_connection.read(1)
+        if data:
+            waiting = self.serial_connection.in_waiting
+            if waiting:
+                data += self.serial_connection.read(waiting)
+        return data
+
+    async def _reader_loop(self):
+        """Liest fortlaufend vom Port und verteilt Zeilen an Kommandos bzw. URC-Handler"""
+        loop = asyncio.get_running_loop()
+        while self.serial_connection and self.serial_connection.is_open:
+            try:
+                chunk = await loop.run_in_executor(self._reader_executor, self._read_available)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.serial_connection and self.serial_connection.is_open:
+                    logger.error(f"Fehler beim Lesen vom Modem: {e}")
+                    self.connected = False
+                break
+
+            if chunk:
+                self._feed(chunk.decode('utf-8', errors='ignore'))
+
+        if self._pending is not None and not self._pending.future.done():
+            self._pending.future.set_exception(Exception("Serielle Verbindung geschlossen"))
+
+    def _feed(self, text: str):
+        """Zerlegt empfangene Daten in Zeilen"""
+        self._line_buffer += text
+
+        while "\n" in self._line_buffer:
+            line, self._line_buffer = self._line_buffer.split("\n", 1)
+            line = line.strip()
+            if line:
+                self._handle_line(line)
+
+        # Der SMS-Prompt '> ' kommt ohne Zeilenende
+        request = self._pending
+        if request is not None and request.wait_for == ">" and self._line_buffer.strip() == ">":
+            self._line_buffer = ""
+            request.lines.append(">")
+            if not request.future.done():
+                request.future.set_result(request.response())
+
+    def _handle_line(self, line: str):
+        """Ordnet eine Zeile dem laufenden Kommando oder den URC-Handlern zu"""
+        request = self._pending
+
+        if self._unsolicited_header is not None:
+            # Inhaltszeile einer zweizeiligen URC (+CMT, +CDS)
+            header, self._unsolicited_header = self._unsolicited_header, None
+            self._dispatch_unsolicited(f"{header}\n{line}")
+            return
+
+        if line.startswith(TWO_LINE_UNSOLICITED_PREFIXES):
+            self._unsolicited_header = line
+            return
+
+        if request is None or line.startswith(UNSOLICITED_PREFIXES):
+            self._dispatch_unsolicited(line)
+            return
+
+        request.lines.append(line)
+
+        is_final = line in FINAL_RESULT_CODES or line.startswith(FINAL_RESULT_PREFIXES)
+        if (is_final or request.wait_for in line) and not request.future.done():
+            request.future.set_result(request.response())
+
+    def _dispatch_unsolicited(self, line: str):
+        """Reicht eine unaufgeforderte Meldung an alle registrierten Handler weiter"""
+        logger.debug(f"URC: {line}")
+        for handler in self._unsolicited_handlers:
+            try:
+                handler(line)
+            except Exception as e:
+                logger.error(f"Fehler im URC-Handler: {e}")
+
     def _parse_response(self, response: str) -> str:
         """
         Extrahiert die relevante Information aus einer AT-Kommando-Antwort
@@ -285,32 +757,49 @@ class SmsModem:
         Returns:
             Gefundener Port oder None
         """
-        logger.info("Suche nach USB-Modems...")
+        ports = detect_modem_ports()
+        if ports:
+            logger.info(f"Verwende Port: {ports[0]}")
+            return ports[0]
+
+        logger.warning("Kein USB-Modem gefunden")
+        return None
 
-        ports = serial.tools.list_ports.comports()
 
-        # Typische Modem-Beschreibungen
-        modem_keywords = [
-            "modem", "gsm", "3g", "4g", "lte",
-            "qualcomm", "huawei", "zte", "sierra",
-            "usb serial", "ttyUSB", "ttyACM"
-        ]
+def detect_modem_ports() -> List[str]:
+    """
+    Sucht alle seriellen Ports, hinter denen ein USB-Modem stecken könnte
 
-        for port in ports:
-            port_info = f"{port.device} - {port.description} - {port.hwid}".lower()
-            logger.debug(f"Gefundener Port: {port_info}")
+    Ports mit Modem-Keywords in Beschreibung/HWID kommen zuerst, danach
+    übrige ttyUSB/ttyACM-Ports (typisch unter Linux).
 
-            # Prüfe ob Port Modem-Keywords enthält
-            for keyword in modem_keywords:
-                if keyword in port_info:
-                    logger.info(f"Mögliches Modem gefunden: {port.device}")
-                    return port.device
+    Returns:
+        Liste von Port-Namen (z.B. ["/dev/ttyUSB0", "/dev/ttyUSB2"])
+    """
+    logger.info("Suche nach USB-Modems...")
 
-        # Fallback: Ersten ttyUSB oder ttyACM Port verwenden (typisch unter Linux)
-        for port in ports:
-            if "ttyUSB" in port.device or "ttyACM" in port.device:
-                logger.info(f"Verwende Port: {port.device}")
-                return port.device
+    ports = serial.tools.list_ports.comports()
 
-        logger.warning("Kein USB-Modem gefunden")
-        return None
+    # Typische Modem-Beschreibungen
+    modem_keywords = [
+        "modem", "gsm", "3g", "4g", "lte",
+        "qualcomm", "huawei", "zte", "sierra",
+        "usb serial", "ttyusb", "ttyacm"
+    ]
+
+    candidates = []
+    for port in ports:
+        port_info = f"{port.device} - {port.description} - {port.hwid}".lower()
+        logger.debug(f"Gefundener Port: {port_info}")
+
+        # Prüfe ob Port Modem-Keywords enthält
+        if any(keyword in port_info for keyword in modem_keywords):
+            logger.info(f"Mögliches Modem gefunden: {port.device}")
+            candidates.append(port.device)
+
+    # Fallback: ttyUSB- und ttyACM-Ports ohne passende Beschreibung
+    for port in ports:
+        if ("ttyUSB" in port.device or "ttyACM" in port.device) and port.device not in candidates:
+            candidates.append(port.device)
+
+    return candidates
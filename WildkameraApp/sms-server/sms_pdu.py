@@ -0,0 +1,447 @@
+"""
+PDU-Kodierung für SMS-SUBMIT und -DELIVER (3GPP TS 23.040 / 23.038)
+Packt GSM-7-Text, fällt nur bei Bedarf auf UCS-2 zurück und teilt lange
+Nachrichten in verkettete Teile mit UDH-Header; dekodiert empfangene SMS
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# GSM 03.38 Standard-Alphabet (Index = Septet-Wert, 0x1B = Escape)
+GSM7_BASIC_ALPHABET = (
+    "@£$¥èéùìòÇ\nØø\rÅå"
+    "Δ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ"
+    " !\"#¤%&'()*+,-./"
+    "0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNO"
+    "PQRSTUVWXYZÄÖÑÜ§"
+    "¿abcdefghijklmno"
+    "pqrstuvwxyzäöñüà"
+)
+
+# Erweiterungstabelle (Zeichen werden als 0x1B + Code übertragen)
+GSM7_EXTENSION = {
+    "\f": 0x0A, "^": 0x14, "{": 0x28, "}": 0x29, "\\": 0x2F,
+    "[": 0x3C, "~": 0x3D, "]": 0x3E, "|": 0x40, "€": 0x65
+}
+
+GSM7_ESCAPE = 0x1B
+
+_GSM7_BASIC_MAP: Dict[str, int] = {
+    char: index for index, char in enumerate(GSM7_BASIC_ALPHABET) if index != GSM7_ESCAPE
+}
+
+_GSM7_EXTENSION_REVERSE = {code: char for char, code in GSM7_EXTENSION.items()}
+
+# Zeichen, die im Textmodus (AT+CSCS="GSM") unverändert übertragen werden:
+# ASCII-Zeichen, deren GSM-7-Code dem ASCII-Code entspricht
+TEXT_MODE_SAFE_CHARS = frozenset(
+    char for char, code in _GSM7_BASIC_MAP.items() if ord(char) == code and char not in "\r\n"
+) | frozenset("\r\n")
+
+# Nutzdatenlängen (Zeichen bzw. Septets) einzelner und verketteter Nachrichten
+GSM7_SINGLE_SEPTETS = 160
+GSM7_MULTIPART_SEPTETS = 153
+UCS2_SINGLE_UNITS = 70
+UCS2_MULTIPART_UNITS = 67
+
+# Data Coding Scheme
+DCS_GSM7 = 0x00
+DCS_UCS2 = 0x08
+
+
+class SubmitPdu(NamedTuple):
+    """Eine fertige SMS-SUBMIT-PDU für AT+CMGS im PDU-Modus"""
+    pdu: str            # Hex-String inkl. leerer SMSC-Adresse ("00")
+    tpdu_length: int    # Länge in Oktetten ohne SMSC-Teil (Parameter für AT+CMGS)
+
+
+class DeliveredSms(NamedTuple):
+    """Eine empfangene SMS (bzw. ein Teil einer verketteten SMS)"""
+    sender: str
+    timestamp: Optional[datetime]
+    text: str
+    reference: Optional[int]    # Referenz der verketteten Nachricht, None bei Einzel-SMS
+    part: int                   # Nummer dieses Teils (1-basiert)
+    parts: int                  # Anzahl Teile der Nachricht
+
+
+def is_gsm7(text: str) -> bool:
+    """Prüft, ob ein Text vollständig im GSM-7-Alphabet (inkl. Erweiterung) darstellbar ist"""
+    return all(char in _GSM7_BASIC_MAP or char in GSM7_EXTENSION for char in text)
+
+
+def is_text_mode_safe(text: str) -> bool:
+    """
+    Prüft, ob ein Text im Textmodus ohne Verfälschung und ohne Aufteilung
+    gesendet werden kann
+
+    Args:
+        text: SMS-Text
+
+    Returns:
+        True wenn alle Zeichen in ASCII und GSM-7 identisch sind und der Text in eine SMS passt
+    """
+    return len(text) <= GSM7_SINGLE_SEPTETS and all(char in TEXT_MODE_SAFE_CHARS for char in text)
+
+
+def encode_gsm7(text: str) -> List[List[int]]:
+    """
+    Kodiert Text als GSM-7-Septets, gruppiert pro Zeichen
+
+    Zeichen aus der Erweiterungstabelle belegen zwei Septets; die Gruppierung
+    verhindert, dass eine Escape-Sequenz auf zwei Teile verteilt wird.
+
+    Args:
+        text: Text im GSM-7-Alphabet
+
+    Returns:
+        Liste von Septet-Gruppen (eine Gruppe pro Zeichen)
+    """
+    groups = []
+    for char in text:
+        if char in _GSM7_BASIC_MAP:
+            groups.append([_GSM7_BASIC_MAP[char]])
+        elif char in GSM7_EXTENSION:
+            groups.append([GSM7_ESCAPE, GSM7_EXTENSION[char]])
+        else:
+            raise ValueError(f"Zeichen nicht im GSM-7-Alphabet: {char!r}")
+    return groups
+
+
+def pack_septets(septets: List[int], padding_bits: int = 0) -> bytes:
+    """
+    Packt 7-Bit-Septets dicht in Oktette (LSB zuerst)
+
+    Args:
+        septets: Septet-Werte (0-127)
+        padding_bits: Füllbits am Anfang (Ausrichtung hinter einem UDH)
+
+    Returns:
+        Gepackte Bytes
+    """
+    packed = bytearray()
+    accumulator = 0
+    bit_count = padding_bits
+
+    for septet in septets:
+        accumulator |= (septet & 0x7F) << bit_count
+        bit_count += 7
+        while bit_count >= 8:
+            packed.append(accumulator & 0xFF)
+            accumulator >>= 8
+            bit_count -= 8
+
+    if bit_count > 0:
+        packed.append(accumulator & 0xFF)
+
+    return bytes(packed)
+
+
+def encode_address(phone_number: str) -> bytes:
+    """
+    Kodiert eine Zieladresse (TP-DA) als Semi-Oktette
+
+    Args:
+        phone_number: Telefonnummer, mit "+" für internationales Format
+
+    Returns:
+        Adressfeld: Ziffernanzahl, Type-of-Address, BCD-Ziffern
+    """
+    number = phone_number.strip().replace(" ", "")
+    type_of_address = 0x81
+    if number.startswith("+"):
+        type_of_address = 0x91
+        number = number[1:]
+
+    if not number.isdigit():
+        raise ValueError(f"Ungültige Telefonnummer für PDU-Modus: {phone_number}")
+
+    digits = number + ("F" if len(number) % 2 else "")
+    swapped = "".join(digits[i + 1] + digits[i] for i in range(0, len(digits), 2))
+    return bytes([len(number), type_of_address]) + bytes.fromhex(swapped)
+
+
+def _split_groups(groups: List[List[int]], limit: int) -> List[List[int]]:
+    """Teilt Einheiten-Gruppen in Segmente von höchstens `limit` Einheiten"""
+    segments = []
+    current: List[int] = []
+    for group in groups:
+        if len(current) + len(group) > limit:
+            segments.append(current)
+            current = []
+        current.extend(group)
+    if current or not segments:
+        segments.append(current)
+    return segments
+
+
+def _encode_ucs2_units(text: str) -> List[List[int]]:
+    """UTF-16-Codeeinheiten pro Zeichen (Surrogatpaare bleiben zusammen)"""
+    groups = []
+    for char in text:
+        encoded = char.encode("utf-16-be")
+        groups.append([
+            int.from_bytes(encoded[i:i + 2], "big") for i in range(0, len(encoded), 2)
+        ])
+    return groups
+
+
+def build_submit_pdus(
+    phone_number: str,
+    text: str,
+    reference: int = 0,
+    request_status_report: bool = False
+) -> List[SubmitPdu]:
+    """
+    Erzeugt die SMS-SUBMIT-PDUs für eine Nachricht
+
+    GSM-7 wird verwendet, wenn alle Zeichen darstellbar sind (160 Zeichen
+    pro SMS, 153 pro Teil), sonst UCS-2 (70 bzw. 67). Lange Nachrichten
+    werden als verkettete SMS mit 8-Bit-Referenz im UDH kodiert.
+
+    Args:
+        phone_number: Zieltelefonnummer
+        text: SMS-Text
+        reference: Referenznummer der verketteten Nachricht (0-255)
+        request_status_report: Zustellbericht anfordern
+
+    Returns:
+        Liste der PDUs in Sendereihenfolge
+    """
+    destination = encode_address(phone_number)
+    gsm7 = is_gsm7(text)
+
+    if gsm7:
+        groups = encode_gsm7(text)
+        single_limit, multipart_limit = GSM7_SINGLE_SEPTETS, GSM7_MULTIPART_SEPTETS
+    else:
+        groups = _encode_ucs2_units(text)
+        single_limit, multipart_limit = UCS2_SINGLE_UNITS, UCS2_MULTIPART_UNITS
+
+    total_units = sum(len(group) for group in groups)
+    if total_units <= single_limit:
+        segments = [[unit for group in groups for unit in group]]
+    else:
+        segments = _split_groups(groups, multipart_limit)
+
+    if len(segments) > 255:
+        raise ValueError("Nachricht zu lang für verkettete SMS")
+
+    multipart = len(segments) > 1
+    pdus = []
+
+    for index, units in enumerate(segments, start=1):
+        first_octet = 0x01  # SMS-SUBMIT, keine Gültigkeitsdauer
+        if multipart:
+            first_octet |= 0x40  # TP-UDHI
+        if request_status_report:
+            first_octet |= 0x20  # TP-SRR
+
+        udh = b""
+        if multipart:
+            udh = bytes([0x05, 0x00, 0x03, reference & 0xFF, len(segments), index])
+
+        if gsm7:
+            # Nutzdaten hinter dem UDH auf Septet-Grenze ausrichten
+            udh_bits = len(udh) * 8
+            padding_bits = (7 - udh_bits % 7) % 7
+            user_data = udh + pack_septets(units, padding_bits)
+            user_data_length = (udh_bits + padding_bits) // 7 + len(units)
+            dcs = DCS_GSM7
+        else:
+            user_data = udh + b"".join(unit.to_bytes(2, "big") for unit in units)
+            user_data_length = len(user_data)
+            dcs = DCS_UCS2
+
+        tpdu = (
+            bytes([first_octet, 0x00])  # TP-MR wird vom Modem vergeben
+            + destination
+            + bytes([0x00, dcs, user_data_length])  # TP-PID, TP-DCS, TP-UDL
+            + user_data
+        )
+        pdus.append(SubmitPdu(pdu="00" + tpdu.hex().upper(), tpdu_length=len(tpdu)))
+
+    logger.debug(
+        f"{len(pdus)} PDU(s) für {phone_number} erzeugt "
+        f"({'GSM-7' if gsm7 else 'UCS-2'}, {total_units} Einheiten)"
+    )
+    return pdus
+
+
+def count_parts(text: str) -> int:
+    """
+    Anzahl SMS-Teile, die für einen Text benötigt werden
+
+    Args:
+        text: SMS-Text
+
+    Returns:
+        Anzahl Teile
+    """
+    if is_gsm7(text):
+        groups = encode_gsm7(text)
+        single_limit, multipart_limit = GSM7_SINGLE_SEPTETS, GSM7_MULTIPART_SEPTETS
+    else:
+        groups = _encode_ucs2_units(text)
+        single_limit, multipart_limit = UCS2_SINGLE_UNITS, UCS2_MULTIPART_UNITS
+
+    if sum(len(group) for group in groups) <= single_limit:
+        return 1
+    return len(_split_groups(groups, multipart_limit))
+
+
+def unpack_septets(data: bytes, count: int, padding_bits: int = 0) -> List[int]:
+    """
+    Entpackt dicht gepackte 7-Bit-Septets (Umkehrung von pack_septets)
+
+    Args:
+        data: Gepackte Bytes
+        count: Anzahl Septets
+        padding_bits: Füllbits am Anfang
+
+    Returns:
+        Septet-Werte
+    """
+    bits = int.from_bytes(data, "little") >> padding_bits
+    return [(bits >> (7 * i)) & 0x7F for i in range(count)]
+
+
+def decode_gsm7(septets: List[int]) -> str:
+    """
+    Wandelt GSM-7-Septets in Text um (inkl. Erweiterungstabelle)
+
+    Args:
+        septets: Septet-Werte
+
+    Returns:
+        Dekodierter Text
+    """
+    chars = []
+    escaped = False
+    for septet in septets:
+        if escaped:
+            chars.append(_GSM7_EXTENSION_REVERSE.get(septet, " "))
+            escaped = False
+        elif septet == GSM7_ESCAPE:
+            escaped = True
+        else:
+            chars.append(GSM7_BASIC_ALPHABET[septet])
+    return "".join(chars)
+
+
+def _decode_semi_octets(data: bytes) -> str:
+    """BCD-Ziffern mit vertauschten Halbbytes (F = Füllzeichen)"""
+    digits = []
+    for octet in data:
+        digits.append("%X" % (octet & 0x0F))
+        digits.append("%X" % (octet >> 4))
+    return "".join(digits).rstrip("F")
+
+
+def _decode_timestamp(data: bytes) -> Optional[datetime]:
+    """Dekodiert den Zeitstempel des SMSC (TP-SCTS)"""
+    try:
+        fields = [int("%X%X" % (octet & 0x0F, octet >> 4)) for octet in data[:6]]
+        year, month, day, hour, minute, second = fields
+        tz_octet = data[6]
+        quarter_hours = (tz_octet & 0x07) * 10 + (tz_octet >> 4)
+        offset = timedelta(minutes=15 * quarter_hours)
+        if tz_octet & 0x08:
+            offset = -offset
+        return datetime(2000 + year, month, day, hour, minute, second, tzinfo=timezone(offset))
+    except Exception:
+        return None
+
+
+def _data_coding(dcs: int) -> str:
+    """Alphabet aus dem Data Coding Scheme (gsm7, 8bit oder ucs2)"""
+    group = dcs & 0xF0
+    if dcs & 0xC0 == 0x00:
+        return ("gsm7", "8bit", "ucs2", "gsm7")[(dcs >> 2) & 0x03]
+    if group == 0xF0:
+        return "8bit" if dcs & 0x04 else "gsm7"
+    if group == 0xE0:
+        return "ucs2"
+    return "gsm7"
+
+
+def decode_deliver_pdu(pdu_hex: str) -> DeliveredSms:
+    """
+    Dekodiert eine SMS-DELIVER-PDU (z.B. aus AT+CMGL=4 oder +CMT)
+
+    Args:
+        pdu_hex: PDU als Hex-String inkl. SMSC-Adresse
+
+    Returns:
+        Empfangene SMS bzw. ein Teil davon
+    """
+    data = bytes.fromhex(pdu_hex.strip())
+    pos = 1 + data[0]  # SMSC-Adresse überspringen
+
+    first_octet = data[pos]
+    if first_octet & 0x03 != 0x00:
+        raise ValueError(f"Keine SMS-DELIVER-PDU (MTI {first_octet & 0x03})")
+    has_udh = bool(first_octet & 0x40)
+    pos += 1
+
+    # Absenderadresse (TP-OA)
+    address_digits = data[pos]
+    type_of_address = data[pos + 1]
+    address_octets = (address_digits + 1) // 2
+    address = data[pos + 2:pos + 2 + address_octets]
+    if type_of_address & 0x70 == 0x50:
+        # Alphanumerischer Absender (GSM-7 gepackt)
+        sender = decode_gsm7(unpack_septets(address, address_digits * 4 // 7))
+    else:
+        sender = _decode_semi_octets(address)
+        if type_of_address & 0x70 == 0x10:
+            sender = "+" + sender
+    pos += 2 + address_octets
+
+    dcs = data[pos + 1]
+    timestamp = _decode_timestamp(data[pos + 2:pos + 9])
+    user_data_length = data[pos + 9]
+    user_data = data[pos + 10:]
+
+    coding = _data_coding(dcs)
+    reference, part, parts = None, 1, 1
+    header_length = 0
+
+    if has_udh:
+        header_length = user_data[0] + 1
+        index = 1
+        while index < header_length:
+            element_id, element_length = user_data[index], user_data[index + 1]
+            element = user_data[index + 2:index + 2 + element_length]
+            if element_id == 0x00 and element_length == 3:
+                reference, parts, part = element[0], element[1], element[2]
+            elif element_id == 0x08 and element_length == 4:
+                reference = int.from_bytes(element[:2], "big")
+                parts, part = element[2], element[3]
+            index += 2 + element_length
+
+    if coding == "gsm7":
+        header_septets = (header_length * 8 + 6) // 7
+        padding_bits = header_septets * 7 - header_length * 8
+        septets = unpack_septets(
+            user_data[header_length:],
+            user_data_length - header_septets,
+            padding_bits
+        )
+        text = decode_gsm7(septets)
+    elif coding == "ucs2":
+        text = user_data[header_length:user_data_length].decode("utf-16-be", errors="replace")
+    else:
+        text = user_data[header_length:user_data_length].decode("latin-1")
+
+    return DeliveredSms(
+        sender=sender,
+        timestamp=timestamp,
+        text=text,
+        reference=reference,
+        part=part,
+        parts=parts
+    )
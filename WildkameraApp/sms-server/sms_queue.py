@@ -0,0 +1,480 @@
+"""
+Persistente Warteschlange für ausgehende SMS
+Nimmt Sendeaufträge sofort an und arbeitet sie im Hintergrund über das Modem ab;
+Änderungen werden kurz gesammelt und außerhalb des Event-Loops geschrieben
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Job-Status
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+class SmsQueue:
+    """
+    Dauerhafte SMS-Sendewarteschlange mit Hintergrund-Dispatcher
+
+    Jobs werden in einer JSON-Datei gespeichert und überstehen Neustarts.
+    Jobs, die beim Beenden gerade gesendet wurden, werden beim Laden
+    wieder auf "pending" gesetzt. Alle Änderungen innerhalb von save_delay
+    (z.B. ein ganzer Batch) ergeben einen einzigen Schreibvorgang.
+    """
+
+    def __init__(
+        self,
+        queue_file: str = "sms_queue.json",
+        max_attempts: int = 3,
+        retry_delay: float = 30.0,
+        keep_finished: int = 500,
+        max_batch_size: int = 20,
+        save_delay: float = 0.5
+    ):
+        """
+        Initialisiert die Warteschlange
+
+        Args:
+            queue_file: Pfad zur JSON-Datei für die Warteschlange
+            max_attempts: Maximale Sendeversuche pro Job
+            retry_delay: Wartezeit vor einem erneuten Versuch in Sekunden
+            keep_finished: Anzahl abgeschlossener Jobs, die für Statusabfragen erhalten bleiben
+            max_batch_size: Maximale Anzahl Jobs, die in einem Stapel an ein Modem gehen
+            save_delay: Sekunden, in denen Änderungen zu einem Schreibvorgang zusammengefasst werden
+        """
+        self.queue_file = queue_file
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.keep_finished = keep_finished
+        self.max_batch_size = max_batch_size
+        self.save_delay = save_delay
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+        self._sender_provider: Optional[Callable[[], Any]] = None
+        self._on_complete: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self._dispatcher_task: Optional[asyncio.Task] = None
+        self._active_sends: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self._dirty = False
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._save_future: Optional[asyncio.Future] = None
+
+        self._load_queue()
+
+    def _load_queue(self):
+        """Lädt die Warteschlange aus der JSON-Datei"""
+        try:
+            if not os.path.exists(self.queue_file):
+                logger.info("Keine gespeicherte SMS-Warteschlange gefunden")
+                return
+
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                jobs = json.load(f)
+
+            for job in jobs:
+                # Unterbrochene Sendevorgänge erneut einplanen
+                if job["status"] == STATUS_SENDING:
+                    job["status"] = STATUS_PENDING
+                self.jobs[job["id"]] = job
+
+            logger.info(f"SMS-Warteschlange geladen: {self.pending_count()} ausstehend")
+
+        except Exception as e:
+            logger.error(f"Fehler beim Laden der SMS-Warteschlange: {e}")
+            self.jobs = {}
+
+    def _write_queue(self, data: str) -> bool:
+        """Schreibt die serialisierte Warteschlange atomar (Temp-Datei + Rename)"""
+        try:
+            tmp_file = f"{self.queue_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_file, self.queue_file)
+            return True
+        except Exception as e:
+            logger.error(f"Fehler beim Speichern der SMS-Warteschlange: {e}")
+            return False
+
+    def _save_queue(self):
+        """Speichert die Warteschlange sofort (synchron, z.B. beim Herunterfahren)"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        self._dirty = False
+        if not self._write_queue(json.dumps(list(self.jobs.values()), ensure_ascii=False)):
+            self._dirty = True
+
+    def _schedule_save(self):
+        """
+        Merkt eine Änderung zum Speichern vor
+
+        Der erste Aufruf startet einen Timer im Event-Loop; alle Änderungen bis
+        zu dessen Ablauf werden mit einem einzigen Schreibvorgang gespeichert.
+        Ohne laufenden Event-Loop wird sofort gespeichert.
+        """
+        self._dirty = True
+        if self._save_handle is not None or self._save_future is not None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._save_queue()
+            return
+
+        self._save_handle = loop.call_later(self.save_delay, self._start_save)
+
+    def _start_save(self):
+        """Serialisiert die Jobs im Event-Loop und schreibt sie in einem Executor-Thread"""
+        self._save_handle = None
+        if not self._dirty or self._save_future is not None:
+            return
+
+        # Schnappschuss im Event-Loop, damit sich die Jobs beim Serialisieren nicht ändern
+        data = json.dumps(list(self.jobs.values()), ensure_ascii=False)
+        self._dirty = False
+        self._save_future = asyncio.get_running_loop().run_in_executor(None, self._write_queue, data)
+        self._save_future.add_done_callback(self._save_done)
+
+    def _save_done(self, future: asyncio.Future):
+        """Nach einem Schreibvorgang: zwischenzeitliche Änderungen (oder Fehler) erneut speichern"""
+        self._save_future = None
+        if future.cancelled() or future.exception() is not None or not future.result():
+            self._dirty = True
+        if self._dirty and self._save_handle is None:
+            self._save_handle = asyncio.get_running_loop().call_later(self.save_delay, self._start_save)
+
+    def _prune_finished(self):
+        """Entfernt die ältesten abgeschlossenen Jobs über dem Limit"""
+        finished = [
+            job for job in self.jobs.values()
+            if job["status"] in (STATUS_SENT, STATUS_FAILED)
+        ]
+        if len(finished) <= self.keep_finished:
+            return
+
+        finished.sort(key=lambda job: job["updated"])
+        for job in finished[:len(finished) - self.keep_finished]:
+            del self.jobs[job["id"]]
+
+    def _add_job(self, phone_number: str, message: str, camera_id: Optional[str]) -> Dict[str, Any]:
+        """Legt einen neuen Job im Speicher an (noch nicht gespeichert)"""
+        now = datetime.now().isoformat()
+        job = {
+            "id": uuid.uuid4().hex,
+            "phone_number": phone_number,
+            "message": message,
+            "camera_id": camera_id,
+            "status": STATUS_PENDING,
+            "attempts": 0,
+            "error": None,
+            "created": now,
+            "updated": now,
+            "next_attempt": None,
+            "message_reference": None
+        }
+        self.jobs[job["id"]] = job
+        self._dirty = True
+        return job
+
+    async def enqueue(self, phone_number: str, message: str, camera_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Reiht eine SMS in die Warteschlange ein
+
+        Kehrt erst zurück, wenn der Job gespeichert ist; gleichzeitige
+        Aufrufe teilen sich einen Schreibvorgang.
+
+        Args:
+            phone_number: Zieltelefonnummer
+            message: SMS-Text
+            camera_id: Optionale Kamera-ID
+
+        Returns:
+            Der angelegte Job
+
+        Raises:
+            Exception: Warteschlange konnte nicht gespeichert werden
+        """
+        return (await self.enqueue_batch([(phone_number, message, camera_id)]))[0]
+
+    async def enqueue_batch(self, messages: List[Tuple[str, str, Optional[str]]]) -> List[Dict[str, Any]]:
+        """
+        Reiht mehrere SMS mit einem einzigen Schreibvorgang ein
+
+        Args:
+            messages: Liste von (Telefonnummer, SMS-Text, Kamera-ID oder None)
+
+        Returns:
+            Die angelegten Jobs
+
+        Raises:
+            Exception: Warteschlange konnte nicht gespeichert werden (keiner der Jobs bleibt erhalten)
+        """
+        jobs = [self._add_job(*item) for item in messages]
+
+        if not await self.flush():
+            for job in jobs:
+                self.jobs.pop(job["id"], None)
+            self._dirty = True
+            raise Exception("SMS-Warteschlange konnte nicht gespeichert werden")
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+        for job in jobs:
+            logger.info(f"SMS an {job['phone_number']} eingereiht (Job {job['id']})")
+        return [dict(job) for job in jobs]
+
+    async def flush(self) -> bool:
+        """
+        Schreibt alle bisherigen Änderungen sofort (im Executor) und wartet darauf
+
+        Returns:
+            True wenn der Stand gespeichert ist
+        """
+        while True:
+            if self._save_future is not None:
+                # Laufender Schreibvorgang enthält evtl. nicht alle Änderungen: abwarten
+                try:
+                    await self._save_future
+                except Exception:
+                    pass
+                continue
+
+            if not self._dirty:
+                return True
+
+            if self._save_handle is not None:
+                self._save_handle.cancel()
+                self._save_handle = None
+            self._start_save()
+            try:
+                return await self._save_future
+            except Exception:
+                return False
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Holt einen Job anhand seiner ID
+
+        Args:
+            job_id: ID des Jobs
+
+        Returns:
+            Job-Dictionary oder None
+        """
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    def pending_count(self) -> int:
+        """Anzahl der noch nicht abgeschlossenen Jobs"""
+        return sum(
+            1 for job in self.jobs.values()
+            if job["status"] in (STATUS_PENDING, STATUS_SENDING)
+        )
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Zählt die Jobs je Status
+
+        Returns:
+            Dictionary {status: anzahl}
+        """
+        stats = {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_SENT: 0, STATUS_FAILED: 0}
+        for job in self.jobs.values():
+            stats[job["status"]] = stats.get(job["status"], 0) + 1
+        return stats
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Listet die neuesten Jobs
+
+        Args:
+            status: Optionaler Status-Filter
+            limit: Maximale Anzahl zurückzugebender Jobs
+
+        Returns:
+            Liste von Jobs, neueste zuerst
+        """
+        jobs = [
+            dict(job) for job in self.jobs.values()
+            if status is None or job["status"] == status
+        ]
+        jobs.sort(key=lambda job: job["created"], reverse=True)
+        return jobs[:limit]
+
+    def _due_jobs(self) -> List[Dict[str, Any]]:
+        """Fällige Jobs, älteste zuerst"""
+        now = datetime.now().isoformat()
+        due = [
+            job for job in self.jobs.values()
+            if job["status"] == STATUS_PENDING
+            and (job["next_attempt"] is None or job["next_attempt"] <= now)
+        ]
+        due.sort(key=lambda job: job["created"])
+        return due
+
+    def _finish_job(
+        self,
+        job: Dict[str, Any],
+        success: bool,
+        error: Optional[str] = None,
+        message_reference: Optional[int] = None
+    ):
+        """Aktualisiert einen Job nach einem Sendeversuch"""
+        job["attempts"] += 1
+        job["updated"] = datetime.now().isoformat()
+
+        if success:
+            job["status"] = STATUS_SENT
+            job["error"] = None
+            job["message_reference"] = message_reference
+        elif job["attempts"] >= self.max_attempts:
+            job["status"] = STATUS_FAILED
+            job["error"] = error
+        else:
+            job["status"] = STATUS_PENDING
+            job["error"] = error
+            job["next_attempt"] = (
+                datetime.now() + timedelta(seconds=self.retry_delay)
+            ).isoformat()
+
+        if job["status"] in (STATUS_SENT, STATUS_FAILED):
+            self._prune_finished()
+            if self._on_complete is not None:
+                try:
+                    self._on_complete(dict(job))
+                except Exception as e:
+                    logger.error(f"Fehler im Abschluss-Callback für Job {job['id']}: {e}")
+
+        self._schedule_save()
+
+    async def start(
+        self,
+        sender_provider: Callable[[], Any],
+        on_complete: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ):
+        """
+        Startet den Dispatcher
+
+        Args:
+            sender_provider: Liefert das aktuelle SmsModem bzw. den ModemPool (oder None)
+            on_complete: Wird mit jedem endgültig gesendeten/fehlgeschlagenen Job aufgerufen
+        """
+        self._sender_provider = sender_provider
+        self._on_complete = on_complete
+        self._wakeup = asyncio.Event()
+        self._dispatcher_task = asyncio.get_running_loop().create_task(self._dispatch_loop())
+        logger.info("SMS-Dispatcher gestartet")
+
+    async def stop(self):
+        """Stoppt den Dispatcher und laufende Sendevorgänge"""
+        tasks = list(self._active_sends)
+        if self._dispatcher_task is not None:
+            tasks.append(self._dispatcher_task)
+
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        self._dispatcher_task = None
+        self._active_sends.clear()
+
+        # Laufenden Schreibvorgang abwarten, dann den aktuellen Stand sofort speichern
+        if self._save_future is not None:
+            try:
+                await self._save_future
+            except Exception:
+                pass
+        self._save_queue()
+        logger.info("SMS-Dispatcher gestoppt")
+
+    def notify(self):
+        """Weckt den Dispatcher (z.B. nachdem ein Modem verbunden wurde)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait(self, timeout: float):
+        """Wartet auf neue Jobs, freie Modems oder bis zum Timeout"""
+        # asyncio.wait statt wait_for: wait_for kann ein cancel() verschlucken,
+        # wenn das Event im selben Moment gesetzt wird
+        waiter = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        finally:
+            waiter.cancel()
+        self._wakeup.clear()
+
+    async def _dispatch_loop(self):
+        """
+        Arbeitet die Warteschlange ab
+
+        Es laufen so viele Stapel parallel, wie der Sender Kapazität meldet
+        (beim ModemPool: Anzahl gesunder Modems, beim einzelnen Modem: 1).
+        Fällige Jobs werden gleichmäßig auf die freien Plätze verteilt.
+        """
+        while True:
+            sender = self._sender_provider()
+            if not sender or not sender.is_connected():
+                # Ohne Modem warten; Jobs bleiben erhalten
+                await self._wait(5)
+                continue
+
+            capacity = sender.capacity() if hasattr(sender, "capacity") else 1
+
+            while len(self._active_sends) < capacity:
+                due = self._due_jobs()
+                if not due:
+                    break
+
+                free_slots = capacity - len(self._active_sends)
+                batch_size = min(self.max_batch_size, math.ceil(len(due) / free_slots))
+                batch = due[:batch_size]
+
+                now = datetime.now().isoformat()
+                for job in batch:
+                    job["status"] = STATUS_SENDING
+                    job["updated"] = now
+                self._schedule_save()
+
+                task = asyncio.get_running_loop().create_task(self._send_batch(sender, batch))
+                self._active_sends.add(task)
+
+            await self._wait(self.retry_delay)
+
+    async def _send_batch(self, sender: Any, batch: List[Dict[str, Any]]):
+        """Sendet einen Stapel Jobs und weckt danach den Dispatcher"""
+        try:
+            results = await sender.send_sms_batch(
+                [(job["phone_number"], job["message"]) for job in batch]
+            )
+            for job, result in zip(batch, results):
+                self._finish_job(
+                    job,
+                    result["success"],
+                    result["error"] or (None if result["success"] else "SMS konnte nicht gesendet werden"),
+                    result["message_reference"]
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Fehler beim Senden von {len(batch)} Jobs: {e}")
+            for job in batch:
+                self._finish_job(job, False, str(e))
+        finally:
+            self._active_sends.discard(asyncio.current_task())
+            self._wakeup.set()
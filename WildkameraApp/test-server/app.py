@@ -2,11 +2,24 @@
 Flask Test Server für Wildkamera PWA
 Hostet die PWA-Dateien und bietet einen einfachen Development-Server
 """
-from flask import Flask, send_from_directory, jsonify, request
+from flask import Flask, Response, send_from_directory, jsonify, request, stream_with_context
 from flask_cors import CORS
 import os
 import logging
 
+import urllib3
+
+from asset_manifest import manifest_is_current
+from sms_proxy import SmsServerProxy, filter_headers
+from static_assets import (
+    BROTLI_AVAILABLE,
+    StaticAssetCache,
+    cache_control_for,
+    choose_encoding,
+    etag_for_encoding,
+    etag_matches,
+)
+
 # Logging konfigurieren
 logging.basicConfig(
     level=logging.INFO,
@@ -25,11 +38,64 @@ PWA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
 logger.info(f"PWA-Verzeichnis: {PWA_DIR}")
 
+# Die Precache-Liste erzeugt asset_manifest.py (Deployment); hier nur prüfen
+if not manifest_is_current(PWA_DIR):
+    logger.warning("asset-manifest.json ist veraltet - 'python asset_manifest.py' ausführen")
+
+# Statische Dateien samt gzip-/Brotli-Variante im Speicher; PWA-Dateien vorab aufbereiten
+asset_cache = StaticAssetCache(PWA_DIR)
+_warmed = asset_cache.warm([
+    name for name in os.listdir(PWA_DIR) if os.path.isfile(os.path.join(PWA_DIR, name))
+])
+logger.info(f"{_warmed} statische Dateien vorbereitet (Brotli {'aktiv' if BROTLI_AVAILABLE else 'nicht installiert'})")
+
+# SMS-Server hinter /api/proxy/ (gleicher Origin wie die PWA)
+SMS_SERVER_URL = os.environ.get('SMS_SERVER_URL', 'http://127.0.0.1:8000')
+sms_proxy = SmsServerProxy(SMS_SERVER_URL)
+logger.info(f"SMS-Server für /api/proxy/: {SMS_SERVER_URL}")
+
+# Endpoints für statische Dateien (werden nicht einzeln geloggt)
+STATIC_ENDPOINTS = {'index', 'serve_file', 'serve_icon'}
+
+
+def serve_static(filename):
+    """
+    Liefert eine statische Datei vorkomprimiert mit ETag und Cache-Control
+
+    Je nach Accept-Encoding wird die Brotli-, gzip- oder unkomprimierte
+    Variante gesendet; bei passendem If-None-Match nur 304 Not Modified.
+    """
+    try:
+        asset = asset_cache.get(filename)
+    except OSError as e:
+        logger.error(f"Fehler beim Laden von {filename}: {e}")
+        asset = None
+
+    if asset is None:
+        if asset_cache.resolve(filename) is not None:
+            # Zu groß für den Cache: direkt von der Platte
+            return send_from_directory(PWA_DIR, filename)
+        return jsonify({"error": "Datei nicht gefunden"}), 404
+
+    encoding = choose_encoding(asset, request.headers.get('Accept-Encoding'))
+    headers = {
+        'ETag': etag_for_encoding(asset, encoding),
+        'Cache-Control': cache_control_for(filename, asset, request.args.get('v')),
+        'Vary': 'Accept-Encoding'
+    }
+
+    if etag_matches(request.headers.get('If-None-Match'), asset):
+        return Response(status=304, headers=headers)
+
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(asset.variants[encoding], mimetype=asset.mimetype, headers=headers)
+
 
 @app.route('/')
 def index():
     """Serve die index.html"""
-    return send_from_directory(PWA_DIR, 'index.html')
+    return serve_static('index.html')
 
 
 @app.route('/<path:filename>')
@@ -37,18 +103,13 @@ def serve_file(filename):
     """
     Serve alle statischen Dateien (JS, CSS, Icons, etc.)
     """
-    try:
-        return send_from_directory(PWA_DIR, filename)
-    except Exception as e:
-        logger.error(f"Fehler beim Laden von {filename}: {e}")
-        return jsonify({"error": "Datei nicht gefunden"}), 404
+    return serve_static(filename)
 
 
 @app.route('/icons/<path:filename>')
 def serve_icon(filename):
     """Serve Icon-Dateien"""
-    icons_dir = os.path.join(PWA_DIR, 'icons')
-    return send_from_directory(icons_dir, filename)
+    return serve_static(f'icons/{filename}')
 
 
 @app.route('/health')
@@ -61,33 +122,52 @@ def health():
     })
 
 
-@app.route('/api/proxy', methods=['POST'])
-def proxy_to_sms_server():
-    """
-    Optional: Proxy-Endpoint zum SMS-Server
-    Nützlich wenn SMS-Server auf anderem Host läuft
+PROXY_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'HEAD']
+
+
+@app.route('/api/proxy/', defaults={'path': ''}, methods=PROXY_METHODS)
+@app.route('/api/proxy/<path:path>', methods=PROXY_METHODS)
+def proxy_to_sms_server(path):
     """
-    try:
-        # Hole SMS-Server-URL aus Request-Body
-        data = request.get_json()
-        target_url = data.get('target_url')
-        payload = data.get('payload')
+    Proxy zum SMS-Server (SMS_SERVER_URL)
 
-        if not target_url or not payload:
-            return jsonify({
-                "error": "target_url und payload erforderlich"
-            }), 400
+    /api/proxy/<pfad> wird an <SMS_SERVER_URL>/<pfad> weitergeleitet. Die
+    Verbindungen kommen aus einem Keep-Alive-Pool, Request- und
+    Response-Body werden ungepuffert durchgereicht.
+    """
+    headers = filter_headers(request.headers, drop=('host', 'content-length'))
+    if request.content_length is not None:
+        headers.append(('Content-Length', str(request.content_length)))
+    headers.append(('X-Forwarded-For', request.remote_addr or ''))
+    headers.append(('X-Forwarded-Host', request.host))
+    headers.append(('X-Forwarded-Proto', request.scheme))
 
-        # Hier könnte man requests verwenden um zum SMS-Server zu proxyen
-        # Für jetzt geben wir nur eine Info zurück
-        return jsonify({
-            "message": "Proxy-Feature - verwenden Sie direkt die SMS-Server-URL",
-            "hint": "Konfigurieren Sie die Server-URL in der App-Konfiguration"
-        })
+    has_body = request.content_length or 'chunked' in request.headers.get('Transfer-Encoding', '').lower()
 
-    except Exception as e:
-        logger.error(f"Fehler beim Proxy: {e}")
-        return jsonify({"error": str(e)}), 500
+    try:
+        upstream = sms_proxy.forward(
+            request.method,
+            f'/{path}',
+            request.query_string.decode('latin-1'),
+            headers,
+            body=request.stream if has_body else None
+        )
+    except urllib3.exceptions.NewConnectionError as e:
+        logger.error(f"SMS-Server nicht erreichbar ({SMS_SERVER_URL}): {e}")
+        return jsonify({"error": "SMS-Server nicht erreichbar", "details": str(e)}), 502
+    except urllib3.exceptions.TimeoutError as e:
+        logger.error(f"Zeitüberschreitung beim Proxy zu /{path}: {e}")
+        return jsonify({"error": "SMS-Server antwortet nicht"}), 504
+    except urllib3.exceptions.HTTPError as e:
+        logger.error(f"Fehler beim Proxy zu /{path}: {e}")
+        return jsonify({"error": "SMS-Server nicht erreichbar", "details": str(e)}), 502
+
+    return Response(
+        stream_with_context(sms_proxy.iter_body(upstream)),
+        status=upstream.status,
+        headers=filter_headers(upstream.headers.items()),
+        direct_passthrough=True
+    )
 
 
 @app.errorhandler(404)
@@ -110,27 +190,35 @@ def internal_error(e):
     }), 500
 
 
+# Sicherheits-Header (einmal berechnet, für jede Antwort gleich)
+SECURITY_HEADERS = {
+    # Content Security Policy für PWA
+    'Content-Security-Policy': (
+        "default-src 'self' https: 'unsafe-inline' 'unsafe-eval' data: blob:; "
+        "connect-src 'self' https: http://localhost:* http://127.0.0.1:*;"
+    ),
+    # Andere Security Headers
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'SAMEORIGIN',
+    'X-XSS-Protection': '1; mode=block',
+}
+
+
 # Middleware für Request-Logging
 @app.before_request
 def log_request():
-    """Loggt eingehende Requests"""
+    """Loggt eingehende Requests (statische Dateien nur im Debug-Level)"""
+    if request.endpoint in STATIC_ENDPOINTS:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{request.method} {request.path} - {request.remote_addr}")
+        return
     logger.info(f"{request.method} {request.path} - {request.remote_addr}")
 
 
 @app.after_request
 def add_security_headers(response):
     """Fügt Sicherheits-Header hinzu"""
-    # Content Security Policy für PWA
-    response.headers['Content-Security-Policy'] = (
-        "default-src 'self' https: 'unsafe-inline' 'unsafe-eval' data: blob:; "
-        "connect-src 'self' https: http://localhost:* http://127.0.0.1:*;"
-    )
-
-    # Andere Security Headers
-    response.headers['X-Content-Type-Options'] = 'nosniff'
-    response.headers['X-Frame-Options'] = 'SAMEORIGIN'
-    response.headers['X-XSS-Protection'] = '1; mode=block'
-
+    response.headers.update(SECURITY_HEADERS)
     return response
 
 
@@ -169,6 +257,7 @@ if __name__ == '__main__':
     print(f"   /                  - PWA Index")
     print(f"   /health           - Health Check")
     print(f"   /<filename>       - Statische Dateien")
+    print(f"   /api/proxy/<pfad> - SMS-Server ({SMS_SERVER_URL})")
     print(f"\n[INFO] Tipps:")
     print(f"   - PWA im Browser oeffnen: http://localhost:5000")
     print(f"   - Auf Mobilgeraet (gleiches Netzwerk): http://{network_ip}:5000")
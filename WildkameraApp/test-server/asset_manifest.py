@@ -0,0 +1,179 @@
+"""
+Asset-Manifest und Precache-Liste für die Service Worker
+Berechnet für jede Datei aus der Precache-Liste (ASSETS in service-worker.js)
+einen Content-Hash und schreibt asset-manifest.json sowie precache-manifest.js,
+damit der Service Worker bei einem Update nur geänderte Dateien neu lädt
+
+Aufruf: python asset_manifest.py [PWA-Verzeichnis ...]
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE = "asset-manifest.json"
+PRECACHE_FILE = "precache-manifest.js"
+
+# Länge der Revision (Hex-Zeichen des SHA-256), wird als ?v=<revision> angehängt
+REVISION_LENGTH = 12
+
+_ASSETS_BLOCK = re.compile(r"const\s+ASSETS\s*=\s*\[(.*?)\];", re.DOTALL)
+_QUOTED = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+
+
+def file_revision(path: str) -> str:
+    """
+    Content-Hash einer Datei (gekürzter SHA-256)
+
+    Args:
+        path: Pfad zur Datei
+
+    Returns:
+        Revision als Hex-String
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:REVISION_LENGTH]
+
+
+def read_precache_list(service_worker_path: str) -> Optional[List[str]]:
+    """
+    Liest die Einträge der ASSETS-Liste aus einem Service Worker
+
+    Args:
+        service_worker_path: Pfad zu service-worker.js
+
+    Returns:
+        Liste der Einträge (lokal und extern) oder None, wenn es keine ASSETS-Liste gibt
+    """
+    with open(service_worker_path, "r", encoding="utf-8") as f:
+        source = f.read()
+
+    match = _ASSETS_BLOCK.search(source)
+    if match is None:
+        return None
+
+    # Zeilenkommentare entfernen, damit auskommentierte Einträge nicht zählen
+    block = re.sub(r"(^|,)\s*//[^\n]*", r"\1", match.group(1), flags=re.MULTILINE)
+    return [single or double for single, double in _QUOTED.findall(block)]
+
+
+def build_manifest(pwa_dir: str, service_worker: str = "service-worker.js") -> Optional[Dict[str, str]]:
+    """
+    Berechnet die Revisionen aller lokalen Dateien der Precache-Liste
+
+    Externe URLs und "/" werden übersprungen; fehlende Dateien werden
+    protokolliert und ausgelassen.
+
+    Args:
+        pwa_dir: PWA-Verzeichnis mit dem Service Worker
+        service_worker: Dateiname des Service Workers
+
+    Returns:
+        Eintrag aus der ASSETS-Liste (z.B. "./app.js") → Revision, oder None ohne ASSETS-Liste
+    """
+    entries = read_precache_list(os.path.join(pwa_dir, service_worker))
+    if entries is None:
+        return None
+
+    revisions = {}
+    for entry in entries:
+        if "://" in entry or entry in ("", "/"):
+            continue
+        relative = entry[2:] if entry.startswith("./") else entry.lstrip("/")
+        path = os.path.join(pwa_dir, *relative.split("/"))
+        if not os.path.isfile(path):
+            logger.warning(f"Precache-Datei fehlt: {path}")
+            continue
+        revisions[entry] = file_revision(path)
+    return revisions
+
+
+def _write_if_changed(path: str, content: str) -> bool:
+    """Schreibt eine Datei atomar, aber nur wenn sich der Inhalt ändert"""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return False
+
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, "w", encoding="utf-8", newline="\n") as f:
+        f.write(content)
+    os.replace(tmp_file, path)
+    return True
+
+
+def update_precache_manifest(pwa_dir: str, service_worker: str = "service-worker.js") -> Optional[Dict[str, str]]:
+    """
+    Erzeugt asset-manifest.json und precache-manifest.js im PWA-Verzeichnis
+
+    Args:
+        pwa_dir: PWA-Verzeichnis mit dem Service Worker
+        service_worker: Dateiname des Service Workers
+
+    Returns:
+        Revisionen (siehe build_manifest) oder None, wenn der Service Worker nichts vorab cacht
+    """
+    revisions = build_manifest(pwa_dir, service_worker)
+    if revisions is None:
+        logger.info(f"{os.path.join(pwa_dir, service_worker)}: keine ASSETS-Liste, übersprungen")
+        return None
+
+    manifest = json.dumps(
+        {"version": MANIFEST_VERSION, "assets": revisions},
+        indent=2,
+        sort_keys=True
+    ) + "\n"
+    precache = (
+        "// Automatisch erzeugt von test-server/asset_manifest.py - nicht von Hand bearbeiten.\n"
+        "// Revision (Content-Hash) je Datei aus ASSETS in service-worker.js.\n"
+        f"self.PRECACHE_REVISIONS = {json.dumps(revisions, indent=2, sort_keys=True)};\n"
+    )
+
+    changed = _write_if_changed(os.path.join(pwa_dir, MANIFEST_FILE), manifest)
+    changed = _write_if_changed(os.path.join(pwa_dir, PRECACHE_FILE), precache) or changed
+    if changed:
+        logger.info(f"Precache-Manifest aktualisiert: {pwa_dir} ({len(revisions)} Dateien)")
+    return revisions
+
+
+def manifest_is_current(pwa_dir: str, service_worker: str = "service-worker.js") -> bool:
+    """
+    Prüft, ob asset-manifest.json zu den aktuellen Dateien passt (schreibt nichts)
+
+    Args:
+        pwa_dir: PWA-Verzeichnis mit dem Service Worker
+        service_worker: Dateiname des Service Workers
+
+    Returns:
+        True, wenn die Revisionen übereinstimmen oder der Service Worker nichts vorab cacht
+    """
+    revisions = build_manifest(pwa_dir, service_worker)
+    if revisions is None:
+        return True
+
+    try:
+        with open(os.path.join(pwa_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("assets") == revisions
+    except (OSError, ValueError):
+        return False
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    pwa_dirs = sys.argv[1:] or [base_dir, os.path.join(base_dir, "..", "Wiesen")]
+    for pwa_dir in pwa_dirs:
+        if not os.path.isfile(os.path.join(pwa_dir, "service-worker.js")):
+            logger.warning(f"Kein service-worker.js in {pwa_dir}")
+            continue
+        update_precache_manifest(os.path.abspath(pwa_dir))
@@ -0,0 +1,161 @@
+"""
+Reverse Proxy vom Test-Server zum SMS-Server
+Leitet Requests über einen Keep-Alive-Verbindungspool weiter und reicht
+Request- und Response-Body als Stream durch, sodass PWA und SMS-API über
+einen gemeinsamen Origin erreichbar sind
+"""
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import urllib3
+
+logger = logging.getLogger(__name__)
+
+# Header, die nur für eine Verbindung gelten und nicht weitergereicht werden (RFC 7230)
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+DEFAULT_TIMEOUT = urllib3.Timeout(connect=2.0, read=30.0)
+
+# Timeouts je Pfad-Präfix (längster Treffer gewinnt)
+ROUTE_TIMEOUTS: Dict[str, urllib3.Timeout] = {
+    "/health": urllib3.Timeout(connect=2.0, read=5.0),
+    "/status": urllib3.Timeout(connect=2.0, read=10.0),
+    "/modem/": urllib3.Timeout(connect=2.0, read=60.0),
+    "/sms/send": urllib3.Timeout(connect=2.0, read=120.0),
+    "/reviere/kmz/download": urllib3.Timeout(connect=2.0, read=300.0),
+    "/reviere/kmz/bundle": urllib3.Timeout(connect=2.0, read=300.0),
+    "/cameras/status": urllib3.Timeout(connect=2.0, read=60.0),
+}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def filter_headers(headers, drop: Tuple[str, ...] = ()) -> List[Tuple[str, str]]:
+    """
+    Entfernt Hop-by-Hop-Header (inkl. der im Connection-Header genannten)
+
+    Args:
+        headers: Header als Mapping oder Liste von (Name, Wert)
+        drop: Weitere zu entfernende Header (kleingeschrieben)
+
+    Returns:
+        Liste von (Name, Wert)
+    """
+    items = list(headers.items()) if hasattr(headers, "items") else list(headers)
+    excluded = set(HOP_BY_HOP_HEADERS).union(drop)
+    for name, value in items:
+        if name.lower() == "connection":
+            excluded.update(token.strip().lower() for token in value.split(","))
+    return [(name, value) for name, value in items if name.lower() not in excluded]
+
+
+class SmsServerProxy:
+    """
+    Weiterleitung an den SMS-Server über einen Verbindungspool
+
+    Verbindungen bleiben offen und werden wiederverwendet; Bodies werden
+    nie komplett gepuffert (auch nicht dekomprimiert).
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 10, route_timeouts: Optional[Dict[str, urllib3.Timeout]] = None):
+        """
+        Initialisiert den Proxy
+
+        Args:
+            base_url: URL des SMS-Servers, z.B. http://127.0.0.1:8000
+            pool_size: Maximale Anzahl offener Verbindungen
+            route_timeouts: Timeouts je Pfad-Präfix (Default: ROUTE_TIMEOUTS)
+        """
+        parts = urlsplit(base_url)
+        self.base_url = base_url.rstrip("/")
+        self.base_path = parts.path.rstrip("/")
+        self.route_timeouts = ROUTE_TIMEOUTS if route_timeouts is None else route_timeouts
+        self._pool = urllib3.connection_from_url(
+            base_url,
+            maxsize=pool_size,
+            block=False,
+            retries=False,
+            timeout=DEFAULT_TIMEOUT,
+        )
+
+    def timeout_for(self, path: str) -> urllib3.Timeout:
+        """Timeout für einen Pfad (längstes passendes Präfix, sonst DEFAULT_TIMEOUT)"""
+        best = None
+        for prefix in self.route_timeouts:
+            if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.route_timeouts[best] if best is not None else DEFAULT_TIMEOUT
+
+    def forward(
+        self,
+        method: str,
+        path: str,
+        query_string: str,
+        headers: List[Tuple[str, str]],
+        body=None
+    ) -> urllib3.BaseHTTPResponse:
+        """
+        Schickt einen Request an den SMS-Server
+
+        Args:
+            method: HTTP-Methode
+            path: Pfad auf dem SMS-Server (mit führendem /)
+            query_string: Query-String ohne "?"
+            headers: Bereits gefilterte Request-Header
+            body: Request-Body als Stream (oder None)
+
+        Returns:
+            Antwort des SMS-Servers, Body noch nicht gelesen
+
+        Raises:
+            urllib3.exceptions.HTTPError: Verbindungsfehler oder Timeout
+        """
+        url = f"{self.base_path}{path}"
+        if query_string:
+            url = f"{url}?{query_string}"
+
+        chunked = body is not None and not any(name.lower() == "content-length" for name, _ in headers)
+        return self._pool.urlopen(
+            method,
+            url,
+            body=body,
+            headers=dict(headers),
+            timeout=self.timeout_for(path),
+            preload_content=False,
+            decode_content=False,
+            redirect=False,
+            chunked=chunked,
+        )
+
+    @staticmethod
+    def iter_body(response: urllib3.BaseHTTPResponse) -> Iterator[bytes]:
+        """
+        Reicht den Response-Body unverändert in Teilen durch und gibt danach die Verbindung frei
+
+        Args:
+            response: Antwort aus forward()
+
+        Yields:
+            Body-Teile (ggf. weiterhin komprimiert)
+        """
+        complete = False
+        try:
+            for chunk in response.stream(STREAM_CHUNK_SIZE, decode_content=False):
+                yield chunk
+            complete = True
+        finally:
+            if not complete:
+                # Client hat abgebrochen: Restdaten nicht lesen, Verbindung verwerfen
+                response.close()
+            response.release_conn()
@@ -0,0 +1,264 @@
+"""
+Vorkomprimierte statische Dateien für den PWA Test Server
+Hält jede ausgelieferte Datei samt gzip-/Brotli-Variante im Speicher (neu
+erzeugt nur, wenn sich die Datei ändert) und liefert sie mit starkem ETag,
+passendem Cache-Control und 304 Not Modified aus
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Nur Text-Formate lohnen die Komprimierung (PNG, ICO, ... sind bereits komprimiert)
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/xml",
+    "application/vnd.google-earth.kml+xml",
+    "image/svg+xml",
+)
+MIN_COMPRESS_SIZE = 1024
+
+# Größere Dateien werden nicht im Speicher gehalten
+MAX_CACHED_SIZE = 8 * 1024 * 1024
+
+# Dateinamen mit Content-Hash (z.B. app.3f9a1c2b.js) ändern sich nie
+HASHED_NAME_PATTERN = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+# Revisionen (?v=<SHA-256-Präfix>) ab dieser Länge gelten als Content-Hash
+MIN_REVISION_LENGTH = 8
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+mimetypes.add_type("application/vnd.google-earth.kml+xml", ".kml")
+
+
+class StaticAsset(NamedTuple):
+    """Eine Datei mit ihren vorkomprimierten Varianten"""
+    signature: Tuple[int, int]
+    mimetype: str
+    etag: str
+    variants: Dict[str, bytes]
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """
+    Wertet einen Accept-Encoding-Header aus
+
+    Args:
+        header: z.B. "gzip, deflate, br;q=0.9"
+
+    Returns:
+        Kodierung → q-Wert (nur Kodierungen mit q > 0)
+    """
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > 0:
+            accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(asset: StaticAsset, accept_encoding: Optional[str]) -> str:
+    """
+    Wählt die kleinste vom Client akzeptierte Variante
+
+    Args:
+        asset: Datei mit Varianten
+        accept_encoding: Accept-Encoding des Requests
+
+    Returns:
+        "br", "gzip" oder "identity"
+    """
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = [
+        encoding for encoding in ("br", "gzip")
+        if encoding in asset.variants and accepted.get(encoding, wildcard) > 0
+    ]
+    if not candidates:
+        return "identity"
+    return min(candidates, key=lambda encoding: len(asset.variants[encoding]))
+
+
+def etag_for_encoding(asset: StaticAsset, encoding: str) -> str:
+    """Starkes ETag einer Variante (je Kodierung unterschiedlich)"""
+    if encoding == "identity":
+        return f'"{asset.etag}"'
+    return f'"{asset.etag}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], asset: StaticAsset) -> bool:
+    """
+    Prüft If-None-Match gegen alle Varianten einer Datei
+
+    Args:
+        if_none_match: Header-Wert des Requests
+        asset: Datei mit Varianten
+
+    Returns:
+        True wenn der Client die aktuelle Version bereits hat
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-", 1)[0] == asset.etag:
+            return True
+    return False
+
+
+def cache_control_for(filename: str, asset: StaticAsset, revision: Optional[str] = None) -> str:
+    """
+    Cache-Control für eine Datei
+
+    Immutable, wenn der Dateiname einen Content-Hash enthält oder die
+    angefragte Revision (?v=, siehe asset_manifest.py) zum aktuellen Inhalt
+    passt; sonst muss der Browser per ETag nachfragen.
+
+    Args:
+        filename: Angefragter Dateiname
+        asset: Aktueller Inhalt der Datei
+        revision: Wert des Query-Parameters v (optional)
+
+    Returns:
+        Header-Wert für Cache-Control
+    """
+    if HASHED_NAME_PATTERN.search(filename):
+        return IMMUTABLE_CACHE_CONTROL
+    if revision and len(revision) >= MIN_REVISION_LENGTH and asset.etag.startswith(revision.lower()):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+class StaticAssetCache:
+    """
+    Cache der statischen Dateien eines Verzeichnisses
+
+    Jede Datei wird beim ersten Zugriff gelesen, gehasht und komprimiert;
+    danach genügt ein stat() je Request, um Änderungen zu erkennen.
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Initialisiert den Cache
+
+        Args:
+            root_dir: Wurzelverzeichnis der ausgelieferten Dateien
+        """
+        self.root_dir = root_dir
+        self._assets: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, filename: str) -> Optional[str]:
+        """Liefert den absoluten Pfad einer Datei unterhalb von root_dir (oder None)"""
+        path = safe_join(self.root_dir, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def _build_asset(self, path: str, signature: Tuple[int, int]) -> StaticAsset:
+        """Liest eine Datei und erzeugt die komprimierten Varianten"""
+        with open(path, "rb") as f:
+            content = f.read()
+
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        variants = {"identity": content}
+
+        if len(content) >= MIN_COMPRESS_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) < len(content):
+                variants["gzip"] = compressed
+            if BROTLI_AVAILABLE:
+                compressed = brotli.compress(content, quality=11)
+                if len(compressed) < len(content):
+                    variants["br"] = compressed
+
+        return StaticAsset(
+            signature=signature,
+            mimetype=mimetype,
+            etag=hashlib.sha256(content).hexdigest()[:32],
+            variants=variants
+        )
+
+    def get(self, filename: str) -> Optional[StaticAsset]:
+        """
+        Liefert eine Datei aus dem Cache (neu eingelesen, wenn sie sich geändert hat)
+
+        Args:
+            filename: Pfad relativ zu root_dir
+
+        Returns:
+            StaticAsset oder None, wenn die Datei fehlt oder zu groß zum Cachen ist
+        """
+        path = self.resolve(filename)
+        if path is None:
+            return None
+
+        file_stat = os.stat(path)
+        if file_stat.st_size > MAX_CACHED_SIZE:
+            return None
+
+        signature = (file_stat.st_mtime_ns, file_stat.st_size)
+        with self._lock:
+            asset = self._assets.get(path)
+        if asset is not None and asset.signature == signature:
+            return asset
+
+        asset = self._build_asset(path, signature)
+        with self._lock:
+            self._assets[path] = asset
+
+        sizes = ", ".join(f"{encoding} {len(data)}" for encoding, data in asset.variants.items())
+        logger.debug(f"Datei vorbereitet: {filename} ({sizes} Bytes)")
+        return asset
+
+    def warm(self, filenames: List[str]) -> int:
+        """
+        Bereitet Dateien vorab auf (z.B. beim Start)
+
+        Args:
+            filenames: Pfade relativ zu root_dir
+
+        Returns:
+            Anzahl vorbereiteter Dateien
+        """
+        count = 0
+        for filename in filenames:
+            try:
+                if self.get(filename) is not None:
+                    count += 1
+            except OSError as e:
+                logger.warning(f"Datei konnte nicht vorbereitet werden: {filename} ({e})")
+        return count
@@ -1,15 +1,41 @@
+"""
+Pachtflächen-Report: geodätische Fläche aller Polygone je KMZ-Datei
+
+Als Modul:  from calcHA import calculate_areas; rows = calculate_areas(Path("kmz_files"))
+Als Skript: python calcHA.py [kmz_files] [--workers N] [--cache DATEI] [--csv DATEI]
+
+Innere Ringe (Löcher) werden von der Fläche abgezogen. Ergebnisse werden
+je Datei-Inhalt (SHA-256) gecacht; neu berechnet werden nur geänderte
+Dateien, mehrere davon parallel in einem Prozess-Pool.
+
+Die Flächenberechnung selbst kommt aus WildkameraApp/sms-server/revier_area.py
+(dieselbe wie für /reviere/area des SMS-Servers).
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import IO, Iterator, Optional
 from xml.etree import ElementTree as ET
 
-from pyproj import Geod               # pip install pyproj
-import pandas as pd                   # pip install pandas
+# Gemeinsame Flächenberechnung des SMS-Servers (pip install pyproj)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "WildkameraApp" / "sms-server"))
+from revier_area import polygon_area, ring_area
 
 # ---------------------------------------------------------------------------
 # Parameter
 # ---------------------------------------------------------------------------
-KMZ_DIR = Path("kmz_files")                 # Ordner mit allen .kmz
-GEOD    = Geod(ellps="WGS84")         # Ellipsoid für geodätische Flächen
+KMZ_DIR    = Path("kmz_files")              # Ordner mit allen .kmz
+CACHE_FILE = Path(".calcHA_cache.json")     # Ergebnis-Cache je Datei-Hash
+CACHE_VERSION = 1                           # erhöhen, wenn sich die Berechnung ändert
+PARALLEL_MIN_BYTES = 256 * 1024             # darunter lohnt der Prozess-Pool nicht
+
+Ring = tuple[list[float], list[float]]      # (lons, lats)
 
 # ---------------------------------------------------------------------------
 # Hilfsfunktionen
@@ -17,78 +43,204 @@ GEOD    = Geod(ellps="WGS84")         # Ellipsoid für geodätische Flächen
 def area_of_ring(coords: list[tuple[float, float]]) -> float:
     """
     Geodätische Fläche eines Rings (Länge len>=3)
-    coords: [(lon, lat), …]  – muss NICHT geschlossen sein
+    coords: [(lon, lat), …]  – muss NICHT geschlossen sein
     Rückgabe: Fläche in m² (immer positiv)
     """
     lons, lats = zip(*coords)
-    # pyproj.Geod.polygon_area_perimeter liefert Vorzeichen anhand Umlaufrichtung
-    area, _ = GEOD.polygon_area_perimeter(lons, lats)[:2]
-    return abs(area)
+    return ring_area(list(lons), list(lats))
 
-def extract_polygons(kml_bytes: bytes) -> list[list[tuple[float, float]]]:
+
+def _parse_ring(text: Optional[str]) -> Ring:
+    """Koordinaten‑String → (lons, lats)  – Höhen werden ignoriert"""
+    lons, lats = [], []
+    for point in (text or "").split():
+        parts = point.split(",")
+        if len(parts) >= 2:
+            lons.append(float(parts[0]))
+            lats.append(float(parts[1]))
+    return lons, lats
+
+
+def iter_polygons(kml_stream: IO[bytes]) -> Iterator[tuple[Ring, list[Ring]]]:
     """
-    Liefert eine Liste aller äußeren Polygon‑Ringe im KML‑Dokument.
+    Liefert alle Polygone eines KML‑Streams als (äußerer Ring, [Löcher]).
+
+    Die KML wird per iterparse gelesen; fertige Polygone werden sofort
+    aus dem Baum entfernt. Namespaces (KML 2.1/2.2, ohne) sind egal.
     """
-    ns = {"kml": "http://www.opengis.net/kml/2.2"}
-    root = ET.fromstring(kml_bytes)
+    outer: Optional[Ring] = None
+    holes: list[Ring] = []
+    boundary = None
 
-    rings = []
-    for poly in root.findall(".//kml:Polygon", ns):
-        outer = poly.find(".//kml:outerBoundaryIs/kml:LinearRing/kml:coordinates", ns)
-        if outer is None or not outer.text:
+    for event, elem in ET.iterparse(kml_stream, events=("start", "end")):
+        tag = elem.tag.rsplit("}", 1)[-1]
+        if event == "start":
+            if tag == "Polygon":
+                outer, holes = None, []
+            elif tag in ("outerBoundaryIs", "innerBoundaryIs"):
+                boundary = tag
             continue
-        # Koordinaten‑String → Liste (lon,lat)  – Höhen werden ignoriert
-        coords = [
-            tuple(map(float, c.split(",")[:2]))
-            for c in outer.text.strip().split()
-        ]
-        if len(coords) >= 3:
-            rings.append(coords)
-    return rings
 
-# ---------------------------------------------------------------------------
-# Hauptlauf
-# ---------------------------------------------------------------------------
-rows = []
+        if tag == "coordinates" and boundary is not None:
+            ring = _parse_ring(elem.text)
+            if len(ring[0]) >= 3:
+                if boundary == "outerBoundaryIs":
+                    outer = ring
+                else:
+                    holes.append(ring)
+        elif tag in ("outerBoundaryIs", "innerBoundaryIs"):
+            boundary = None
+        elif tag == "Polygon":
+            if outer is not None:
+                yield outer, holes
+            elem.clear()
+
+
+def extract_polygons(kml_bytes: bytes) -> list[list[tuple[float, float]]]:
+    """
+    Liefert eine Liste aller äußeren Polygon‑Ringe im KML‑Dokument.
+    (Löcher bleiben hier außen vor – dafür iter_polygons verwenden)
+    """
+    return [
+        list(zip(*outer))
+        for outer, _ in iter_polygons(io.BytesIO(kml_bytes))
+    ]
+
 
-for kmz_path in KMZ_DIR.glob("*.kmz"):
+def kmz_area(kmz_path: Path) -> dict:
+    """
+    Fläche aller Polygone einer KMZ (äußere Ringe minus Löcher).
+    Rückgabe: {"Polygone", "Löcher", "Fläche_m2"}
+    """
+    polygons = holes = 0
+    total = 0.0
     with zipfile.ZipFile(kmz_path) as zf:
-        # fast alle KMZ enthalten nur eine KML – wir nehmen die erste
+        # fast alle KMZ enthalten nur eine KML – wir nehmen die erste
         kml_name = next(name for name in zf.namelist() if name.endswith(".kml"))
-        kml_data = zf.read(kml_name)
+        with zf.open(kml_name) as kml_stream:
+            for outer, inner in iter_polygons(kml_stream):
+                total += polygon_area(outer, inner)
+                polygons += 1
+                holes += len(inner)
+
+    return {"Polygone": polygons, "Löcher": holes, "Fläche_m2": total}
 
-    polygons = extract_polygons(kml_data)
-    areas = [area_of_ring(r) for r in polygons]
 
-    rows.append(
+def file_hash(path: Path) -> str:
+    """SHA‑256 des Datei‑Inhalts"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_cache(cache_file: Path) -> dict:
+    """Cache {hash: Ergebnis} laden (leer, wenn fehlend/veraltet)"""
+    try:
+        data = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data.get("results", {}) if data.get("version") == CACHE_VERSION else {}
+
+
+def save_cache(cache_file: Path, results: dict) -> None:
+    """Cache atomar schreiben (Temp‑Datei + Rename)"""
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    tmp_file.write_text(
+        json.dumps({"version": CACHE_VERSION, "results": results}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    os.replace(tmp_file, cache_file)
+
+
+def calculate_areas(
+    kmz_dir: Path = KMZ_DIR,
+    cache_file: Optional[Path] = CACHE_FILE,
+    workers: Optional[int] = None,
+) -> list[dict]:
+    """
+    Flächen aller KMZ‑Dateien eines Ordners.
+
+    Bereits berechnete Dateien (gleicher Inhalt) kommen aus dem Cache,
+    alle anderen werden – ab PARALLEL_MIN_BYTES – parallel berechnet
+    (workers=None → alle Kerne).
+    Rückgabe: eine Zeile je Datei, sortiert nach Dateiname
+    """
+    kmz_files = sorted(Path(kmz_dir).glob("*.kmz"))
+    cached = load_cache(cache_file) if cache_file else {}
+
+    hashes = {path: file_hash(path) for path in kmz_files}
+    missing = [path for path in kmz_files if hashes[path] not in cached]
+
+    missing_bytes = sum(path.stat().st_size for path in missing)
+    if len(missing) > 1 and workers != 1 and missing_bytes >= PARALLEL_MIN_BYTES:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            computed = list(pool.map(kmz_area, missing))
+    else:
+        computed = [kmz_area(path) for path in missing]
+
+    results = {hashes[path]: cached[hashes[path]] for path in kmz_files if hashes[path] in cached}
+    results.update({hashes[path]: result for path, result in zip(missing, computed)})
+    if cache_file and missing:
+        save_cache(cache_file, results)
+
+    return [
         {
-            "Datei": kmz_path.stem,
-            "Polygone": len(polygons),
-            "Fläche_m2": sum(areas),
-            "Fläche_ha": sum(areas) / 10_000,
+            "Datei": path.stem,
+            "Polygone": results[hashes[path]]["Polygone"],
+            "Löcher": results[hashes[path]]["Löcher"],
+            "Fläche_m2": results[hashes[path]]["Fläche_m2"],
+            "Fläche_ha": results[hashes[path]]["Fläche_m2"] / 10_000,
         }
-    )
+        for path in kmz_files
+    ]
+
+# ---------------------------------------------------------------------------
+# Hauptlauf
+# ---------------------------------------------------------------------------
+def main(argv: Optional[list[str]] = None) -> None:
+    import pandas as pd                   # pip install pandas
 
-df = pd.DataFrame(rows).sort_values("Datei")
-df.loc["Summe"] = [
-    "—",
-    df["Polygone"].sum(),
-    df["Fläche_m2"].sum(),
-    df["Fläche_ha"].sum(),
-]
+    parser = argparse.ArgumentParser(description="Pachtflächen je KMZ-Datei (geodätisch, WGS84)")
+    parser.add_argument("kmz_dir", nargs="?", type=Path, default=KMZ_DIR, help="Ordner mit .kmz-Dateien")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Default: alle Kerne)")
+    parser.add_argument("--cache", type=Path, default=CACHE_FILE, help="Cache-Datei")
+    parser.add_argument("--no-cache", action="store_true", help="Alles neu berechnen, Cache nicht schreiben")
+    parser.add_argument("--csv", type=Path, help="Report zusätzlich als CSV speichern")
+    args = parser.parse_args(argv)
 
-# hübsch formatieren
-pd.options.display.float_format = "{:,.2f}".format
-print(df)
+    rows = calculate_areas(args.kmz_dir, None if args.no_cache else args.cache, args.workers)
+    if not rows:
+        print(f"Keine .kmz-Dateien in {args.kmz_dir}")
+        return
+
+    df = pd.DataFrame(rows)
+    df.loc["Summe"] = [
+        "—",
+        df["Polygone"].sum(),
+        df["Löcher"].sum(),
+        df["Fläche_m2"].sum(),
+        df["Fläche_ha"].sum(),
+    ]
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+
+    # hübsch formatieren
+    pd.options.display.float_format = "{:,.2f}".format
+    print(df)
+
+
+if __name__ == "__main__":
+    main()
 
 """
 Beispiel‑Ausgabe (gekürzt):
 
-             Datei  Polygone  Fläche_m2  Fläche_ha
-0        Abspacher        17  117,890.75     11.79
-1           Burger         2    5,510.32      0.55
-...
-10   Mayer-Sauerer        32  458,201.72     45.82
+             Datei  Polygone  Löcher  Fläche_m2  Fläche_ha
+0        Abspacher        17       0  117,890.75     11.79
+1           Burger         2       0    5,510.32      0.55
 ...
-Summe          —        127 1,616,487.80    161.65
+Summe          —        127       0 1,618,344.64    161.83
 """